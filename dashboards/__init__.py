@@ -0,0 +1,22 @@
+"""Shared building blocks for the business dashboards.
+
+The scripts in ``ecommerce-dashboard/`` and ``sales-customer-dashboard/``
+import from here so that data generation and rendering code can be reused
+outside of the one-off scripts.
+
+Importing the package is cheap: submodules are loaded on first access
+(``dashboards.ecommerce``), and plotly is only loaded when a figure is built.
+"""
+import importlib
+
+__all__ = [
+    'assets', 'bench', 'cube', 'density', 'downsample', 'ecommerce', 'ecommerce_gen', 'figure_json',
+    'figure_template', 'lazy', 'metrics', 'panel_cache', 'profiling', 'render', 'result_cache', 'sales',
+    'sales_agg', 'sales_gen', 'sales_ingest', 'sales_sql', 'server', 'startup', 'storage', 'topk',
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
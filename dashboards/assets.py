@@ -0,0 +1,72 @@
+"""Shared plotly.js asset for dashboard HTML files.
+
+By default ``write_html`` inlines the whole plotly.js bundle (several MB) in
+every dashboard. In ``shared`` mode the bundle is written once to a
+versioned file, ``<asset_dir>/plotly-<version>/plotly.min.js``, and each
+dashboard loads it with a relative ``<script src>`` instead.
+"""
+import functools
+import os
+
+from dashboards import figure_json, lazy, profiling
+
+offline = lazy.lazy_import('plotly.offline')
+
+# Where the shared bundle goes by default: ``assets/`` next to index.html
+DEFAULT_ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+
+PLOTLYJS_MODES = ['embed', 'shared', 'cdn']
+
+
+def plotlyjs_path(asset_dir=DEFAULT_ASSET_DIR):
+    """Path of the versioned plotly.js bundle inside ``asset_dir``."""
+    version = offline.get_plotlyjs_version()
+    return os.path.join(asset_dir, f'plotly-{version}', 'plotly.min.js')
+
+
+def ensure_plotlyjs(asset_dir=DEFAULT_ASSET_DIR):
+    """Write the plotly.js bundle to ``asset_dir`` unless it is already there; return its path."""
+    path = plotlyjs_path(asset_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(offline.get_plotlyjs())
+        os.replace(tmp_path, path)
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def bundle_size():
+    """Size in bytes of the plotly.js bundle that ``embed`` mode inlines."""
+    return len(offline.get_plotlyjs().encode('utf-8'))
+
+
+@profiling.span('write_html')
+def write_html(fig, output, plotlyjs='embed', asset_dir=DEFAULT_ASSET_DIR, arrays='json', compress=False):
+    """Write ``fig`` to ``output`` and return the plotly.js bytes not inlined in it.
+
+    ``plotlyjs`` is one of ``PLOTLYJS_MODES``: ``embed`` inlines the bundle
+    (the original behaviour), ``shared`` references the copy in
+    ``asset_dir`` and ``cdn`` loads it from the plotly CDN. ``arrays`` and
+    ``compress`` select how the figure itself is embedded (see
+    ``figure_json.to_html``).
+    """
+    if plotlyjs == 'embed':
+        src = True
+    elif plotlyjs == 'shared':
+        bundle = ensure_plotlyjs(asset_dir)
+        src = os.path.relpath(bundle, os.path.dirname(os.path.abspath(output))).replace(os.sep, '/')
+    elif plotlyjs == 'cdn':
+        src = 'cdn'
+    else:
+        raise ValueError(f'Unknown plotlyjs mode {plotlyjs!r}, expected one of {PLOTLYJS_MODES}')
+
+    if arrays == 'json' and not compress:
+        fig.write_html(output, include_plotlyjs=src)
+    else:
+        # Rendered before the file is opened, so a failure leaves the old page in place
+        html = figure_json.to_html(fig, include_plotlyjs=src, arrays=arrays, compress=compress)
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(html)
+    return 0 if plotlyjs == 'embed' else bundle_size()
@@ -0,0 +1,257 @@
+"""Benchmarks for data generation, loading, aggregation and rendering.
+
+Each dashboard is run end to end at several data sizes, and every stage
+(``generate``, ``load``, ``aggregate``, ``figure``, ``write_html``) is timed::
+
+    python -m dashboards.bench --sizes 1000 100000 --save-baseline bench-baseline.json
+    python -m dashboards.bench --sizes 1000 100000 --baseline bench-baseline.json
+
+Each (dashboard, size) case runs in a fresh process, so the peak RSS
+reported after a stage is the high-water mark of that case up to and
+including the stage. Against a baseline, a stage that got more than
+``--tolerance`` slower or bigger is reported as a regression, and the
+command exits non-zero.
+
+The e-commerce generator only writes a fixed 110-row table, so its
+``generate`` stage synthesizes a ``monthly_sales_data`` table of the
+requested size (finer-grained dates over the same two years) next to
+copies of the other datasets.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from dashboards import assets, ecommerce, panel_cache, sales, sales_agg, sales_gen, storage
+from dashboards.profiling import peak_rss
+
+STAGES = ['generate', 'load', 'aggregate', 'figure', 'write_html']
+DEFAULT_SIZES = [1_000, 100_000, 10_000_000]
+DEFAULT_TOLERANCE = 0.25
+
+# Time differences below this are timer noise, never regressions
+MIN_SECONDS = 0.05
+
+ECOMMERCE_DATASETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'ecommerce-dashboard', 'datasets')
+
+
+def directory_size(directory):
+    """Bytes of the files under ``directory``, column stores included."""
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+@contextmanager
+def measure(records, stage):
+    """Time the block and append a record for ``stage``; the block may set ``record['bytes']``."""
+    record = {'stage': stage, 'bytes': None}
+    start = time.perf_counter()
+    yield record
+    record['seconds'] = time.perf_counter() - start
+    record['peak_rss'] = peak_rss()
+    records.append(record)
+
+
+def bench_sales(directory, n_rows, fmt='csv'):
+    records = []
+    with measure(records, 'generate') as record:
+        customers, totals = sales_gen.write_transactions(
+            directory, n_rows, n_customers=max(50, n_rows // 1000), fmt=fmt
+        )
+        monthly_df, _, _ = sales_agg.finalize(totals, customers, product_groups=sales_gen.PRODUCT_GROUPS,
+                                              prev_year_factors=np.full(12, 0.9))
+        storage.write_dataset(monthly_df, directory, 'monthly_sales_summary', fmt)
+        record['bytes'] = directory_size(directory)
+
+    with measure(records, 'load'):
+        sales_df = storage.read_dataset(directory, 'sales_transactions', columns=sales.AGGREGATE_COLUMNS)
+        previous_sales = sales.load_previous_sales(directory)
+
+    with measure(records, 'aggregate'):
+        aggregates = sales.aggregates_from_frame(sales_df, previous_sales)
+
+    with measure(records, 'figure'):
+        fig = sales.build_figure(aggregates)
+
+    with measure(records, 'write_html') as record:
+        output = os.path.join(directory, 'sales_customer_profiling_dashboard.html')
+        assets.write_html(fig, output)
+        record['bytes'] = os.path.getsize(output)
+    return records
+
+
+def write_ecommerce_datasets(directory, n_rows, fmt='csv', seed=42):
+    """Write the e-commerce datasets with a ``monthly_sales_data`` table of about ``n_rows`` rows."""
+    for name in ['regional_performance', 'category_sales', 'customer_metrics']:
+        storage.write_dataset(storage.read_dataset(ECOMMERCE_DATASETS, name), directory, name, fmt)
+
+    rng = np.random.default_rng(seed)
+    regions = list(ecommerce.REGION_COORDS)
+    periods = max(2, math.ceil(n_rows / len(regions)))
+    dates = pd.DatetimeIndex(np.linspace(pd.Timestamp('2024-01-01').value, pd.Timestamp('2025-12-31').value,
+                                         periods).astype('datetime64[ns]')).round('s')
+    n = periods * len(regions)
+    # About 150k per region and month, spread over the finer periods
+    revenue = np.round(rng.uniform(0.85, 1.15, n) * 150000 * 24 / periods, 2)
+    orders = np.maximum(1, (revenue / rng.uniform(45, 85, n)).astype(np.int64))
+    monthly_sales = pd.DataFrame({
+        'date': np.repeat(dates, len(regions)),
+        'year': np.repeat(dates.year, len(regions)),
+        'month': np.repeat(dates.month, len(regions)),
+        'region': np.tile(regions, periods),
+        'revenue': revenue,
+        'orders': orders,
+        'avg_order_value': np.round(revenue / orders, 2),
+    })
+    storage.write_dataset(monthly_sales, directory, 'monthly_sales_data', fmt)
+
+
+def bench_ecommerce(directory, n_rows, fmt='csv'):
+    records = []
+    with measure(records, 'generate') as record:
+        write_ecommerce_datasets(directory, n_rows, fmt)
+        record['bytes'] = directory_size(directory)
+
+    with measure(records, 'load'):
+        datasets = {name: storage.read_dataset(directory, name)
+                    for name in panel_cache.source_datasets(ecommerce.PANELS, ecommerce.DERIVED)}
+
+    with measure(records, 'aggregate'):
+        for name, derived in ecommerce.DERIVED.items():
+            datasets[name] = derived.build({source: datasets[source] for source in derived.inputs})
+        payloads = {panel.name: panel.build({name: datasets[name] for name in panel.inputs})
+                    for panel in ecommerce.PANELS}
+
+    with measure(records, 'figure'):
+        fig = ecommerce.assemble_figure(payloads)
+
+    with measure(records, 'write_html') as record:
+        output = os.path.join(directory, 'ecommerce_dashboard.html')
+        assets.write_html(fig, output)
+        record['bytes'] = os.path.getsize(output)
+    return records
+
+
+BENCHMARKS = {
+    'ecommerce': bench_ecommerce,
+    'sales': bench_sales,
+}
+
+
+def run_case(dashboard, n_rows, fmt='csv'):
+    """Run one benchmark case in a scratch directory and return its stage records."""
+    with tempfile.TemporaryDirectory(prefix='dashboards-bench-') as directory:
+        records = BENCHMARKS[dashboard](directory, n_rows, fmt)
+    for record in records:
+        record.update({'dashboard': dashboard, 'rows': n_rows, 'format': fmt})
+    return records
+
+
+def run_cases(dashboards, sizes, fmt='csv', on_records=None):
+    """Run every (dashboard, size) case, each in a freshly spawned process."""
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for n_rows in sizes:
+        for dashboard in dashboards:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                records = pool.submit(run_case, dashboard, n_rows, fmt).result()
+            if on_records:
+                on_records(records)
+            results.extend(records)
+    return results
+
+
+def result_key(record):
+    return record['dashboard'], record['rows'], record['format'], record['stage']
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Annotate ``results`` with their change against ``baseline``; return the regressions."""
+    previous = {result_key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        base = previous.get(result_key(record))
+        if base is None:
+            continue
+        record['baseline_seconds'] = base['seconds']
+        record['baseline_peak_rss'] = base.get('peak_rss')
+        slower = (record['seconds'] > base['seconds'] * (1 + tolerance)
+                  and record['seconds'] - base['seconds'] > MIN_SECONDS)
+        bigger = (record['peak_rss'] and base.get('peak_rss')
+                  and record['peak_rss'] > base['peak_rss'] * (1 + tolerance))
+        if slower or bigger:
+            regressions.append(record)
+    return regressions
+
+
+def _change(value, base):
+    return f'{(value - base) / base * 100:+.0f}%' if value is not None and base else ''
+
+
+def print_records(records):
+    for record in records:
+        rss = f"{record['peak_rss'] / 1e6:,.0f} MB" if record['peak_rss'] else '-'
+        size = f"{record['bytes'] / 1e6:,.1f} MB" if record['bytes'] is not None else ''
+        print(f"{record['dashboard']:9} {record['rows']:>12,} {record['stage']:10} "
+              f"{record['seconds']:9.3f}s {rss:>10} {size:>10} "
+              f"{_change(record['seconds'], record.get('baseline_seconds')):>6}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dashboard generation, aggregation and rendering.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Numbers of rows to benchmark (default: 1,000 100,000 10,000,000)')
+    parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append',
+                        help='Only benchmark this dashboard (can be repeated)')
+    parser.add_argument('--format', choices=storage.FORMATS, default='csv',
+                        help='File format for the generated datasets (default: csv)')
+    parser.add_argument('--baseline', default=None, help='Compare against the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative slowdown or memory growth reported as a regression (default: 0.25)')
+    parser.add_argument('--save-baseline', default=None, help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'dashboard':9} {'rows':>12} {'stage':10} {'time':>10} {'peak RSS':>10} {'output':>10} {'change':>6}")
+
+    def on_records(records):
+        if baseline is not None:
+            compare(records, baseline, args.tolerance)
+        print_records(records)
+
+    results = run_cases(args.only or sorted(BENCHMARKS), args.sizes, fmt=args.format, on_records=on_records)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f'\nBaseline written to {args.save_baseline}')
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f'\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})')
+        return 0
+    print(f'\n{len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):')
+    for record in regressions:
+        print(f"- {record['dashboard']} {record['rows']:,} rows, {record['stage']}: "
+              f"{record['seconds']:.3f}s (was {record['baseline_seconds']:.3f}s), "
+              f"peak RSS {_change(record['peak_rss'], record['baseline_peak_rss']) or 'n/a'}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
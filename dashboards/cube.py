@@ -0,0 +1,126 @@
+"""Array-backed OLAP cube with slice and rollup.
+
+A ``Cube`` holds one dense NumPy array per measure, with one axis per
+dimension (e.g. date × region × category). It is built in a single
+pass over a long table; after that, dashboard panels read pre-aggregated
+numbers instead of filtering and grouping the table again::
+
+    cube = Cube.from_frame(monthly_sales, ['date', 'region'],
+                           ['revenue', 'orders'], ratios={'avg_order_value': ('revenue', 'orders')})
+    cube.value('revenue', region='Europe')              # one lookup
+    cube.slice(date=dates_2024).rollup('date').to_frame()  # revenue per date in 2024
+
+Rollups are memoized, so repeated lookups on the same grouping are O(1).
+Ratio measures (such as average order value) are computed from the summed
+numerator and denominator, never summed themselves.
+
+Every axis multiplies the size of the arrays, so leave out dimensions that
+another one determines (such as the year of a date): slice the finer one
+instead.
+"""
+import numpy as np
+import pandas as pd
+
+# Number of source rows in each cell; empty cells (rows == 0) are left out of to_frame()
+ROWS = 'rows'
+
+
+class Cube:
+    """Measures summed over every combination of the dimension labels."""
+
+    def __init__(self, dims, labels, measures, ratios=None):
+        self.dims = list(dims)
+        self.labels = {dim: pd.Index(labels[dim]) for dim in self.dims}
+        self.measures = measures
+        self.ratios = dict(ratios or {})
+        self._rollups = {}
+
+    @classmethod
+    def from_frame(cls, df, dims, measures, ratios=None):
+        """Aggregate ``df`` into a cube over ``dims``, summing the ``measures`` columns."""
+        codes = []
+        labels = {}
+        for dim in dims:
+            dim_codes, dim_labels = pd.factorize(df[dim], sort=True)
+            codes.append(dim_codes)
+            labels[dim] = dim_labels
+        shape = tuple(len(labels[dim]) for dim in dims)
+        size = int(np.prod(shape))
+        flat = np.ravel_multi_index(codes, shape) if len(df) else np.zeros(0, dtype=np.int64)
+
+        arrays = {ROWS: np.bincount(flat, minlength=size).reshape(shape)}
+        for measure in measures:
+            weights = df[measure].to_numpy(dtype=float)
+            arrays[measure] = np.bincount(flat, weights=weights, minlength=size).reshape(shape)
+        return cls(dims, labels, arrays, ratios)
+
+    @property
+    def shape(self):
+        return tuple(len(self.labels[dim]) for dim in self.dims)
+
+    def array(self, measure):
+        """The array of ``measure`` (a summed or ratio measure), one axis per dimension."""
+        if measure in self.ratios:
+            numerator, denominator = self.ratios[measure]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self.measures[numerator] / self.measures[denominator]
+        return self.measures[measure]
+
+    def slice(self, **selection):
+        """Select labels of some dimensions.
+
+        A single label drops the dimension; a list of labels keeps it,
+        restricted to those labels in the given order.
+        """
+        unknown = set(selection) - set(self.dims)
+        if unknown:
+            raise KeyError(f'Unknown dimensions: {sorted(unknown)}')
+        measures = dict(self.measures)
+        dims = []
+        labels = {}
+        # Take from the last axis backwards so that dropped axes do not shift the others
+        for axis in reversed(range(len(self.dims))):
+            dim = self.dims[axis]
+            if dim not in selection:
+                dims.insert(0, dim)
+                labels[dim] = self.labels[dim]
+                continue
+            if isinstance(selection[dim], (list, tuple, np.ndarray, pd.Index)):
+                positions = self.labels[dim].get_indexer(selection[dim])
+                if (positions < 0).any():
+                    raise KeyError(f'Unknown {dim}: {list(pd.Index(selection[dim])[positions < 0])}')
+                dims.insert(0, dim)
+                labels[dim] = self.labels[dim][positions]
+            else:
+                positions = self.labels[dim].get_loc(selection[dim])
+            measures = {name: np.take(array, positions, axis=axis) for name, array in measures.items()}
+        return Cube(dims, labels, measures, self.ratios)
+
+    def rollup(self, *dims):
+        """Sum every measure over all dimensions except ``dims``, in that order."""
+        if dims not in self._rollups:
+            unknown = set(dims) - set(self.dims)
+            if unknown:
+                raise KeyError(f'Unknown dimensions: {sorted(unknown)}')
+            axes = tuple(i for i, dim in enumerate(self.dims) if dim not in dims)
+            order = [[dim for dim in self.dims if dim in dims].index(dim) for dim in dims]
+            measures = {name: array.sum(axis=axes).transpose(order) for name, array in self.measures.items()}
+            self._rollups[dims] = Cube(dims, self.labels, measures, self.ratios)
+        return self._rollups[dims]
+
+    def value(self, measure, **labels):
+        """One aggregated value: ``measure`` summed over the dimensions not in ``labels``."""
+        rolled = self.rollup(*labels)
+        position = tuple(rolled.labels[dim].get_loc(labels[dim]) for dim in rolled.dims)
+        return rolled.array(measure)[position].item()
+
+    def to_frame(self, measures=None):
+        """Long table of the non-empty cells, one column per dimension and measure."""
+        measures = measures or [name for name in self.measures if name != ROWS] + list(self.ratios)
+        filled = self.measures[ROWS] > 0
+        positions = np.nonzero(filled)
+        frame = pd.DataFrame({dim: self.labels[dim][positions[i]] for i, dim in enumerate(self.dims)})
+        for measure in measures:
+            frame[measure] = self.array(measure)[filled]
+        return frame
+
@@ -0,0 +1,67 @@
+"""2D binning for scatter panels with too many points for one marker each.
+
+Past about a hundred thousand markers the page gets large and the browser
+slow to pan and hover. ``bin_points`` counts the points on a grid with
+NumPy instead, so a scatter trace can draw one marker per occupied cell:
+placed at the mean of the cell's points, sized by how many points fell in
+it, and carrying the cell totals for the hover label.
+
+Several traces (one per customer group, say) should share the same
+``grid_edges`` so that their cells line up.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_DENSITY_THRESHOLD = 100_000
+DEFAULT_BINS = 60
+
+# Smallest and largest marker diameter, in pixels, of a binned trace
+MARKER_SIZES = (5, 24)
+
+# The occupied cells of a binned trace: point count, mean and sum per cell
+Cells = namedtuple('Cells', ['count', 'x_mean', 'y_mean', 'x_sum', 'y_sum'])
+
+
+def edges(values, bins=DEFAULT_BINS):
+    """Bin edges covering ``values``; whole numbers get bins of whole-number width."""
+    values = np.asarray(values)
+    lo, hi = float(values.min()), float(values.max())
+    if np.issubdtype(values.dtype, np.integer):
+        # Each bin covers the same number of integers, so counts are comparable
+        width = max(1, int(np.ceil((hi - lo + 1) / bins)))
+        return lo - 0.5 + width * np.arange(int(np.ceil((hi - lo + 1) / width)) + 1)
+    if hi == lo:
+        hi = lo + 1
+    return np.linspace(lo, hi, bins + 1)
+
+
+def grid_edges(x, y, bins=DEFAULT_BINS):
+    """``(x_edges, y_edges)`` of a ``bins`` by ``bins`` grid over the points ``x``, ``y``."""
+    return edges(x, bins), edges(y, bins)
+
+
+def _bin_index(values, bin_edges):
+    return np.clip(np.searchsorted(bin_edges, values, side='right') - 1, 0, len(bin_edges) - 2)
+
+
+def bin_points(x, y, x_edges, y_edges):
+    """The ``Cells`` of the grid that hold at least one of the points ``x``, ``y``."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_y = len(y_edges) - 1
+    cell = _bin_index(x, x_edges) * n_y + _bin_index(y, y_edges)
+    size = (len(x_edges) - 1) * n_y
+    count = np.bincount(cell, minlength=size)
+    occupied = np.flatnonzero(count)
+    count = count[occupied]
+    x_sum = np.bincount(cell, weights=x, minlength=size)[occupied]
+    y_sum = np.bincount(cell, weights=y, minlength=size)[occupied]
+    return Cells(count, x_sum / count, y_sum / count, x_sum, y_sum)
+
+
+def marker_sizes(count, max_count):
+    """Marker diameters growing with the square root of ``count``, so areas follow the counts."""
+    low, high = MARKER_SIZES
+    scale = np.sqrt(np.asarray(count, dtype=float) / max(int(max_count), 1))
+    return np.round(low + (high - low) * scale, 1)
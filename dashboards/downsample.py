@@ -0,0 +1,115 @@
+"""Downsampling for time-series traces.
+
+The dashboards' time-series panels were written for a dozen points per
+series. At daily or per-transaction granularity a trace can hold hundreds of
+thousands of points, which the browser struggles to draw. ``limit_trace``
+cuts a trace down to a point budget before it is serialized, using either
+Largest-Triangle-Three-Buckets (keeps the visual shape) or min/max
+bucketing (keeps every bucket's extremes), and can switch large scatter
+traces to WebGL (``scattergl``).
+"""
+import numpy as np
+
+DEFAULT_MAX_POINTS = 2000
+DEFAULT_GL_THRESHOLD = 1000
+
+METHODS = ['lttb', 'minmax']
+
+# Trace properties that hold one value per point and must be subset together
+POINT_ARRAYS = ['x', 'y', 'text', 'hovertext', 'customdata']
+MARKER_ARRAYS = ['color', 'size', 'symbol', 'opacity']
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if np.issubdtype(values.dtype, np.number):
+        return values.astype(float)
+    # Categories (e.g. month names) are evenly spaced along the axis
+    return np.arange(len(values), dtype=float)
+
+
+def _bucket_edges(n, n_buckets):
+    """Edges splitting points 1..n-2 into ``n_buckets`` near-equal buckets."""
+    return np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point
+    and the average of the next bucket.
+    """
+    x = _numeric(x)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, n_out - 2)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.nanargmax(area)) if end > start else start
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(x, y, n_out):
+    """Indices of the minimum and maximum of ``y`` in each of ``n_out // 2`` buckets."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, (n_out - 2) // 2)
+    kept = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            kept.append(start + int(np.nanargmin(y[start:end])))
+            kept.append(start + int(np.nanargmax(y[start:end])))
+    return np.unique(kept)
+
+
+def limit_trace(trace, max_points=DEFAULT_MAX_POINTS, gl_threshold=DEFAULT_GL_THRESHOLD, method='lttb'):
+    """Return ``trace`` (a trace dict) with at most ``max_points`` points.
+
+    All per-point arrays (x, y, text, customdata, marker colors/sizes...)
+    are subset together. Scatter traces that still have more than
+    ``gl_threshold`` points are switched to ``scattergl``. ``None`` disables
+    either step.
+    """
+    if 'x' not in trace or 'y' not in trace:
+        return trace
+    n = len(trace['y'])
+    trace = dict(trace)
+
+    if max_points is not None and n > max_points:
+        pick = {'lttb': lttb_indices, 'minmax': minmax_indices}[method]
+        keep = pick(trace['x'], trace['y'], max_points)
+        for key in POINT_ARRAYS:
+            if key in trace and not isinstance(trace[key], str) and np.ndim(trace[key]) == 1 and len(trace[key]) == n:
+                trace[key] = np.asarray(trace[key])[keep]
+        marker = trace.get('marker')
+        if isinstance(marker, dict):
+            marker = dict(marker)
+            for key in MARKER_ARRAYS:
+                if np.ndim(marker.get(key)) == 1 and len(marker[key]) == n:
+                    marker[key] = np.asarray(marker[key])[keep]
+            trace['marker'] = marker
+        n = len(keep)
+
+    if gl_threshold is not None and n > gl_threshold and trace.get('type') == 'scatter':
+        trace['type'] = 'scattergl'
+    return trace
@@ -0,0 +1,393 @@
+"""E-commerce performance dashboard, split into cacheable panels.
+
+Each of the six subplots is a ``Panel`` that reads only the datasets it
+needs and returns its traces as plain dicts. ``build_figure`` assembles them
+into the dashboard layout; with a ``PanelCache`` only panels whose input
+files changed are recomputed. Panels over ``monthly_sales_data`` read a
+date × region cube (``SALES_CUBE``) built once per run instead of
+filtering and grouping the table each. The time-series panels are limited to a point
+budget (see ``dashboards.downsample``) so that daily or hourly data stays
+responsive in the browser.
+"""
+import functools
+
+import pandas as pd
+
+from dashboards import downsample, lazy, panel_cache, profiling, storage
+from dashboards.cube import Cube
+from dashboards.figure_template import FigureTemplate
+
+# Loaded when the first figure is built
+go = lazy.lazy_import('plotly.graph_objects')
+subplots = lazy.lazy_import('plotly.subplots')
+
+
+def sales_cube(datasets):
+    """Revenue and orders of ``monthly_sales_data`` by date, region (and category, if present).
+
+    The date decides the year, so there is no year axis (it would leave
+    every cell outside a date's own year empty); see ``year_slice``.
+    """
+    monthly_sales = datasets['monthly_sales_data']
+    dims = ['date', 'region'] + (['category'] if 'category' in monthly_sales else [])
+    return Cube.from_frame(monthly_sales, dims, ['revenue', 'orders'],
+                           ratios={'avg_order_value': ('revenue', 'orders')})
+
+
+def year_slice(cube, year):
+    """The part of ``cube`` with the dates in ``year``."""
+    dates = cube.labels['date']
+    return cube.slice(date=dates[dates.year == year])
+
+
+def revenue_trend_traces(datasets, max_points=downsample.DEFAULT_MAX_POINTS,
+                         gl_threshold=downsample.DEFAULT_GL_THRESHOLD, method='lttb'):
+    cube = datasets['monthly_sales_cube']
+    revenue_2024 = year_slice(cube, 2024).rollup('date').to_frame(['revenue'])
+    revenue_2025 = year_slice(cube, 2025).rollup('date').to_frame(['revenue'])
+
+    traces = [
+        go.Scatter(
+            x=revenue_2024['date'],
+            y=revenue_2024['revenue'],
+            mode='lines+markers',
+            name='2024 Revenue',
+            line=dict(color='#1f77b4', width=3),
+            marker=dict(size=6),
+            hovertemplate='%{x}<br>Revenue: $%{y:,.0f}<extra></extra>'
+        ).to_plotly_json(),
+        go.Scatter(
+            x=revenue_2025['date'],
+            y=revenue_2025['revenue'],
+            mode='lines+markers',
+            name='2025 Revenue',
+            line=dict(color='#ff7f0e', width=3),
+            marker=dict(size=6),
+            hovertemplate='%{x}<br>Revenue: $%{y:,.0f}<extra></extra>'
+        ).to_plotly_json(),
+    ]
+    return [downsample.limit_trace(trace, max_points, gl_threshold, method) for trace in traces]
+
+
+def market_share_traces(datasets):
+    market_share_data = datasets['regional_performance'].sort_values('market_share_2025', ascending=False)
+
+    return [
+        go.Pie(
+            labels=market_share_data['region'],
+            values=market_share_data['market_share_2025'],
+            hole=0.4,
+            marker=dict(colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99', '#ff99cc']),
+            textinfo='label+percent',
+            hovertemplate='%{label}<br>Market Share: %{value}%<br>Revenue: $%{customdata:,.0f}<extra></extra>',
+            customdata=market_share_data['revenue_2025']
+        ).to_plotly_json(),
+    ]
+
+
+def category_traces(datasets):
+    category_sales = datasets['category_sales']
+    category_2025 = category_sales[category_sales['year'] == 2025].sort_values('revenue', ascending=True)
+
+    return [
+        go.Bar(
+            x=category_2025['revenue'],
+            y=category_2025['category'],
+            orientation='h',
+            name='Category Revenue 2025',
+            marker=dict(color='#2ca02c'),
+            text=[f'${x/1000000:.1f}M' for x in category_2025['revenue']],
+            textposition='outside',
+            hovertemplate='%{y}<br>Revenue: $%{x:,.0f}<extra></extra>'
+        ).to_plotly_json(),
+    ]
+
+
+def growth_traces(datasets):
+    regional_sorted = datasets['regional_performance'].sort_values('growth_rate', ascending=True)
+
+    colors = ['#d62728' if x < 0 else '#2ca02c' for x in regional_sorted['growth_rate']]
+
+    return [
+        go.Bar(
+            x=regional_sorted['growth_rate'],
+            y=regional_sorted['region'],
+            orientation='h',
+            name='Growth Rate %',
+            marker=dict(color=colors),
+            text=[f'{x}%' for x in regional_sorted['growth_rate']],
+            textposition='outside',
+            hovertemplate='%{y}<br>Growth Rate: %{x}%<extra></extra>'
+        ).to_plotly_json(),
+    ]
+
+
+def customer_acquisition_traces(datasets, max_points=downsample.DEFAULT_MAX_POINTS,
+                                gl_threshold=downsample.DEFAULT_GL_THRESHOLD, method='lttb'):
+    customer_metrics = datasets['customer_metrics']
+    customer_2025 = customer_metrics[customer_metrics['year'] == 2025]
+
+    traces = [
+        go.Scatter(
+            x=customer_2025['date'],
+            y=customer_2025['new_customers'],
+            mode='lines+markers',
+            name='New Customers 2025',
+            line=dict(color='#9467bd', width=2),
+            yaxis='y5',
+            hovertemplate='%{x}<br>New Customers: %{y:,.0f}<extra></extra>'
+        ).to_plotly_json(),
+        go.Scatter(
+            x=customer_2025['date'],
+            y=customer_2025['retention_rate'],
+            mode='lines+markers',
+            name='Retention Rate %',
+            line=dict(color='#8c564b', width=2),
+            yaxis='y6',
+            hovertemplate='%{x}<br>Retention: %{y}%<extra></extra>'
+        ).to_plotly_json(),
+    ]
+    return [downsample.limit_trace(trace, max_points, gl_threshold, method) for trace in traces]
+
+
+# Simulated coordinates for the regional map
+REGION_COORDS = {
+    'North America': {'lat': 45, 'lon': -100, 'size': 30},
+    'Europe': {'lat': 50, 'lon': 10, 'size': 25},
+    'Asia Pacific': {'lat': 35, 'lon': 120, 'size': 35},
+    'Latin America': {'lat': -15, 'lon': -60, 'size': 20},
+    'Middle East': {'lat': 25, 'lon': 45, 'size': 15}
+}
+
+
+def geo_map_traces(datasets):
+    map_data = []
+    for region in datasets['regional_performance'].itertuples():
+        region_name = str(region.region)  # Convert to string for type safety
+        coords = REGION_COORDS.get(region_name)
+        if coords is None:  # Simulated markets have no place on the map
+            continue
+        map_data.append({
+            'region': region_name,
+            'lat': coords['lat'],
+            'lon': coords['lon'],
+            'revenue': region.revenue_2025,
+            'size': coords['size']
+        })
+
+    map_df = pd.DataFrame(map_data)
+
+    return [
+        go.Scattergeo(
+            lat=map_df['lat'],
+            lon=map_df['lon'],
+            text=map_df['region'],
+            mode='markers+text',
+            marker=dict(
+                size=map_df['size'],
+                color=map_df['revenue'],
+                colorscale='Viridis',
+                showscale=True,
+                colorbar=dict(title="Revenue ($)", x=1.02)
+            ),
+            textposition='middle center',
+            hovertemplate='%{text}<br>Revenue: $%{customdata:,.0f}<extra></extra>',
+            customdata=map_df['revenue'],
+            name='Regional Revenue'
+        ).to_plotly_json(),
+    ]
+
+
+def business_summary(datasets):
+    cube = datasets['monthly_sales_cube']
+    total_2024 = year_slice(cube, 2024).value('revenue')
+    total_2025 = year_slice(cube, 2025).value('revenue')
+    return {
+        'total_2024': total_2024,
+        'total_2025': total_2025,
+        'growth': (total_2025 - total_2024) / total_2024 * 100,
+    }
+
+
+# Inputs computed from the stored datasets, shared by the panels that read them
+DERIVED = {
+    'monthly_sales_cube': panel_cache.Derived(['monthly_sales_data'], sales_cube),
+}
+
+# Panel graph: what each subplot reads, and where it goes in the grid
+PANELS = [
+    panel_cache.Panel('revenue_trend', ['monthly_sales_cube'], revenue_trend_traces,
+                      ['max_points', 'gl_threshold', 'method']),
+    panel_cache.Panel('market_share', ['regional_performance'], market_share_traces),
+    panel_cache.Panel('category_bars', ['category_sales'], category_traces),
+    panel_cache.Panel('growth_bars', ['regional_performance'], growth_traces),
+    panel_cache.Panel('customer_acquisition', ['customer_metrics'], customer_acquisition_traces,
+                      ['max_points', 'gl_threshold', 'method']),
+    panel_cache.Panel('geo_map', ['regional_performance'], geo_map_traces),
+    panel_cache.Panel('business_summary', ['monthly_sales_cube'], business_summary),
+]
+
+PANEL_POSITIONS = {
+    'revenue_trend': (1, 1),
+    'market_share': (1, 2),
+    'category_bars': (2, 1),
+    'growth_bars': (2, 2),
+    'customer_acquisition': (3, 1),
+    'geo_map': (3, 2),
+}
+
+
+def dashboard_layout():
+    """The dashboard grid with its titles, axes, map and annotations, without traces."""
+    fig = subplots.make_subplots(
+        rows=3, cols=2,
+        subplot_titles=[
+            'Monthly Revenue Trends (2024 vs 2025)',
+            'Regional Market Share 2025',
+            'Product Category Performance',
+            'Regional Growth Comparison',
+            'Customer Acquisition Trends',
+            'Regional Revenue Map'
+        ],
+        specs=[
+            [{"secondary_y": False}, {"type": "pie"}],
+            [{"secondary_y": False}, {"secondary_y": False}],
+            [{"secondary_y": True}, {"type": "geo"}]
+        ],
+        vertical_spacing=0.08,
+        horizontal_spacing=0.1,
+        row_heights=[0.35, 0.35, 0.3]
+    )
+
+    # Update layout for each subplot
+    fig.update_xaxes(title_text="Date", row=1, col=1)
+    fig.update_yaxes(title_text="Revenue ($)", row=1, col=1)
+
+    fig.update_xaxes(title_text="Revenue ($)", row=2, col=1)
+    fig.update_yaxes(title_text="Product Category", row=2, col=1)
+
+    fig.update_xaxes(title_text="Growth Rate (%)", row=2, col=2)
+    fig.update_yaxes(title_text="Region", row=2, col=2)
+
+    fig.update_xaxes(title_text="Date", row=3, col=1)
+    fig.update_yaxes(title_text="New Customers", row=3, col=1)
+
+    # Configure the map
+    fig.update_geos(
+        projection_type="orthographic",
+        showland=True,
+        landcolor="lightgray",
+        showocean=True,
+        oceancolor="lightblue",
+        row=3, col=2
+    )
+
+    # Update overall layout
+    fig.update_layout(
+        title={
+            'text': "E-commerce Business Performance Dashboard - 2024 vs 2025<br><sub>Created by Rehan Ali</sub>",
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {'size': 24, 'color': '#2c3e50'}
+        },
+        height=1200,
+        showlegend=True,
+        template='plotly_white',
+        font=dict(family="Arial, sans-serif", size=11),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.1,
+            xanchor="center",
+            x=0.5
+        )
+    )
+
+    # Add secondary y-axis for customer metrics
+    fig.update_layout(
+        yaxis5=dict(title="New Customers", side="left"),
+        yaxis6=dict(title="Retention Rate (%)", side="right", overlaying="y5")
+    )
+
+    # Format axes
+    fig.update_yaxes(tickformat="$,.0f", row=1, col=1)
+    fig.update_xaxes(tickformat="$,.0s", row=2, col=1)
+
+    # Add annotations with key insights
+    annotations = [
+        dict(
+            x=0.02, y=0.98,
+            xref='paper', yref='paper',
+            text='<b>Key Insights:</b><br>• Asia Pacific leads with highest market share<br>• Beauty category shows strongest growth<br>• Overall revenue increased year-over-year',
+            showarrow=False,
+            font=dict(size=12, color='#34495e'),
+            bgcolor='rgba(255,255,255,0.8)',
+            bordercolor='#bdc3c7',
+            borderwidth=1,
+            xanchor='left',
+            yanchor='top'
+        ),
+        dict(
+            x=0.99, y=0.01,
+            xref='paper', yref='paper',
+            text='<i>Dashboard by Rehan Ali</i>',
+            showarrow=False,
+            font=dict(size=10, color='#95a5a6'),
+            xanchor='right',
+            yanchor='bottom'
+        )
+    ]
+
+    fig.update_layout(annotations=annotations)
+    return fig
+
+
+@functools.lru_cache(maxsize=None)
+def figure_template():
+    """The ``FigureTemplate`` of ``dashboard_layout``, built once per process."""
+    return FigureTemplate(dashboard_layout)
+
+
+@profiling.span('figure')
+def assemble_figure(payloads):
+    """Lay out the panel traces in the dashboard grid."""
+    return figure_template().figure([(trace, row, col) for name, (row, col) in PANEL_POSITIONS.items()
+                                     for trace in payloads[name]])
+
+
+@profiling.span('load')
+def load_datasets(dataset_dir):
+    """Read every dataset the panels need from ``dataset_dir`` and build the ``DERIVED`` inputs."""
+    datasets = {name: storage.read_dataset(dataset_dir, name)
+                for name in panel_cache.source_datasets(PANELS, DERIVED)}
+    for name, derived in DERIVED.items():
+        datasets[name] = derived.build({source: datasets[source] for source in derived.inputs})
+    return datasets
+
+
+def figure_from_datasets(datasets, max_points=downsample.DEFAULT_MAX_POINTS,
+                         gl_threshold=downsample.DEFAULT_GL_THRESHOLD, method='lttb'):
+    """Build the dashboard figure from ``load_datasets`` output; returns ``(fig, summary)``."""
+    options = {'max_points': max_points, 'gl_threshold': gl_threshold, 'method': method}
+    payloads = {}
+    for panel in PANELS:
+        with profiling.span(panel.name):
+            payloads[panel.name] = panel.build({name: datasets[name] for name in panel.inputs},
+                                               **{name: options[name] for name in panel.options})
+    return assemble_figure(payloads), payloads['business_summary']
+
+
+def build_figure(dataset_dir, cache_dir=None, max_points=downsample.DEFAULT_MAX_POINTS,
+                 gl_threshold=downsample.DEFAULT_GL_THRESHOLD, method='lttb'):
+    """Build the dashboard figure from ``dataset_dir``.
+
+    With ``cache_dir`` set, panel payloads are cached there and only panels
+    whose inputs changed are rebuilt. ``max_points``, ``gl_threshold`` and
+    ``method`` limit the time-series traces (see ``downsample.limit_trace``). Returns
+    ``(fig, summary, rebuilt)``.
+    """
+    cache = panel_cache.PanelCache(cache_dir) if cache_dir else None
+    options = {'max_points': max_points, 'gl_threshold': gl_threshold, 'method': method}
+    payloads, rebuilt = panel_cache.evaluate(PANELS, dataset_dir, cache=cache, options=options,
+                                             derived=DERIVED)
+    return assemble_figure(payloads), payloads['business_summary'], rebuilt
@@ -0,0 +1,215 @@
+"""Parallel generator for the e-commerce dashboard datasets.
+
+The original generator in ``ecommerce-dashboard/data_gen.py`` draws every
+number from the global NumPy random state, region after region, so no part
+of it can run on its own. Here each region and each category is an
+independent job with its own generator, spawned from ``SeedSequence(seed)``
+before any job runs. Jobs can then be spread over a process pool, and the
+output only depends on ``seed`` (and the number of regions and categories),
+never on the number of workers.
+
+Regions beyond the five built-in ones are simulated markets with random
+base sales and growth, so scenarios with thousands of markets can be
+generated.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dashboards import metrics
+
+# Same month-end dates as data_gen.py (11 per year)
+MONTHS = {
+    2024: pd.date_range('2024-01-01', '2024-12-01', freq='ME'),
+    2025: pd.date_range('2025-01-01', '2025-12-01', freq='ME'),
+}
+
+REGIONS = {
+    'North America': {'base_sales': 150000, 'growth': 0.08},
+    'Europe': {'base_sales': 120000, 'growth': 0.12},
+    'Asia Pacific': {'base_sales': 180000, 'growth': 0.15},
+    'Latin America': {'base_sales': 80000, 'growth': 0.10},
+    'Middle East': {'base_sales': 60000, 'growth': 0.07}
+}
+
+CATEGORIES = {
+    'Electronics': {'base_sales': 180000, 'growth': 0.18},
+    'Clothing': {'base_sales': 120000, 'growth': 0.08},
+    'Home & Garden': {'base_sales': 90000, 'growth': 0.12},
+    'Sports': {'base_sales': 75000, 'growth': 0.15},
+    'Books': {'base_sales': 45000, 'growth': 0.05},
+    'Beauty': {'base_sales': 85000, 'growth': 0.22}
+}
+
+# Independent random streams spawned from the root SeedSequence
+STREAMS = ['region_profiles', 'category_profiles', 'regions', 'categories', 'customers']
+
+
+def make_markets(names, rng, count):
+    """``count`` profiles (name -> base_sales, growth) starting with ``names``, then simulated markets."""
+    markets = dict(list(names.items())[:count])
+    first = len(markets)
+    # One (base_sales, growth) row per market, so market i is the same whatever ``count`` is
+    draws = rng.uniform([20000, -0.05], [200000, 0.20], size=(count - first, 2))
+    for i, (base_sales, growth) in enumerate(draws.tolist(), start=first):
+        markets[f'Market {i + 1:05d}'] = {'base_sales': round(base_sales, 2), 'growth': round(growth, 3)}
+    return markets
+
+
+def seasonal_boost(months):
+    """Revenue multiplier of the holiday and summer seasons for an array of month numbers."""
+    return np.select([np.isin(months, [11, 12]), np.isin(months, [6, 7, 8])], [1.3, 1.1], 1.0)
+
+
+def region_sales(regions, profiles, seed_seqs):
+    """Monthly sales rows for 2024 and 2025 of a block of regions, each with its own generator."""
+    dates = MONTHS[2024].append(MONTHS[2025])
+    years = dates.year.to_numpy()
+    boost = seasonal_boost(dates.month)
+    revenue = np.empty((len(regions), len(dates)))
+    orders = np.empty((len(regions), len(dates)), dtype=np.int64)
+    for i, (profile, seed_seq) in enumerate(zip(profiles, seed_seqs)):
+        rng = np.random.default_rng(seed_seq)
+        growth = np.where(years == 2025, profile['growth'], 0.0)
+        revenue[i] = profile['base_sales'] * (1 + growth) * boost * rng.uniform(0.85, 1.15, len(dates))
+        orders[i] = (revenue[i] / rng.uniform(45, 85, len(dates))).astype(np.int64)
+
+    return pd.DataFrame({
+        'date': np.tile(dates, len(regions)),
+        'year': np.tile(years, len(regions)),
+        'month': np.tile(dates.month, len(regions)),
+        'region': np.repeat(regions, len(dates)),
+        'revenue': np.round(revenue, 2).ravel(),
+        'orders': orders.ravel(),
+        'avg_order_value': np.round(revenue / orders, 2).ravel(),
+    })
+
+
+def category_sales(categories, profiles, seed_seqs):
+    """Annual revenue and units sold for 2024 and 2025 of a block of categories."""
+    years = np.array([2024, 2025])
+    revenue = np.empty((len(categories), 2))
+    units_sold = np.empty((len(categories), 2), dtype=np.int64)
+    for i, (profile, seed_seq) in enumerate(zip(profiles, seed_seqs)):
+        rng = np.random.default_rng(seed_seq)
+        revenue[i] = profile['base_sales'] * 12 * np.where(years == 2025, 1 + profile['growth'], 1.0)
+        revenue[i] *= rng.uniform(0.9, 1.1, 2)
+        units_sold[i] = (revenue[i] / rng.uniform(25, 150, 2)).astype(np.int64)
+
+    return pd.DataFrame({
+        'category': np.repeat(categories, 2),
+        'year': np.tile(years, len(categories)),
+        'revenue': np.round(revenue, 2).ravel(),
+        'units_sold': units_sold.ravel(),
+    })
+
+
+def customer_metrics(seed_seq):
+    """Monthly customer acquisition and retention, one row per month."""
+    rng = np.random.default_rng(seed_seq)
+    dates = MONTHS[2024].append(MONTHS[2025])
+    base_customers = np.where(dates.year == 2025, 2500 * 1.25, 2500)
+    seasonal = np.select([np.isin(dates.month, [11, 12]), np.isin(dates.month, [1, 2])], [1.4, 0.8], 1.0)
+
+    new_customers = (base_customers * seasonal * rng.uniform(0.85, 1.15, len(dates))).astype(np.int64)
+    retention_rate = rng.uniform(0.82, 0.88, len(dates))
+    return pd.DataFrame({
+        'date': dates,
+        'year': dates.year,
+        'month': dates.month,
+        'new_customers': new_customers,
+        'retention_rate': np.round(retention_rate * 100, 1),
+        'total_active_customers': new_customers + (base_customers * 8 * retention_rate).astype(np.int64),
+    })
+
+
+def _compensated_sums(values, cells, n_cells):
+    """Sum of ``values`` per cell, in row order with Neumaier compensation.
+
+    That is how the built-in ``sum`` adds floats (Python 3.12+), which the
+    original generator used, so the totals match it to the last bit. The
+    loop runs once per row of the largest cell, over all cells at a time.
+    """
+    order = np.argsort(cells, kind='stable')
+    counts = np.bincount(cells, minlength=n_cells)
+    starts = np.cumsum(counts) - counts
+    totals = np.zeros(n_cells)
+    compensation = np.zeros(n_cells)
+    for k in range(counts.max(initial=0)):
+        live = np.flatnonzero(counts > k)
+        x = values[order[starts[live] + k]]
+        total = totals[live]
+        summed = total + x
+        compensation[live] += np.where(np.abs(total) >= np.abs(x), (total - summed) + x, (x - summed) + total)
+        totals[live] = summed
+    return totals + compensation
+
+
+def regional_performance(monthly_sales, regions):
+    """Year-over-year revenue, growth and 2025 market share per region."""
+    grouped = monthly_sales.groupby(['region', 'year'], observed=True, sort=False)
+    keys = grouped.size().index
+    sums = _compensated_sums(monthly_sales['revenue'].to_numpy(dtype=float), grouped.ngroup().to_numpy(), len(keys))
+    revenue = pd.Series(sums, index=keys).unstack('year').reindex(list(regions))
+    growth = pd.DataFrame(metrics.growth(revenue.to_numpy(), 1), index=revenue.index, columns=revenue.columns)
+    return pd.DataFrame({
+        'region': revenue.index,
+        'revenue_2024': revenue[2024].to_numpy(),
+        'revenue_2025': revenue[2025].to_numpy(),
+        'growth_rate': np.round(growth[2025], 1).to_numpy(),
+        'market_share_2025': np.round(revenue[2025] / math.fsum(revenue[2025]) * 100, 1).to_numpy(),
+    })
+
+
+def _run_blocks(pool, n_blocks, function, names, profiles, seed_seqs):
+    """Call ``function`` on consecutive blocks of the jobs and concatenate the results in order.
+
+    Every job has its own generator, so how jobs are grouped into blocks
+    never changes the output.
+    """
+    edges = np.linspace(0, len(names), min(n_blocks, len(names)) + 1).astype(int)
+    blocks = [(names[start:end], profiles[start:end], seed_seqs[start:end])
+              for start, end in zip(edges[:-1], edges[1:])]
+    if pool is None:
+        results = [function(*block) for block in blocks]
+    else:
+        results = list(pool.map(function, *zip(*blocks)))
+    return pd.concat(results, ignore_index=True)
+
+
+def generate(n_regions=len(REGIONS), n_categories=len(CATEGORIES), seed=42, workers=1):
+    """Generate the four e-commerce datasets; returns a dict of DataFrames by dataset name.
+
+    Region and category jobs run on ``workers`` processes (in this process
+    when ``workers`` is 1); the result is the same for any ``workers``.
+    """
+    (region_profile_seq, category_profile_seq, region_seq, category_seq,
+     customer_seq) = np.random.SeedSequence(seed).spawn(len(STREAMS))
+    regions = make_markets(REGIONS, np.random.default_rng(region_profile_seq), n_regions)
+    categories = make_markets(CATEGORIES, np.random.default_rng(category_profile_seq), n_categories)
+    region_seqs = region_seq.spawn(len(regions))
+    category_seqs = category_seq.spawn(len(categories))
+
+    # A few blocks per worker balances the load without one task per region
+    n_blocks = 1 if workers == 1 else workers * 4
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        monthly_sales = _run_blocks(pool, n_blocks, region_sales,
+                                    list(regions), list(regions.values()), region_seqs)
+        category_table = _run_blocks(pool, n_blocks, category_sales,
+                                     list(categories), list(categories.values()), category_seqs)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Same row order as data_gen.py: by date, then region
+    monthly_sales = monthly_sales.sort_values('date', kind='stable').reset_index(drop=True)
+
+    return {
+        'monthly_sales_data': monthly_sales,
+        'regional_performance': regional_performance(monthly_sales, regions),
+        'category_sales': category_table,
+        'customer_metrics': customer_metrics(customer_seq),
+    }
@@ -0,0 +1,141 @@
+"""Compact serialization of the figure embedded in dashboard HTML.
+
+Plotly already base64-encodes NumPy arrays, but every other numeric array
+(plain lists, panels read back from the panel cache, 64-bit floats that
+would fit in 32 bits) is still written as JSON text. ``encode_arrays``
+turns all of them into typed arrays of the narrowest lossless dtype
+(``{'dtype': 'f4', 'bdata': ...}``, which plotly.js decodes natively).
+
+With ``compress`` the whole figure JSON is gzipped and base64-embedded in
+the page, and decompressed in the browser with ``DecompressionStream``
+before it is plotted. ``payload_sizes`` reports how large the embedded
+figure is in each mode.
+"""
+import base64
+import gzip
+import json
+
+import numpy as np
+
+from dashboards import lazy
+
+pio = lazy.lazy_import('plotly.io')
+
+ARRAY_ENCODINGS = ['json', 'binary']
+
+# Shorter arrays are as small written out as JSON text
+MIN_BINARY_LENGTH = 8
+
+# Integer dtypes plotly.js typed arrays support, narrowest first
+_INT_DTYPES = ['i1', 'u1', 'i2', 'u2', 'i4', 'u4']
+
+
+def _narrowest_dtype(array):
+    if array.dtype.kind in 'iu':
+        low, high = array.min(), array.max()
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return dtype
+        return 'f8'  # plotly.js has no 64-bit integer arrays
+    as_float32 = array.astype('f4')
+    with np.errstate(over='ignore', invalid='ignore'):
+        lossless = np.array_equal(as_float32.astype('f8'), array, equal_nan=True)
+    return 'f4' if lossless else 'f8'
+
+
+def typed_array(values):
+    """``values`` as a plotly.js typed array dict, or None if it is not a numeric 1-D array."""
+    if isinstance(values, dict) and 'bdata' in values:
+        values = decode_array(values)
+    try:
+        array = np.asarray(values)
+    except ValueError:  # Ragged nested lists
+        return None
+    if array.ndim != 1 or array.dtype.kind not in 'iuf' or len(array) < MIN_BINARY_LENGTH:
+        return None
+    dtype = _narrowest_dtype(array)
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.astype(dtype).tobytes()).decode('ascii')}
+
+
+def decode_array(value):
+    """The NumPy array of a ``{'dtype', 'bdata'}`` typed array dict."""
+    array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+    if 'shape' not in value:
+        return array
+    # plotly writes the shape of 2-D arrays as text, e.g. '10, 3'
+    shape = value['shape']
+    if isinstance(shape, str):
+        shape = [int(size) for size in shape.split(',')]
+    return array.reshape(tuple(shape))
+
+
+def encode_arrays(obj):
+    """Copy of a figure dict with every numeric array stored as a typed array."""
+    if isinstance(obj, dict):
+        if 'bdata' in obj:
+            return typed_array(obj) or obj
+        return {key: encode_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        encoded = typed_array(obj)
+        if encoded is not None:
+            return encoded
+        return [encode_arrays(value) for value in obj]
+    return obj
+
+
+def decode_arrays(obj):
+    """Copy of a figure dict with every typed array written out as a list."""
+    if isinstance(obj, dict):
+        if 'bdata' in obj:
+            return decode_array(obj).tolist()
+        return {key: decode_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [decode_arrays(value) for value in obj]
+    return obj
+
+
+def figure_json(fig, arrays='json'):
+    """The figure's JSON as plotly embeds it (``json``) or with all numeric arrays binary."""
+    if arrays not in ARRAY_ENCODINGS:
+        raise ValueError(f'Unknown array encoding {arrays!r}, expected one of {ARRAY_ENCODINGS}')
+    fig_dict = fig.to_plotly_json()
+    if arrays == 'binary':
+        fig_dict = encode_arrays(fig_dict)
+    return pio.json.to_json_plotly(fig_dict)
+
+
+def payload_sizes(fig):
+    """Bytes of the embedded figure with text arrays, as plotly writes it, binary, and gzipped."""
+    text = pio.json.to_json_plotly(decode_arrays(json.loads(figure_json(fig))))
+    binary = figure_json(fig, 'binary')
+    return {
+        'text': len(text.encode('utf-8')),
+        'plotly': len(figure_json(fig).encode('utf-8')),
+        'binary': len(binary.encode('utf-8')),
+        'binary_gzip': len(base64.b64encode(gzip.compress(binary.encode('utf-8')))),
+    }
+
+
+# Runs after Plotly.newPlot has drawn an empty placeholder with the figure's size
+_INFLATE_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+var bytes = Uint8Array.from(atob('%s'), function (c) { return c.charCodeAt(0); });
+var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+return new Response(stream).text().then(function (text) {
+    var fig = JSON.parse(text);
+    return Plotly.react(gd, fig.data, fig.layout, {responsive: true});
+});
+"""
+
+
+def to_html(fig, include_plotlyjs=True, arrays='binary', compress=False):
+    """HTML page for ``fig`` with the given array encoding, optionally gzip-compressed."""
+    payload = figure_json(fig, arrays)
+    if not compress:
+        return pio.to_html(json.loads(payload), include_plotlyjs=include_plotlyjs, validate=False)
+    packed = base64.b64encode(gzip.compress(payload.encode('utf-8'))).decode('ascii')
+    # The placeholder only carries the size, so the page div is laid out as before
+    size = {key: fig.layout[key] for key in ['height', 'width'] if fig.layout[key] is not None}
+    return pio.to_html({'data': [], 'layout': size}, include_plotlyjs=include_plotlyjs, validate=False,
+                       post_script=_INFLATE_SCRIPT % packed)
@@ -0,0 +1,63 @@
+"""Dashboard layouts built once and reused for every figure.
+
+``make_subplots`` and the axis, map and layout updates of a dashboard go
+through plotly's property validation, which costs far more than placing the
+data and gives the same result every time. A ``FigureTemplate`` runs them
+once, keeps the resulting layout as a plain dict, and builds each figure
+from a copy of it and the panel traces with validation turned off::
+
+    template = FigureTemplate(build_layout)          # once per process
+    fig = template.figure([(trace, 1, 1), ...])      # per dataset
+
+Traces must already be valid trace dicts (``go.Scatter(...).to_plotly_json()``
+or a cached panel payload); each is placed in its grid cell the same way
+``add_trace(trace, row=row, col=col)`` would.
+"""
+import copy
+
+from dashboards import lazy
+
+go = lazy.lazy_import('plotly.graph_objects')
+subplots = lazy.lazy_import('plotly.subplots')
+
+
+class FigureTemplate:
+    """The layout of a subplot grid, ready to be filled with traces."""
+
+    def __init__(self, build):
+        """``build()`` returns the dashboard figure with its full layout and no traces."""
+        self._fig = build()
+        self.layout = self._fig.layout.to_plotly_json()
+        self._refs = {}
+
+    def cell_refs(self, row, col):
+        """Trace properties that put a trace in cell ``(row, col)``, e.g. ``{'xaxis': 'x2', 'yaxis': 'y2'}``."""
+        if (row, col) not in self._refs:
+            subplot = self._fig.get_subplot(row, col)
+            if isinstance(subplot, subplots.SubplotXY):
+                refs = {'xaxis': subplot.xaxis.plotly_name.replace('axis', ''),
+                        'yaxis': subplot.yaxis.plotly_name.replace('axis', '')}
+            elif isinstance(subplot, subplots.SubplotDomain):
+                refs = {'domain': {'x': subplot.x, 'y': subplot.y}}
+            else:  # geo, polar, ternary, ...
+                refs = {subplot.plotly_name: subplot.plotly_name}
+            self._refs[row, col] = refs
+        return self._refs[row, col]
+
+    def figure(self, traces, **layout_updates):
+        """A new figure with ``traces``, a list of ``(trace, row, col)``, on a copy of the layout.
+
+        ``layout_updates`` (e.g. per-dataset annotations) are validated and
+        merged like ``update_layout`` arguments; nothing else is validated.
+        """
+        data = [dict(trace, **copy.deepcopy(self.cell_refs(row, col))) for trace, row, col in traces]
+        layout = copy.deepcopy(self.layout)
+        if layout_updates:
+            # Only the updated properties go through update_layout, which merges
+            # them into the template's values (e.g. the subplot title
+            # annotations) exactly as on a figure built from scratch
+            updated = go.Figure(layout={key: layout[key] for key in layout_updates if key in layout})
+            updated.update_layout(**layout_updates)
+            merged = updated.layout.to_plotly_json()
+            layout.update({key: merged[key] for key in layout_updates})
+        return go.Figure(data=data, layout=layout, _validate=False)
@@ -0,0 +1,29 @@
+"""Deferred imports for the heavy plotting and Arrow dependencies.
+
+``lazy_import('plotly.graph_objects')`` returns the module object at once
+but only executes it the first time one of its attributes is used, so
+modules that merely define panels, schemas or command-line options can be
+imported without paying for plotly. The parent package of a dotted name is
+imported as usual. ``python -m dashboards.startup`` reports what importing
+each entry point costs.
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Module ``name``, executed on first attribute access (or the module itself if already imported)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,202 @@
+"""Rolling-window, month-over-month and year-over-year metrics of time series.
+
+A long table (one row per date, or per date and group) is laid out as a
+``Panel``: a 2-D array with one row per group and one column per month (or
+year), from the first period seen to the last, with the rows of each
+period summed. Every metric is then one NumPy operation along the period
+axis, whatever the number of groups and years::
+
+    panel = to_panel(monthly_sales, 'revenue', date='date', by='region')
+    growth(panel.values, 12)          # year-over-year growth in %, per region and month
+    rolling_sum(panel.values, 3)      # rolling 3-month revenue
+
+Periods without rows are NaN rather than zero, so windows and lags
+always span calendar months rather than rows, and a gap makes the growth
+and windows that reach it NaN instead of a drop to nothing. ``metrics``
+returns all of them as a long table, and ``cohort_retention`` measures
+retention from the transactions themselves::
+
+    python -m dashboards.metrics ecommerce-dashboard/datasets monthly_sales_data --value revenue --by region
+    python -m dashboards.metrics sales-customer-dashboard/datasets sales_transactions \\
+        --value invoice_amount --date invoice_date --retention customer_id
+
+The panel holds groups x periods floats: 100,000 customers over ten years
+of months take about 100 MB.
+"""
+import argparse
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from dashboards import storage
+
+# NumPy unit of each period length, and the periods in a year
+FREQS = {'M': 'datetime64[M]', 'Y': 'datetime64[Y]'}
+PERIODS_PER_YEAR = {'M': 12, 'Y': 1}
+
+# Rolling sum and moving average windows of ``metrics``, in periods
+DEFAULT_WINDOWS = (3, 12)
+
+Panel = namedtuple('Panel', ['keys', 'periods', 'values', 'observed'])
+Panel.__doc__ = """A time series per group: ``values[group, period]``.
+
+``keys`` is a frame of the group columns with one row per group,
+``periods`` the start of every period, and ``observed`` tells which cells
+had at least one row; the others are NaN.
+"""
+
+
+def _period_numbers(dates, freq):
+    """Periods since 1970 of ``dates``, as integers."""
+    return pd.to_datetime(dates).to_numpy().astype(FREQS[freq]).astype(np.int64)
+
+
+def _group_codes(df, by):
+    """``(codes, keys)``: each row's group number and the group columns, in order of appearance."""
+    if not by:
+        return np.zeros(len(df), dtype=np.intp), pd.DataFrame(index=range(1))
+    grouped = df.groupby(by, sort=False, observed=True)
+    return grouped.ngroup().to_numpy(), grouped.size().index.to_frame(index=False)
+
+
+def to_panel(df, value, date='date', by=None, freq='M'):
+    """Sum column ``value`` of ``df`` by group (the ``by`` columns) and period of ``date``; NaN without rows."""
+    by = [by] if isinstance(by, str) else list(by or [])
+    period = _period_numbers(df[date], freq)
+    codes, keys = _group_codes(df, by)
+    first = int(period.min())
+    n_periods = int(period.max()) - first + 1
+    cell = codes * n_periods + (period - first)
+    size = len(keys) * n_periods
+    values = np.bincount(cell, weights=df[value].to_numpy(dtype=float), minlength=size)
+    observed = np.bincount(cell, minlength=size) > 0
+    values[~observed] = np.nan
+    periods = (first + np.arange(n_periods)).astype(FREQS[freq])
+    return Panel(keys, periods, values.reshape(len(keys), n_periods), observed.reshape(len(keys), n_periods))
+
+
+def lag(values, periods):
+    """``values`` shifted ``periods`` columns later; the first ``periods`` columns are NaN."""
+    values = np.asarray(values, dtype=float)
+    shifted = np.full_like(values, np.nan)
+    if periods < values.shape[-1]:
+        shifted[..., periods:] = values[..., :values.shape[-1] - periods]
+    return shifted
+
+
+def growth(values, periods):
+    """Growth in % over ``periods`` columns earlier (12 for year-over-year on months); NaN without a base."""
+    values = np.asarray(values, dtype=float)
+    previous = lag(values, periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous != 0, (values - previous) / previous * 100, np.nan)
+
+
+def rolling_sum(values, window):
+    """Sum of the last ``window`` columns, NaN until a whole window is available."""
+    values = np.asarray(values, dtype=float)
+    rolled = np.full_like(values, np.nan)
+    if window <= values.shape[-1]:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        rolled[..., window - 1:] = windows.sum(axis=-1)
+    return rolled
+
+
+def moving_average(values, window):
+    """Mean of the last ``window`` columns, NaN until a whole window is available."""
+    return rolling_sum(values, window) / window
+
+
+def cohort_retention(df, customer='customer_id', date='invoice_date', freq='M'):
+    """Share of each cohort active in each period after its first, from the transactions ``df``.
+
+    A customer's cohort is the period of their first row. The result has one
+    row per cohort (its first period) and one column per age in periods;
+    age 0 is always 1.0, and ages past the last period in ``df`` are NaN.
+    """
+    period = _period_numbers(df[date], freq)
+    first_period = int(period.min())
+    n_periods = int(period.max()) - first_period + 1
+    codes, uniques = pd.factorize(df[customer])
+    offset = period - first_period
+    cohort = np.full(len(uniques), n_periods, dtype=np.int64)
+    np.minimum.at(cohort, codes, offset)
+
+    # Each customer counts once per period they bought in
+    active = np.unique(codes.astype(np.int64) * n_periods + offset)
+    active_cohort = cohort[active // n_periods]
+    age = active % n_periods - active_cohort
+    counts = np.bincount(active_cohort * n_periods + age, minlength=n_periods * n_periods)
+    counts = counts.reshape(n_periods, n_periods).astype(float)
+
+    sizes = counts[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = counts / sizes[:, None]
+    # Ages the data does not reach yet are unknown, not zero
+    shares[np.arange(n_periods)[:, None] + np.arange(n_periods) >= n_periods] = np.nan
+    periods = (first_period + np.arange(n_periods)).astype(FREQS[freq])
+    return pd.DataFrame(shares[sizes > 0], index=pd.Index(periods[sizes > 0], name='cohort'),
+                        columns=pd.RangeIndex(n_periods, name='age'))
+
+
+def metrics(df, value, date='date', by=None, freq='M', windows=DEFAULT_WINDOWS):
+    """Growth, rolling sums and moving averages of ``value`` per group and period, as a long table.
+
+    One row per group and period that has data, with the period's total
+    ``value``, ``previous_month`` and ``mom_growth`` (monthly ``freq``
+    only), ``previous_year`` and ``yoy_growth``, and ``rolling_<n>`` and
+    ``moving_average_<n>`` for each window of ``windows`` periods.
+    """
+    panel = to_panel(df, value, date=date, by=by, freq=freq)
+    columns = {value: panel.values}
+    if freq == 'M':
+        columns['previous_month'] = lag(panel.values, 1)
+        columns['mom_growth'] = growth(panel.values, 1)
+    columns['previous_year'] = lag(panel.values, PERIODS_PER_YEAR[freq])
+    columns['yoy_growth'] = growth(panel.values, PERIODS_PER_YEAR[freq])
+    for window in windows:
+        columns[f'rolling_{window}'] = rolling_sum(panel.values, window)
+        columns[f'moving_average_{window}'] = moving_average(panel.values, window)
+
+    observed = panel.observed.ravel()
+    n_groups, n_periods = panel.values.shape
+    table = panel.keys.iloc[np.repeat(np.arange(n_groups), n_periods)[observed]].reset_index(drop=True)
+    table[date] = np.tile(panel.periods.astype('datetime64[ns]'), n_groups)[observed]
+    for name, array in columns.items():
+        table[name] = array.ravel()[observed]
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute rolling, MoM and YoY metrics of a stored dataset.')
+    parser.add_argument('dataset_dir', help='Folder with the datasets, e.g. ecommerce-dashboard/datasets')
+    parser.add_argument('name', help='Dataset name, e.g. monthly_sales_data or sales_transactions')
+    parser.add_argument('--value', required=True, help='Column to sum per period')
+    parser.add_argument('--date', default='date', help="Date column (default: 'date')")
+    parser.add_argument('--by', nargs='*', default=[], help='Group columns, e.g. region or customer_id')
+    parser.add_argument('--freq', choices=list(FREQS), default='M', help="Period length (default: 'M', months)")
+    parser.add_argument('--windows', nargs='*', type=int, default=list(DEFAULT_WINDOWS),
+                        help='Rolling windows in periods (default: 3 12)')
+    parser.add_argument('--retention', default=None, metavar='COLUMN',
+                        help='Also print the cohort retention of the customers in COLUMN')
+    parser.add_argument('--output', default=None, help='Write the metrics table to this CSV file')
+    args = parser.parse_args(argv)
+
+    df = storage.read_dataset(args.dataset_dir, args.name)
+    table = metrics(df, args.value, date=args.date, by=args.by, freq=args.freq, windows=args.windows)
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f'{len(table):,} rows written to {args.output}')
+    else:
+        print(table.to_string(max_rows=40))
+    if args.retention:
+        retention = cohort_retention(df, customer=args.retention, date=args.date, freq=args.freq)
+        print(f'\nShare of each {args.retention} cohort active, by periods since the first:')
+        print((retention * 100).round(1).to_string(na_rep=''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Dependency graph and content-hash cache for dashboard panels.
+
+A dashboard is described as a list of ``Panel`` entries, each naming the
+datasets it reads and a ``build`` function that turns those datasets into a
+JSON-serializable payload (usually a list of trace dicts). ``evaluate``
+hashes every input file, and only panels whose inputs or code changed since
+the last run are rebuilt; the rest are read back from the cache directory.
+
+Panels can also read ``Derived`` inputs, such as an OLAP cube, that are
+built once per evaluation from one or more datasets and shared by every
+panel that names them.
+"""
+import copy
+import hashlib
+import inspect
+import json
+import os
+from collections import namedtuple
+
+from dashboards import lazy, profiling, storage
+
+pio = lazy.lazy_import('plotly.io')
+plotly_utils = lazy.lazy_import('_plotly_utils.utils')
+
+# Bump to invalidate every cached panel after a change outside the build functions
+CACHE_VERSION = 2
+
+Panel = namedtuple('Panel', ['name', 'inputs', 'build', 'options'], defaults=[()])
+Panel.__doc__ = """A dashboard panel: ``build(datasets, **options)`` reads the datasets named in ``inputs``.
+
+``options`` names the build options the panel accepts; their values are
+part of the cache key.
+"""
+
+Derived = namedtuple('Derived', ['inputs', 'build'])
+Derived.__doc__ = """An input computed as ``build(datasets)`` from the datasets named in ``inputs``."""
+
+
+class PanelCache:
+    """Panel payloads stored as ``<panel name>.json`` files in ``directory``."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._digests_path = os.path.join(directory, 'file_digests.json')
+        self._digests = None
+
+    def _load_digests(self):
+        if self._digests is None:
+            try:
+                with open(self._digests_path) as f:
+                    self._digests = json.load(f)
+            except (OSError, ValueError):
+                self._digests = {}
+        return self._digests
+
+    def file_digest(self, path):
+        """Return the SHA-256 of ``path``, reusing the stored one if size and mtime match.
+
+        For a directory (an ``npy`` column store) it is the hash of its files' digests.
+        """
+        if os.path.isdir(path):
+            sha = hashlib.sha256()
+            for file in storage.dataset_files(path):
+                sha.update(f'{os.path.basename(file)}={self.file_digest(file)}'.encode())
+            return sha.hexdigest()
+        stat = os.stat(path)
+        digests = self._load_digests()
+        key = os.path.abspath(path)
+        known = digests.get(key)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digests[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha.hexdigest()}
+        return digests[key]['sha256']
+
+    def get(self, name, key):
+        """Return the cached payload of panel ``name`` if it was stored under ``key``."""
+        try:
+            with open(os.path.join(self.directory, name + '.json')) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry['payload'] if entry.get('key') == key else None
+
+    def put(self, name, key, payload):
+        """Store ``payload`` for panel ``name`` under ``key`` and return it as read back.
+
+        NumPy arrays are stored as the typed arrays (``{'dtype', 'bdata'}``)
+        plotly embeds for them, so a cached panel gives the same figure as a
+        freshly built one.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        payload = copy.deepcopy(payload)
+        plotly_utils.convert_to_base64(payload)
+        text = pio.json.to_json_plotly({'key': key, 'payload': payload}, engine='json')
+        path = os.path.join(self.directory, name + '.json')
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
+        return json.loads(text)['payload']
+
+    def save(self):
+        """Persist the file digest table."""
+        if self._digests is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._digests_path, 'w') as f:
+            json.dump(self._digests, f)
+
+
+def panel_key(panel, input_digests, options=None):
+    """Hash of the panel's code, build options and the contents of its inputs."""
+    sha = hashlib.sha256()
+    sha.update(f'{CACHE_VERSION}:{panel.name}'.encode())
+    sha.update(inspect.getsource(panel.build).encode())
+    for name in panel.inputs:
+        sha.update(f'{name}={input_digests[name]}'.encode())
+    for name, value in sorted((options or {}).items()):
+        sha.update(f'{name}={value!r}'.encode())
+    return sha.hexdigest()
+
+
+def source_datasets(panels, derived=None):
+    """Names of the stored datasets the panels read, directly or through ``derived`` inputs."""
+    derived = derived or {}
+    names = set()
+    for panel in panels:
+        for name in panel.inputs:
+            names.update(derived[name].inputs if name in derived else [name])
+    return sorted(names)
+
+
+@profiling.span('panels')
+def evaluate(panels, dataset_dir, cache=None, options=None, derived=None):
+    """Build the payload of every panel, reusing cached ones whose inputs are unchanged.
+
+    ``options`` holds build options; each panel receives the ones listed in
+    its ``options``. ``derived`` maps input names to ``Derived`` entries.
+    Datasets are only loaded if at least one stale panel needs them. Returns
+    ``(payloads, rebuilt)``: a dict of payloads by panel name and the list of
+    panel names that had to be rebuilt.
+    """
+    options = options or {}
+    derived = derived or {}
+    paths = {name: storage.find_dataset(dataset_dir, name)[0]
+             for name in source_datasets(panels, derived)}
+
+    loaded = {}
+
+    def datasets(names):
+        for name in names:
+            if name in loaded:
+                continue
+            if name in derived:
+                loaded[name] = derived[name].build(datasets(derived[name].inputs))
+            else:
+                loaded[name] = storage.read_dataset(dataset_dir, name)
+        return {name: loaded[name] for name in names}
+
+    def digest(name):
+        if name not in derived:
+            return cache.file_digest(paths[name])
+        sha = hashlib.sha256(inspect.getsource(derived[name].build).encode())
+        for source in derived[name].inputs:
+            sha.update(f'{source}={cache.file_digest(paths[source])}'.encode())
+        return sha.hexdigest()
+
+    payloads = {}
+    rebuilt = []
+    for panel in panels:
+        with profiling.span(panel.name):
+            panel_options = {name: options[name] for name in panel.options if name in options}
+            if cache is None:
+                payloads[panel.name] = panel.build(datasets(panel.inputs), **panel_options)
+                rebuilt.append(panel.name)
+                continue
+            digests = {name: digest(name) for name in panel.inputs}
+            key = panel_key(panel, digests, panel_options)
+            payload = cache.get(panel.name, key)
+            if payload is None:
+                payload = cache.put(panel.name, key, panel.build(datasets(panel.inputs), **panel_options))
+                rebuilt.append(panel.name)
+            payloads[panel.name] = payload
+
+    if cache is not None:
+        cache.save()
+    return payloads, rebuilt
@@ -0,0 +1,258 @@
+"""Timing spans and optional profiles for one run of a dashboard script.
+
+Library code marks its stages with ``span``; the scripts mark their
+top-level blocks with ``stage``. Both do nothing unless a ``Run`` is active,
+which the scripts start from their profiling options::
+
+    python sales-customer-dashboard/viz.py --timings --timings-json build/sales-viz.json
+    python ecommerce-dashboard/data_gen.py --timings --tracemalloc
+    python ecommerce-dashboard/viz.py --cprofile build/ecommerce-viz.prof --timings
+
+Spans nest: a span opened inside another is recorded under its path
+(``figure/traces``), and the summary adds up repeated spans (one per batch
+or panel, say) by path. ``--tracemalloc`` adds the peak of Python
+allocations within each span, and ``--cprofile`` profiles the whole run,
+writes a ``pstats`` dump and lists the slowest functions. Both slow the run
+down, so the span times they report are only comparable to each other.
+"""
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Functions listed in the summary and the report with --cprofile
+TOP_FUNCTIONS = 20
+
+# The active run, if any; spans outside a run are not recorded
+_active = None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Run:
+    """The timing spans, and optionally the profile, of one script run."""
+
+    def __init__(self, name, cprofile=None, trace_memory=False):
+        """``cprofile`` is the path of the ``pstats`` dump to write, or None to skip profiling."""
+        self.name = name
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.spans = []
+        self.seconds = None
+        self._stack = []
+        self._stage = None
+        self._profile = None
+        self._started = None
+        self._start = None
+
+    def start(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError(f'Run {_active.name!r} is already active')
+        _active = self
+        self._started = datetime.datetime.now(datetime.timezone.utc)
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.cprofile:
+            import cProfile  # Only loaded when profiling
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        global _active
+        self.end_stage()
+        self.seconds = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile)
+        if self.trace_memory:
+            tracemalloc.stop()
+        _active = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextmanager
+    def span(self, name):
+        """Time the block as span ``name``, nested under the span that is open."""
+        path = '/'.join([record['path'] for record in self._stack[-1:]] + [name])
+        record = {'path': path, 'name': name, 'depth': len(self._stack),
+                  'start': time.perf_counter() - self._start, 'seconds': None}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+            tracemalloc.reset_peak()
+            record['_base'] = record['_peak'] = current
+        self.spans.append(record)
+        self._stack.append(record)
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - self._start - record['start']
+            self._stack.pop()
+            if self.trace_memory:
+                # reset_peak() in nested spans cleared the allocator's peak, so
+                # every span keeps the highest value seen and hands it upwards
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(record.pop('_peak'), peak)
+                base = record.pop('_base')
+                record['peak_bytes'] = peak - base
+                record['net_bytes'] = current - base
+                if self._stack:
+                    self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+
+    def stage(self, name):
+        """End the current stage, if any, and start a top-level span ``name``.
+
+        For scripts that run top to bottom: each ``stage`` call marks where
+        the next block begins, without wrapping it in a ``with``.
+        """
+        self.end_stage()
+        self._stage = self.span(name)
+        self._stage.__enter__()
+
+    def end_stage(self):
+        if self._stage is not None:
+            self._stage.__exit__(None, None, None)
+            self._stage = None
+
+    def summary(self):
+        """One row per span path, in the order first opened, with the calls and time added up."""
+        rows = {}
+        for record in self.spans:
+            row = rows.setdefault(record['path'], {'path': record['path'], 'name': record['name'],
+                                                   'depth': record['depth'], 'calls': 0, 'seconds': 0.0})
+            row['calls'] += 1
+            row['seconds'] += record['seconds']
+            if 'peak_bytes' in record:
+                row['peak_bytes'] = max(row.get('peak_bytes', 0), record['peak_bytes'])
+        for row in rows.values():
+            row['share'] = row['seconds'] / self.seconds if self.seconds else 0.0
+        return list(rows.values())
+
+    def functions(self, top=TOP_FUNCTIONS):
+        """The ``top`` functions by cumulative time in the cProfile profile, or [] without one."""
+        if self._profile is None:
+            return []
+        import pstats
+        stats = pstats.Stats(self._profile).stats
+        rows = []
+        for (filename, line, function), (_, calls, self_seconds, cumulative, _) in stats.items():
+            rows.append({'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+                         'self_seconds': self_seconds, 'cumulative_seconds': cumulative})
+        return sorted(rows, key=lambda row: -row['cumulative_seconds'])[:top]
+
+    def report(self):
+        """The machine-readable report of the run: its spans, their summary and the top functions."""
+        return {
+            'name': self.name,
+            'argv': sys.argv[1:],
+            'started': self._started.isoformat(),
+            'python': sys.version.split()[0],
+            'seconds': self.seconds,
+            'peak_rss': peak_rss(),
+            'tracemalloc': self.trace_memory,
+            'cprofile': self.cprofile,
+            'spans': self.spans,
+            'summary': self.summary(),
+            'functions': self.functions(),
+        }
+
+    def write_report(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self, file=None):
+        file = file or sys.stdout
+        summary = self.summary()
+        print(f"\n{'span':40} {'calls':>6} {'time':>10} {'share':>6} {'peak mem':>10}", file=file)
+        for row in summary:
+            peak = f"{row['peak_bytes'] / 1e6:,.1f} MB" if 'peak_bytes' in row else ''
+            print(f"{'  ' * row['depth'] + row['name']:40.40} {row['calls']:6,} {row['seconds']:9.3f}s "
+                  f"{row['share']:6.1%} {peak:>10}".rstrip(), file=file)
+        outside = self.seconds - sum(row['seconds'] for row in summary if row['depth'] == 0)
+        print(f"{'(outside spans)':40} {'':6} {outside:9.3f}s {outside / self.seconds:6.1%}", file=file)
+        rss = peak_rss()
+        print(f"{'total':40} {'':6} {self.seconds:9.3f}s {'':6} "
+              f"{f'{rss / 1e6:,.0f} MB RSS' if rss else '':>10}".rstrip(), file=file)
+        functions = self.functions()
+        if functions:
+            print(f"\n{'function (cProfile, by cumulative time)':60} {'calls':>10} {'self':>9} {'cumul.':>9}",
+                  file=file)
+            for row in functions:
+                print(f"{row['function']:60.60} {row['calls']:10,} {row['self_seconds']:8.3f}s "
+                      f"{row['cumulative_seconds']:8.3f}s", file=file)
+
+
+@contextmanager
+def span(name):
+    """Time the block as span ``name`` of the active run; does nothing outside a run."""
+    if _active is None:
+        yield None
+        return
+    with _active.span(name) as record:
+        yield record
+
+
+def stage(name):
+    """Start top-level span ``name`` of the active run (see ``Run.stage``); does nothing outside a run."""
+    if _active is not None:
+        _active.stage(name)
+
+
+def add_arguments(parser):
+    """Add the ``--timings``, ``--timings-json``, ``--cprofile`` and ``--tracemalloc`` options."""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--timings', action='store_true',
+                       help='Print the time spent in each stage when done')
+    group.add_argument('--timings-json', default=None, metavar='PATH',
+                       help='Write the stage timings of this run to a JSON report')
+    group.add_argument('--cprofile', default=None, metavar='PATH',
+                       help='Profile the run with cProfile, write the pstats dump to PATH '
+                            'and add the slowest functions to the timings')
+    group.add_argument('--tracemalloc', action='store_true',
+                       help='Add the peak Python memory allocated within each stage to the timings')
+
+
+def start(args, name):
+    """Start a ``Run`` named ``name`` if any profiling option is set in ``args``; returns it or None."""
+    if not (args.timings or args.timings_json or args.cprofile or args.tracemalloc):
+        return None
+    return Run(name, cprofile=args.cprofile, trace_memory=args.tracemalloc).start()
+
+
+def finish(run, args):
+    """Stop ``run`` (if any) and print or write its report as ``args`` asks."""
+    if run is None:
+        return
+    run.stop()
+    if args.timings or not args.timings_json:
+        run.print_summary()
+    if args.timings_json:
+        run.write_report(args.timings_json)
+        print(f'Timings written to {args.timings_json}')
+    if args.cprofile:
+        print(f'cProfile stats written to {args.cprofile} (python -m pstats {args.cprofile})')
@@ -0,0 +1,230 @@
+"""Render dashboards for many dataset directories in parallel.
+
+Each dataset directory (one per tenant or region) holds the datasets of
+either or both dashboards. Every dashboard whose datasets are present is
+rendered as a separate job, and jobs are spread over a process pool::
+
+    python -m dashboards.render tenants/*/ --output-dir build --workers 8
+
+A timing line is printed per job, followed by a failure report; the exit
+status is non-zero if any job failed. With ``--plotlyjs shared`` the
+plotly.js bundle is written once to ``<output-dir>/assets`` and every
+dashboard references it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dashboards import assets, downsample, ecommerce, figure_json, panel_cache, sales, storage
+
+Dashboard = namedtuple('Dashboard', ['inputs', 'filename', 'render'])
+
+Job = namedtuple('Job', ['kind', 'dataset_dir', 'output', 'options', 'html_options'])
+
+
+def render_ecommerce(dataset_dir, output, cache_dir=None, max_points=downsample.DEFAULT_MAX_POINTS,
+                     method='lttb', **html_options):
+    """Render the e-commerce dashboard from ``dataset_dir`` to ``output``.
+
+    ``html_options`` go to ``assets.write_html``; returns its byte savings.
+    """
+    fig, _, _ = ecommerce.build_figure(dataset_dir, cache_dir=cache_dir, max_points=max_points, method=method)
+    return assets.write_html(fig, output, **html_options)
+
+
+def render_sales(dataset_dir, output, stream=False, batch_size=storage.DEFAULT_BATCH_SIZE,
+                 max_points=downsample.DEFAULT_MAX_POINTS, method='lttb', **html_options):
+    """Render the sales customer profiling dashboard from ``dataset_dir`` to ``output``.
+
+    ``html_options`` go to ``assets.write_html``; returns its byte savings.
+    """
+    aggregates = sales.load_aggregates(dataset_dir, stream=stream, batch_size=batch_size)
+    fig = sales.build_figure(aggregates, max_points=max_points, method=method)
+    return assets.write_html(fig, output, **html_options)
+
+
+DASHBOARDS = {
+    'ecommerce': Dashboard(
+        panel_cache.source_datasets(ecommerce.PANELS, ecommerce.DERIVED),
+        'ecommerce_dashboard.html',
+        render_ecommerce,
+    ),
+    'sales': Dashboard(
+        ['sales_transactions', 'monthly_sales_summary'],
+        'sales_customer_profiling_dashboard.html',
+        render_sales,
+    ),
+}
+
+
+def has_datasets(dataset_dir, names):
+    """Whether every dataset in ``names`` is stored in ``dataset_dir``, in any format."""
+    for name in names:
+        try:
+            storage.find_dataset(dataset_dir, name)
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def tenant_name(dataset_dir):
+    """Name for a dataset directory's outputs; ``acme/datasets`` is named ``acme``."""
+    path = os.path.normpath(os.path.abspath(dataset_dir))
+    if os.path.basename(path) == 'datasets':
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+def plan_jobs(dataset_dirs, output_dir=None, kinds=tuple(DASHBOARDS), use_cache=True, stream=False,
+              html_options=None, downsample_options=None):
+    """Return one ``Job`` per dashboard kind whose datasets exist in each directory.
+
+    Outputs go to ``<output_dir>/<tenant>/<dashboard file>``, or next to the
+    dataset directory when ``output_dir`` is not given. ``html_options`` are
+    passed to ``assets.write_html`` and ``downsample_options`` (``max_points``,
+    ``method``) to the figure builders of every job.
+    """
+    jobs = []
+    for dataset_dir in dataset_dirs:
+        target = (os.path.join(output_dir, tenant_name(dataset_dir)) if output_dir
+                  else os.path.dirname(os.path.normpath(os.path.abspath(dataset_dir))))
+        for kind in kinds:
+            dashboard = DASHBOARDS[kind]
+            if not has_datasets(dataset_dir, dashboard.inputs):
+                continue
+            if kind == 'ecommerce':
+                options = {'cache_dir': os.path.join(target, '.panel_cache') if use_cache else None}
+            else:
+                options = {'stream': stream}
+            options.update(downsample_options or {})
+            jobs.append(Job(kind, dataset_dir, os.path.join(target, dashboard.filename), options,
+                            html_options or {}))
+    return jobs
+
+
+def run_job(job):
+    """Render one job and return a result dict with its timing and any error."""
+    start = time.perf_counter()
+    result = {'kind': job.kind, 'dataset_dir': job.dataset_dir, 'output': job.output}
+    try:
+        os.makedirs(os.path.dirname(job.output), exist_ok=True)
+        saved = DASHBOARDS[job.kind].render(job.dataset_dir, job.output, **job.options, **job.html_options)
+        result['ok'] = True
+        result['bytes'] = os.path.getsize(job.output)
+        result['saved_bytes'] = saved
+    except Exception as exc:
+        result['ok'] = False
+        result['error'] = f'{type(exc).__name__}: {exc}'
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_jobs(jobs, workers=None, on_result=None):
+    """Run ``jobs`` on a pool of ``workers`` processes (serially when ``workers`` is 1).
+
+    ``on_result`` is called with each result as soon as its job finishes.
+    Results are returned in the order of ``jobs``.
+    """
+    results = [None] * len(jobs)
+    if workers == 1:
+        for i, job in enumerate(jobs):
+            results[i] = run_job(job)
+            if on_result:
+                on_result(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as exc:  # The worker process itself died
+                job = jobs[i]
+                results[i] = {'kind': job.kind, 'dataset_dir': job.dataset_dir, 'output': job.output,
+                              'ok': False, 'error': f'{type(exc).__name__}: {exc}', 'seconds': 0.0}
+            if on_result:
+                on_result(results[i])
+    return results
+
+
+def print_result(result):
+    status = 'ok' if result['ok'] else 'FAILED'
+    print(f"{status:6} {result['seconds']:7.2f}s  {result['kind']:9} {result['output']}")
+
+
+def print_report(results, wall_seconds):
+    failures = [result for result in results if not result['ok']]
+    busy = sum(result['seconds'] for result in results)
+    print(f"\nRendered {len(results) - len(failures)}/{len(results)} dashboards "
+          f"in {wall_seconds:.2f}s wall time ({busy:.2f}s of job time)")
+    written = sum(result.get('bytes', 0) for result in results)
+    saved = sum(result.get('saved_bytes', 0) for result in results)
+    if saved:
+        print(f"HTML written: {written / 1e6:.1f} MB, {saved / 1e6:.1f} MB less than embedding "
+              f"plotly.js in every file ({saved / max(1, len(results) - len(failures)) / 1e6:.1f} MB per file)")
+    if failures:
+        print(f"\n{len(failures)} failed:")
+        for result in failures:
+            print(f"- {result['kind']} from {result['dataset_dir']}: {result['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render dashboards for many dataset directories in parallel.')
+    parser.add_argument('dataset_dirs', nargs='+', help='Dataset directories, one per tenant or region')
+    parser.add_argument('--output-dir', default=None,
+                        help='Write <output-dir>/<tenant>/<dashboard>.html (default: next to each dataset directory)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--only', choices=sorted(DASHBOARDS), action='append',
+                        help='Only render this dashboard type (can be repeated)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the e-commerce panel cache')
+    parser.add_argument('--stream', action='store_true', help='Aggregate sales transactions in batches')
+    parser.add_argument('--plotlyjs', choices=assets.PLOTLYJS_MODES, default='embed',
+                        help="How to include plotly.js: 'shared' writes one copy for all dashboards")
+    parser.add_argument('--asset-dir', default=None,
+                        help='Where the shared plotly.js goes (default: <output-dir>/assets, or assets/ next to index.html)')
+    parser.add_argument('--arrays', choices=figure_json.ARRAY_ENCODINGS, default='json',
+                        help="'binary' embeds every numeric array as a base64 typed array")
+    parser.add_argument('--compress', action='store_true', help='Embed each figure gzip-compressed')
+    parser.add_argument('--max-points', type=int, default=downsample.DEFAULT_MAX_POINTS,
+                        help='Downsample time-series traces to at most this many points (default: 2,000)')
+    parser.add_argument('--downsample', choices=downsample.METHODS, default='lttb',
+                        help='Downsampling method for time-series traces')
+    parser.add_argument('--report', default=None, help='Also write the per-job results to this JSON file')
+    args = parser.parse_args(argv)
+
+    html_options = {'plotlyjs': args.plotlyjs, 'arrays': args.arrays, 'compress': args.compress}
+    if args.plotlyjs == 'shared':
+        asset_dir = args.asset_dir or (os.path.join(args.output_dir, 'assets') if args.output_dir
+                                       else assets.DEFAULT_ASSET_DIR)
+        # Write the bundle before the workers start so they never race on it
+        print(f'Shared plotly.js: {assets.ensure_plotlyjs(asset_dir)}')
+        html_options['asset_dir'] = asset_dir
+
+    jobs = plan_jobs(args.dataset_dirs, output_dir=args.output_dir, kinds=args.only or tuple(DASHBOARDS),
+                     use_cache=not args.no_cache, stream=args.stream, html_options=html_options,
+                     downsample_options={'max_points': args.max_points, 'method': args.downsample})
+    if not jobs:
+        print('No dashboard datasets found in the given directories')
+        return 1
+
+    print(f'Rendering {len(jobs)} dashboards with {args.workers} workers')
+    start = time.perf_counter()
+    results = run_jobs(jobs, workers=args.workers, on_result=print_result)
+    print_report(results, time.perf_counter() - start)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
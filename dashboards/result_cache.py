@@ -0,0 +1,378 @@
+"""Content-addressed cache of whole script results, shared by CI and nightly runs.
+
+A run of ``data_gen.py`` or ``viz.py`` is keyed by a hash of everything that
+decides its output: the script's source, its options, the contents of its input
+files and the library version (the source of every ``dashboards`` module
+plus the installed numpy, pandas, plotly, pyarrow and duckdb). When an entry
+with that key exists, its files are copied back and the run's printed
+output is replayed, so generation, aggregation and ``write_html`` are all
+skipped::
+
+    python sales-customer-dashboard/data_gen.py --result-cache .result_cache
+    python sales-customer-dashboard/viz.py --result-cache .result_cache
+    python -m dashboards.result_cache .result_cache        # hit rates and entries
+
+Entries are directories ``<cache>/objects/<key>/`` holding copies of the
+output files and a ``manifest.json``. ``index.json`` records each entry's
+size and last use, and the hits and misses of each script. Once the
+entries add up to more than ``max_bytes``, the least recently used ones are
+deleted. Outputs are copied rather than linked, so appending to a restored
+dataset (``sales_ingest``) cannot change the cached copy.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from dashboards import profiling
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(PACKAGE_DIR)
+
+# Bump to invalidate every entry after a change the key does not cover
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 1_000_000_000
+
+# Installed packages whose version is part of every key
+DEPENDENCIES = ['numpy', 'pandas', 'plotly', 'pyarrow', 'duckdb']
+
+# Options that change how a run is reported or cached, not what it writes
+IGNORED_OPTIONS = {'timings', 'timings_json', 'cprofile', 'tracemalloc', 'result_cache', 'result_cache_size'}
+
+
+def _sha256_file(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def library_version():
+    """Hash of the ``dashboards`` sources and the versions of the packages in ``DEPENDENCIES``."""
+    from importlib import metadata  # Slow to import, and only needed with a cache
+    sha = hashlib.sha256(f'{CACHE_VERSION}:{sys.version_info[:2]}'.encode())
+    for name in sorted(os.listdir(PACKAGE_DIR)):
+        if name.endswith('.py'):
+            sha.update(f'{name}={_sha256_file(os.path.join(PACKAGE_DIR, name))}'.encode())
+    for package in DEPENDENCIES:
+        try:
+            version = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            version = None
+        sha.update(f'{package}={version}'.encode())
+    return sha.hexdigest()
+
+
+def _input_files(inputs):
+    """``(name, path)`` of the files named in ``inputs``; a directory stands for every file under it."""
+    files = []
+    for path in inputs:
+        if not os.path.isdir(path):
+            files.append((os.path.basename(path), path))
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend((os.path.relpath(os.path.join(root, name), path), os.path.join(root, name))
+                         for name in sorted(names))
+    return files
+
+
+def _size(path):
+    """Bytes of a file, or of every file under a directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _copy(source, target):
+    """Copy a file or a directory (such as an ``npy`` column store) over ``target``."""
+    if os.path.isdir(source):
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(source, target)
+    else:
+        shutil.copyfile(source, target)
+
+
+class ResultCache:
+    """Script outputs stored under content hashes in ``directory``, at most ``max_bytes`` in total."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(directory, 'index.json')
+        self._index = None
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self._index_path) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+            for section in ['entries', 'stats', 'digests']:
+                self._index.setdefault(section, {})
+        return self._index
+
+    def save(self):
+        """Persist the index: entry sizes and last use, hit counts and file digests."""
+        if self._index is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self._index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f, indent=1)
+        os.replace(tmp_path, self._index_path)
+
+    def entry_dir(self, key):
+        return os.path.join(self.directory, 'objects', key)
+
+    def file_digest(self, path):
+        """Return the SHA-256 of ``path``, reusing the stored one if size and mtime match."""
+        stat = os.stat(path)
+        digests = self._load_index()['digests']
+        known = digests.get(os.path.abspath(path))
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        sha256 = _sha256_file(path)
+        digests[os.path.abspath(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        return sha256
+
+    def key(self, kind, params, inputs=(), source=None):
+        """Hash of ``kind`` (the script), its ``params``, the contents of ``inputs`` and ``library_version()``.
+
+        ``source`` is the path of the script itself, so that editing it
+        changes the key as editing a ``dashboards`` module does.
+        """
+        sha = hashlib.sha256(f'{kind}:{library_version()}'.encode())
+        if source is not None:
+            sha.update(f'source={_sha256_file(source)}'.encode())
+        sha.update(json.dumps(params, sort_keys=True, default=str).encode())
+        for name, path in _input_files(inputs):
+            sha.update(f'{name}={self.file_digest(path)}'.encode())
+        return sha.hexdigest()
+
+    def _count(self, kind, outcome):
+        stats = self._load_index()['stats'].setdefault(kind, {'hits': 0, 'misses': 0})
+        stats[outcome] += 1
+
+    def restore(self, kind, key, output_dir):
+        """Copy the files of entry ``key`` into ``output_dir`` and return its manifest, or None on a miss."""
+        index = self._load_index()
+        try:
+            with open(os.path.join(self.entry_dir(key), 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None or key not in index['entries']:
+            self._count(kind, 'misses')
+            return None
+        from dashboards import storage  # Loads pandas, which a miss or --help may not need
+        with profiling.span('restore'):
+            os.makedirs(output_dir, exist_ok=True)
+            for name in manifest['files']:
+                target = os.path.join(output_dir, name)
+                _copy(os.path.join(self.entry_dir(key), name), target)
+                # Batches appended since belong to the replaced dataset, as write_dataset drops them
+                storage.drop_parts(target)
+        index['entries'][key]['last_used'] = time.time()
+        self._count(kind, 'hits')
+        return manifest
+
+    def store(self, kind, key, files, output='', seconds=None):
+        """Store copies of ``files`` (and the printed ``output``) as entry ``key``, then evict.
+
+        Returns the keys evicted, or None if the entry alone is larger than
+        ``max_bytes`` and was not stored (older entries are still evicted).
+        """
+        size = sum(_size(path) for path in files) + len(output.encode())
+        if size > self.max_bytes:
+            self.evict()
+            return None
+        with profiling.span('store'):
+            tmp_dir = f'{self.entry_dir(key)}.{os.getpid()}.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            for path in files:
+                _copy(path, os.path.join(tmp_dir, os.path.basename(path)))
+            manifest = {'kind': kind, 'files': [os.path.basename(path) for path in files], 'output': output,
+                        'seconds': seconds, 'created': time.time()}
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            os.replace(tmp_dir, self.entry_dir(key))
+        self._load_index()['entries'][key] = {'kind': kind, 'bytes': size, 'last_used': time.time()}
+        return self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the rest fit in ``max_bytes``; returns their keys."""
+        entries = self._load_index()['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+        evicted = []
+        for key in sorted(entries, key=lambda key: entries[key]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)['bytes']
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            evicted.append(key)
+        return evicted
+
+    def entries(self):
+        """Size, script and last use of every entry by key, most recently used first."""
+        entries = self._load_index()['entries']
+        return {key: entries[key] for key in sorted(entries, key=lambda key: -entries[key]['last_used'])}
+
+    def clear(self):
+        """Delete every entry; the hit counts are kept."""
+        index = self._load_index()
+        for key in list(index['entries']):
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        index['entries'] = {}
+
+    def stats(self):
+        """Hits, misses and hit rate per script and in total, plus the entries' count and bytes."""
+        index = self._load_index()
+        rows = {kind: dict(counts) for kind, counts in sorted(index['stats'].items())}
+        rows['total'] = {outcome: sum(counts[outcome] for counts in index['stats'].values())
+                         for outcome in ['hits', 'misses']}
+        for counts in rows.values():
+            lookups = counts['hits'] + counts['misses']
+            counts['hit_rate'] = counts['hits'] / lookups if lookups else 0.0
+        return {'scripts': rows, 'entries': len(index['entries']),
+                'bytes': sum(entry['bytes'] for entry in index['entries'].values()), 'max_bytes': self.max_bytes}
+
+    def summary_line(self, kind):
+        """One line with the hit rate of ``kind`` and the size of the cache."""
+        stats = self.stats()
+        counts = stats['scripts'].get(kind, {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+        return (f"{counts['hits']:,} of {counts['hits'] + counts['misses']:,} lookups hit "
+                f"({counts['hit_rate']:.0%}); {stats['entries']:,} entries, "
+                f"{stats['bytes'] / 1e6:,.1f} of {stats['max_bytes'] / 1e6:,.0f} MB")
+
+
+def _files(files):
+    return f"{len(files)} file{'' if len(files) == 1 else 's'}"
+
+
+class _Tee:
+    """A stand-in for ``sys.stdout`` that also keeps what is written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class CachedRun:
+    """One script run looked up in a ``ResultCache``; ``hit`` tells whether its outputs were restored.
+
+    Without a cache (``cache`` is None) it never hits and ``finish`` does nothing.
+    """
+
+    def __init__(self, cache=None, kind=None, key=None, output_dir=None):
+        self.cache = cache
+        self.kind = kind
+        self.key = key
+        self.output_dir = output_dir
+        self.hit = False
+        self._tee = None
+        self._start = time.perf_counter()
+        if cache is None:
+            return
+        manifest = cache.restore(kind, key, output_dir)
+        cache.save()
+        if manifest is not None:
+            self.hit = True
+            sys.stdout.write(manifest['output'])
+            saved = f", saved ~{manifest['seconds']:.1f}s" if manifest.get('seconds') is not None else ''
+            print(f"\nResult cache: restored {_files(manifest['files'])} to {output_dir} "
+                  f"(key {key[:12]}{saved}); {cache.summary_line(kind)}")
+        else:
+            # Record what the run prints, to replay it on a hit
+            self._tee = sys.stdout = _Tee(sys.stdout)
+
+    def finish(self, files):
+        """Store ``files`` (the run's outputs, all in ``output_dir``) and what the run printed."""
+        if self.cache is None or self.hit:
+            return
+        sys.stdout = self._tee.stream
+        seconds = time.perf_counter() - self._start
+        evicted = self.cache.store(self.kind, self.key, files, output=''.join(self._tee.parts), seconds=seconds)
+        self.cache.save()
+        if evicted is None:
+            outcome = 'too large to store'
+        else:
+            outcome = f"stored{f', {len(evicted)} old entries evicted' if evicted else ''}"
+        print(f"\nResult cache: {_files(files)} {outcome} (key {self.key[:12]}); "
+              f"{self.cache.summary_line(self.kind)}")
+
+
+def add_arguments(parser):
+    """Add the ``--result-cache`` and ``--result-cache-size`` options."""
+    group = parser.add_argument_group('result cache')
+    group.add_argument('--result-cache', default=None, metavar='DIR',
+                       help='Reuse the outputs of an earlier run with the same options, inputs and code '
+                            'from this cache directory, or store them there')
+    group.add_argument('--result-cache-size', type=float, default=DEFAULT_MAX_BYTES / 1e6, metavar='MB',
+                       help='Evict the least recently used results above this size (default: 1,000 MB)')
+
+
+def options(args, ignore=()):
+    """The options in ``args`` that can change a run's outputs, as a dict for ``ResultCache.key``."""
+    return {name: value for name, value in vars(args).items()
+            if name not in IGNORED_OPTIONS and name not in ignore}
+
+
+def start(args, script, output_dir, inputs=(), ignore=()):
+    """Look the run of ``script`` up in the cache given by ``args.result_cache`` and return a ``CachedRun``.
+
+    ``output_dir`` is where the run writes its outputs, ``inputs`` the files
+    or directories it reads and ``ignore`` further options of ``args`` that
+    do not change the outputs. On a hit the outputs are already restored.
+    """
+    if not args.result_cache:
+        return CachedRun()
+    cache = ResultCache(args.result_cache, max_bytes=int(args.result_cache_size * 1e6))
+    kind = os.path.relpath(os.path.abspath(script), ROOT_DIR)
+    key = cache.key(kind, options(args, ignore), inputs, source=os.path.abspath(script))
+    return CachedRun(cache, kind, key, output_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report the hit rates and entries of a result cache.')
+    parser.add_argument('directory', help='The cache directory given to --result-cache')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--clear', action='store_true', help='Delete every entry after reporting')
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.directory)
+    stats = cache.stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"{'script':44} {'hits':>7} {'misses':>7} {'hit rate':>8}")
+        for kind, counts in stats['scripts'].items():
+            print(f"{kind:44.44} {counts['hits']:7,} {counts['misses']:7,} {counts['hit_rate']:8.0%}")
+        print(f"\n{stats['entries']:,} entries, {stats['bytes'] / 1e6:,.1f} MB")
+        for key, entry in cache.entries().items():
+            used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))
+            print(f"  {key[:12]}  {entry['kind']:40.40} {entry['bytes'] / 1e6:9,.1f} MB  last used {used}")
+    if args.clear:
+        cache.clear()
+        cache.save()
+        print('Cache cleared')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
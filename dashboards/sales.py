@@ -0,0 +1,489 @@
+"""Sales customer profiling dashboard.
+
+The dashboard needs a handful of aggregates (KPI cards, monthly sales,
+per-customer totals, product and customer group totals). They are computed
+from ``sales_transactions`` either in memory (``aggregates_from_frame``) or
+from a stream of record batches (``aggregates_from_batches``) when the file
+is larger than RAM. Both paths share the same exact, integer-cent partial
+totals, so they give identical results. ``aggregates_from_sql`` gets the
+same totals from an embedded SQL engine that reads the stored file itself
+(see ``sales_sql``).
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from dashboards import density, downsample, lazy, profiling, sales_agg, sales_sql, storage
+from dashboards.figure_template import FigureTemplate
+from dashboards.sales_gen import PRODUCT_GROUPS
+from dashboards.topk import TopCustomers, ranking_path
+
+# Loaded when the first figure is built
+go = lazy.lazy_import('plotly.graph_objects')
+subplots = lazy.lazy_import('plotly.subplots')
+
+# Transaction columns the dashboard aggregates read
+AGGREGATE_COLUMNS = ['month', 'customer_id', 'customer_name', 'customer_group',
+                     'product_group', 'invoice_amount']
+
+CUSTOMER_COLUMNS = ['customer_id', 'customer_name', 'customer_group']
+
+# Where the transaction totals are computed: pandas, or SQL over the stored file
+ENGINES = ['pandas'] + sales_sql.ENGINES
+
+# Rows of the "Top Customers by Sales" table, and rows per page of its components version
+DEFAULT_TOP_CUSTOMERS = 6
+DEFAULT_PAGE_SIZE = 25
+
+
+def _product_group_order(totals):
+    extra = sorted(set(totals['product_group'].index) - set(PRODUCT_GROUPS))
+    return PRODUCT_GROUPS + extra
+
+
+def _aggregates(totals, customers, previous_sales, ranking=None):
+    customers = customers.sort_values('customer_id', kind='stable').reset_index(drop=True)
+    monthly_df, customer_df, product_df = sales_agg.finalize(
+        totals, customers, product_groups=_product_group_order(totals)
+    )
+    if previous_sales is not None:
+        monthly_df['total_sales_previous'] = previous_sales.reindex(monthly_df['month']).to_numpy()
+
+    kpis = sales_agg.kpis(totals)
+    kpis['total_customers'] = len(customer_df)
+    return {
+        'kpis': kpis,
+        'monthly': monthly_df,
+        'customers': customer_df,
+        'product_groups': product_df,
+        'customer_group_sales': customer_df.groupby('customer_group')['total_sales'].sum(),
+        # A ranking saved by sales_ingest spares sorting every customer again
+        'top_customers': (TopCustomers.from_frame(customer_df) if ranking is None
+                          else TopCustomers.load(customer_df, ranking)),
+    }
+
+
+def aggregates_from_frame(sales_df, previous_sales=None, ranking=None):
+    """Compute the dashboard aggregates from an in-memory transaction table.
+
+    ``previous_sales`` is an optional Series of last year's sales indexed by
+    month, used for the year-over-year bars. ``ranking`` is the path of a
+    saved customer ranking (see ``TopCustomers.load``).
+    """
+    customers = sales_agg.customers_from_transactions(sales_df).astype({'customer_group': object})
+    return _aggregates(sales_agg.partial_totals(sales_df), customers, previous_sales, ranking)
+
+
+def aggregates_from_batches(batches, previous_sales=None, ranking=None):
+    """Compute the same aggregates as ``aggregates_from_frame`` from record batches.
+
+    Only one batch plus the running totals (one row per month, customer and
+    product group) is held in memory at a time.
+    """
+    totals = None
+    customers = None
+    for batch in batches:
+        totals = sales_agg.combine_totals(totals, sales_agg.partial_totals(batch))
+        batch_customers = batch[CUSTOMER_COLUMNS].drop_duplicates('customer_id').astype(object)
+        customers = (batch_customers if customers is None
+                     else pd.concat([customers, batch_customers]).drop_duplicates('customer_id'))
+    if totals is None:
+        raise ValueError('No transactions to aggregate')
+    return _aggregates(totals, customers, previous_sales, ranking)
+
+
+def aggregates_from_sql(dataset_dir, previous_sales=None, engine='duckdb', batch_size=storage.DEFAULT_BATCH_SIZE,
+                        ranking=None):
+    """Compute the same aggregates as ``aggregates_from_frame`` with a SQL engine.
+
+    The transaction totals are grouped by ``engine`` (one of
+    ``sales_sql.ENGINES``) over the stored ``sales_transactions`` file of
+    ``dataset_dir``; only the grouped rows are loaded into pandas.
+    """
+    totals, customers = sales_sql.partial_totals(dataset_dir, engine, batch_size=batch_size)
+    return _aggregates(totals, customers, previous_sales, ranking)
+
+
+def load_previous_sales(dataset_dir):
+    """Last year's sales by month, from the ``monthly_sales_summary`` dataset."""
+    return storage.read_dataset(
+        dataset_dir, 'monthly_sales_summary', columns=['month', 'total_sales_previous']
+    ).set_index('month')['total_sales_previous']
+
+
+def load_aggregates(dataset_dir, stream=False, batch_size=storage.DEFAULT_BATCH_SIZE, compact=False,
+                    engine='pandas'):
+    """Load the dashboard aggregates from ``dataset_dir``.
+
+    With ``stream`` the transactions are read ``batch_size`` rows at a time
+    instead of all at once. With ``compact`` they are held in the narrowest
+    lossless dtypes (see ``storage.compact_frame``); the totals are summed in
+    cents either way, so the aggregates are the same. Any ``engine`` other
+    than ``pandas`` runs the aggregation as SQL (see ``aggregates_from_sql``);
+    ``stream`` and ``compact`` then do not apply.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+    with profiling.span('load'):
+        previous_sales = load_previous_sales(dataset_dir)
+        if engine == 'pandas' and not stream:
+            sales_df = storage.read_dataset(dataset_dir, 'sales_transactions', columns=AGGREGATE_COLUMNS,
+                                            compact=compact)
+
+    ranking = ranking_path(dataset_dir)
+    with profiling.span('aggregate'):
+        if engine != 'pandas':
+            return aggregates_from_sql(dataset_dir, previous_sales, engine, batch_size=batch_size, ranking=ranking)
+        if stream:
+            # Batches are read as they are aggregated, so the reads are timed in here
+            batches = storage.iter_batches(dataset_dir, 'sales_transactions', columns=AGGREGATE_COLUMNS,
+                                           batch_size=batch_size, compact=compact)
+            return aggregates_from_batches(batches, previous_sales, ranking)
+        return aggregates_from_frame(sales_df, previous_sales, ranking)
+
+
+def dashboard_layout(components=False):
+    """The dashboard grid with its titles, axes and styling, without traces or data annotations.
+
+    With ``components`` the top row holds four indicator cells and the
+    bottom right cell a table, for ``build_figure(components=True)``.
+    """
+    if components:
+        subplot_titles = [
+            '', '', '', '',
+            'Total Sales ($) Over Time',
+            'Sales vs Purchases by Customer', 'Product Group Sales',
+            'Customer Group Distribution', 'Top Customers by Sales'
+        ]
+        specs = [
+            [{"type": "domain"}] * 4,
+            [{"colspan": 4, "secondary_y": True}, None, None, None],
+            [{"colspan": 2}, None, {"type": "pie"}, None],
+            [{"type": "pie"}, None, {"type": "table", "colspan": 2}, None]
+        ]
+    else:
+        subplot_titles = [
+            '', '', '', '',  # Remove title for metrics row
+            'Total Sales ($) Over Time', '', '', '',
+            'Sales vs Purchases by Customer', '', 'Product Group Sales', '',
+            'Customer Group Distribution', '', '', ''
+        ]
+        specs = [
+            [{"colspan": 4}, None, None, None],
+            [{"colspan": 4, "secondary_y": True}, None, None, None],
+            [{"colspan": 2}, None, {"type": "pie"}, None],
+            [{"type": "pie"}, None, {"colspan": 2}, None]
+        ]
+    fig = subplots.make_subplots(
+        rows=4, cols=4,
+        subplot_titles=subplot_titles,
+        specs=specs,
+        vertical_spacing=0.12,  # Increased spacing
+        horizontal_spacing=0.1,
+        row_heights=[0.12, 0.35, 0.35, 0.18]  # Adjusted heights
+    )
+
+    # Update layout and axes
+    fig.update_xaxes(title_text="Month", row=2, col=1)
+    fig.update_yaxes(title_text="Sales Amount ($)", row=2, col=1)
+
+    fig.update_xaxes(title_text="Number of Purchases", row=3, col=1)
+    fig.update_yaxes(title_text="Total Sales ($)", row=3, col=1)
+
+    # Format y-axis for sales
+    fig.update_yaxes(tickformat="$,.0s", row=2, col=1)
+    fig.update_yaxes(tickformat="$,.0s", row=3, col=1)
+
+    # Update overall layout
+    fig.update_layout(
+        title={
+            'text': "Sales Customer Profiling Dashboard - 2023<br><sup style='font-size:14px'>Created by Rehan Ali</sup>",
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {'size': 24, 'color': '#2c3e50'},  # Reduced main title size
+            'y': 0.98  # Position title higher
+        },
+        height=1100,  # Increased height for better spacing
+        showlegend=True,
+        template='plotly_white',
+        font=dict(family="Arial, sans-serif", size=11),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.1,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig
+
+
+@functools.lru_cache(maxsize=None)
+def figure_template(components=False):
+    """The ``FigureTemplate`` of ``dashboard_layout``, built once per process and layout."""
+    return FigureTemplate(functools.partial(dashboard_layout, components))
+
+
+def customer_density_traces(customer_df, colors, bins=density.DEFAULT_BINS):
+    """The customer scatter binned on a ``bins`` x ``bins`` grid, one trace per customer group.
+
+    Each occupied cell becomes one marker at the mean purchases and sales of
+    its customers, sized by their number; the hover label gives the cell's
+    customer count and totals. All groups share the grid and the size scale.
+    """
+    purchases = customer_df['total_purchases'].to_numpy()
+    sales = customer_df['total_sales'].to_numpy()
+    x_edges, y_edges = density.grid_edges(purchases, sales, bins)
+    groups = customer_df['customer_group'].to_numpy()
+    cells = {group: density.bin_points(purchases[groups == group], sales[groups == group], x_edges, y_edges)
+             for group in customer_df['customer_group'].unique()}
+    max_count = max(group_cells.count.max() for group_cells in cells.values())
+
+    traces = []
+    for group, group_cells in cells.items():
+        traces.append(go.Scatter(
+            x=group_cells.x_mean,
+            y=group_cells.y_mean,
+            mode='markers',
+            name=group,
+            marker=dict(
+                size=density.marker_sizes(group_cells.count, max_count),
+                color=colors.get(group, '#95a5a6'),
+                opacity=0.7,
+                line=dict(width=1, color='white')
+            ),
+            customdata=np.column_stack([group_cells.count, group_cells.x_sum, group_cells.y_sum]),
+            hovertemplate=('%{customdata[0]:,} customers<br>Purchases: %{customdata[1]:,} (avg %{x:,.1f})'
+                           '<br>Sales: $%{customdata[2]:,.0f} (avg $%{y:,.0f})<br>Group: ' + group + '<extra></extra>')
+        ).to_plotly_json())
+    return traces
+
+
+def kpi_indicators(kpis):
+    """The four KPI cards as ``go.Indicator`` trace dicts, left to right."""
+    cards = [
+        (kpis['total_sales'], 'Sum of Invoices', dict(prefix='$', valueformat='.4s')),
+        (kpis['total_invoices'], 'Count of Invoices', dict(valueformat=',d')),
+        (kpis['avg_invoice_amount'], 'Average Invoice Amount', dict(prefix='$', valueformat='.3s')),
+        (kpis['total_customers'], 'Customer Count', dict(valueformat=',d')),
+    ]
+    return [go.Indicator(mode='number', value=value,
+                         title=dict(text=title, font=dict(size=12, color='#34495e')),
+                         number=dict(font=dict(size=28, color='#2c3e50'), **number)).to_plotly_json()
+            for value, title, number in cards]
+
+
+def top_customer_table(table_data, page_size=DEFAULT_PAGE_SIZE, trace_index=None, domain=None):
+    """The top customers as a ``go.Table`` trace dict and its page menu, ``(trace, updatemenus)``.
+
+    The table is filled from the column arrays of ``table_data`` (a
+    ``TopCustomers.top`` frame) and scrolls. With more than ``page_size``
+    rows it shows one page at a time, and ``updatemenus`` holds a dropdown
+    that restyles trace ``trace_index`` to another page; it is placed at the
+    top right of the table's ``domain``. Otherwise ``updatemenus`` is empty.
+    """
+    columns = [table_data['customer_group'].to_numpy(), table_data['customer_name'].to_numpy(),
+               table_data['total_sales'].to_numpy()]
+    n = len(table_data)
+    starts = range(0, n, page_size) if page_size and n > page_size else [0]
+    pages = [[column[start:start + page_size] for column in columns] if len(starts) > 1 else columns
+             for start in starts]
+
+    trace = go.Table(
+        header=dict(values=['<b>Group</b>', '<b>Customer</b>', '<b>Sales</b>'],
+                    fill_color='rgba(52, 73, 94, 0.8)', font=dict(size=11, color='white'),
+                    align=['left', 'left', 'right']),
+        cells=dict(values=pages[0], format=[None, None, '$,.0f'],
+                   fill_color='white', line_color='#ecf0f1', font=dict(size=10, color='#34495e'),
+                   align=['left', 'left', 'right']),
+        columnwidth=[1, 3, 1.5]
+    ).to_plotly_json()
+    if len(pages) == 1:
+        return trace, []
+
+    buttons = [dict(label=f'{start + 1:,}-{min(start + page_size, n):,} of {n:,}', method='restyle',
+                    args=[{'cells.values': [page]}, [trace_index]])
+               for start, page in zip(starts, pages)]
+    menu = dict(type='dropdown', buttons=buttons, active=0, showactive=True, direction='down',
+                x=domain['x'][1], y=domain['y'][1], xanchor='right', yanchor='bottom',
+                font=dict(size=10))
+    return trace, [menu]
+
+
+@profiling.span('figure')
+def build_figure(aggregates, max_points=downsample.DEFAULT_MAX_POINTS, method='lttb',
+                 density_threshold=density.DEFAULT_DENSITY_THRESHOLD, density_bins=density.DEFAULT_BINS,
+                 components=False, top_customers=DEFAULT_TOP_CUSTOMERS, page_size=DEFAULT_PAGE_SIZE):
+    """Build the dashboard figure from ``load_aggregates`` output.
+
+    The sales-over-time bars are limited to ``max_points`` bars each (see
+    ``downsample.limit_trace``) for daily or hourly monthly tables. With more
+    than ``density_threshold`` customers (``None`` never), the customer
+    scatter is binned on a ``density_bins`` grid (see
+    ``customer_density_traces``). The table lists the ``top_customers``
+    customers with the highest sales. By default it and the KPI cards are
+    layout annotations. With ``components`` they are ``go.Indicator``
+    traces and a ``go.Table`` paged by ``page_size`` rows (see
+    ``top_customer_table``). The layout comes from ``figure_template``;
+    only the traces and the KPI and top customer annotations are built per call.
+    """
+    kpis = aggregates['kpis']
+    monthly_df = aggregates['monthly']
+    customer_df = aggregates['customers']
+    product_df = aggregates['product_groups']
+    customer_group_sales = aggregates['customer_group_sales']
+    traces = []
+
+    # 1. Key Metrics Cards (Top Row) - Using annotations instead of traces
+    if components:
+        metrics_annotations = []
+        traces.extend((trace, 1, col) for col, trace in enumerate(kpi_indicators(kpis), start=1))
+    else:
+        metrics_annotations = [
+            dict(x=0.125, y=0.88, xref='paper', yref='paper',  # Lowered from 0.95
+                 text=f'<b>${kpis["total_sales"]/1000000:.2f}M</b><br>Sum of Invoices',
+                 showarrow=False, font=dict(size=14, color='white'),  # Reduced font size
+                 bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
+                 xanchor='center', yanchor='middle'),
+            dict(x=0.375, y=0.88, xref='paper', yref='paper',
+                 text=f'<b>{kpis["total_invoices"]}</b><br>Count of Invoices',
+                 showarrow=False, font=dict(size=14, color='white'),
+                 bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
+                 xanchor='center', yanchor='middle'),
+            dict(x=0.625, y=0.88, xref='paper', yref='paper',
+                 text=f'<b>${kpis["avg_invoice_amount"]/1000:.1f}K</b><br>Average Invoice Amount',
+                 showarrow=False, font=dict(size=14, color='white'),
+                 bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
+                 xanchor='center', yanchor='middle'),
+            dict(x=0.875, y=0.88, xref='paper', yref='paper',
+                 text=f'<b>{kpis["total_customers"]}</b><br>Customer Count',
+                 showarrow=False, font=dict(size=14, color='white'),
+                 bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
+                 xanchor='center', yanchor='middle')
+        ]
+
+    # 2. Monthly Sales Trends (Second Row)
+    # Current year sales
+    traces.append((
+        downsample.limit_trace(go.Bar(
+            x=monthly_df['month_name'],
+            y=monthly_df['total_sales'],
+            name='2023 Sales',
+            marker=dict(color='#ff7f0e'),
+            text=[f'${x/1000:.0f}K' for x in monthly_df['total_sales']],
+            textposition='outside',
+            hovertemplate='%{x}<br>2023 Sales: $%{y:,.0f}<extra></extra>'
+        ).to_plotly_json(), max_points, None, method),
+        2, 1
+    ))
+
+    # Previous year sales (comparison)
+    traces.append((
+        downsample.limit_trace(go.Bar(
+            x=monthly_df['month_name'],
+            y=monthly_df['total_sales_previous'],
+            name='2022 Sales (Previous)',
+            marker=dict(color='rgba(52, 73, 94, 0.7)'),
+            hovertemplate='%{x}<br>2022 Sales: $%{y:,.0f}<extra></extra>'
+        ).to_plotly_json(), max_points, None, method),
+        2, 1
+    ))
+
+    # 3. Customer Analysis Scatter Plot (Bottom Left)
+    colors = {'NEW': '#2ecc71', 'REGULAR': '#3498db', 'VIP': '#e74c3c', 'SENSITIVE': '#f39c12'}
+
+    if density_threshold is not None and len(customer_df) > density_threshold:
+        traces.extend((trace, 3, 1) for trace in customer_density_traces(customer_df, colors, bins=density_bins))
+    else:
+        for group in customer_df['customer_group'].unique():
+            group_data = customer_df[customer_df['customer_group'] == group]
+
+            traces.append((
+                go.Scatter(
+                    x=group_data['total_purchases'],
+                    y=group_data['total_sales'],
+                    mode='markers',
+                    name=group,
+                    marker=dict(
+                        size=12,
+                        color=colors.get(group, '#95a5a6'),
+                        opacity=0.7,
+                        line=dict(width=1, color='white')
+                    ),
+                    text=group_data['customer_name'],
+                    hovertemplate='%{text}<br>Purchases: %{x}<br>Sales: $%{y:,.0f}<br>Group: ' + group + '<extra></extra>'
+                ).to_plotly_json(),
+                3, 1
+            ))
+
+    # 4. Product Group Pie Chart (Middle Right)
+    traces.append((
+        go.Pie(
+            labels=product_df['product_group'],
+            values=product_df['total_sales'],
+            hole=0.4,
+            marker=dict(colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']),
+            textinfo='label+percent',
+            textposition='outside',
+            hovertemplate='%{label}<br>Sales: $%{value:,.0f}<br>%{percent}<extra></extra>'
+        ).to_plotly_json(),
+        3, 3
+    ))
+
+    # 5. Customer Group Distribution (Bottom Left)
+    # Labels and values both come from the groupby, so every group is shown
+    # with its own sales (the original script took the labels in value_counts
+    # order, which swapped the VIP and SENSITIVE slices)
+    traces.append((
+        go.Pie(
+            labels=customer_group_sales.index,
+            values=customer_group_sales.values,
+            hole=0.4,
+            marker=dict(colors=['#3498db', '#e74c3c', '#2ecc71', '#f39c12']),
+            textinfo='label+percent',
+            textposition='outside',
+            hovertemplate='%{label}<br>Sales: $%{value:,.0f}<br>%{percent}<extra></extra>'
+        ).to_plotly_json(),
+        4, 1
+    ))
+
+    # 6. Customer Details Table (Bottom Right)
+    table_data = aggregates['top_customers'].top(top_customers)
+    layout_updates = {}
+    if components:
+        table_annotations = []
+        table, menus = top_customer_table(table_data, page_size, len(traces),
+                                          figure_template(True).cell_refs(4, 3)['domain'])
+        traces.append((table, 4, 3))
+        if menus:
+            layout_updates['updatemenus'] = menus
+    else:
+        # Create a simple table using annotations
+        table_y = 0.15  # Lowered position
+        table_annotations = []
+
+        # Table header
+        table_annotations.append(
+            dict(x=0.75, y=table_y + 0.05, xref='paper', yref='paper',  # Adjusted header position
+                 text='<b>Top Customers by Sales</b>',
+                 showarrow=False, font=dict(size=12, color='#2c3e50'),  # Smaller font
+                 xanchor='center')
+        )
+
+        # Table rows
+        rows = zip(table_data['customer_group'], table_data['customer_name'], table_data['total_sales'])
+        for i, (group, name, sales) in enumerate(rows):
+            y_pos = table_y - (i * 0.018)  # Tighter spacing
+            table_annotations.append(
+                dict(x=0.75, y=y_pos, xref='paper', yref='paper',
+                     text=f'{group} | {name[:18]} | ${sales:,.0f}',  # Shorter names
+                     showarrow=False, font=dict(size=9, color='#34495e'),  # Smaller font
+                     xanchor='center')
+            )
+
+    annotations = metrics_annotations + table_annotations
+    if annotations:
+        layout_updates['annotations'] = annotations
+    with profiling.span('layout'):
+        return figure_template(components).figure(traces, **layout_updates)
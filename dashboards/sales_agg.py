@@ -0,0 +1,175 @@
+"""Vectorized summaries for the sales customer dashboard.
+
+Builds the three summary tables written next to ``sales_transactions.csv``
+(monthly sales, customer summary and product group summary) from any
+transaction DataFrame with one groupby per key, instead of rescanning the
+whole transaction list once per month, customer and product group.
+
+The work is split into partial totals (sums and counts) that can be combined
+across chunks, and a ``finalize`` step that turns them into the output
+tables. ``summarize`` does both for an in-memory DataFrame.
+
+Amounts are summed as integer cents, so totals are exact and do not depend
+on how the transactions were split into chunks.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dashboards import profiling
+
+MONTHS = list(range(1, 13))
+
+TOTAL_KEYS = {
+    'month': 'month',
+    'customer': 'customer_id',
+    'product_group': 'product_group',
+}
+
+
+@profiling.span('partial_totals')
+def partial_totals(sales_df):
+    """Return ``invoice_amount`` totals and counts by month, customer and product group.
+
+    The result is a dict of DataFrames with ``cents`` (int64 sum of the
+    amounts in cents) and ``count`` columns, keyed like ``TOTAL_KEYS``.
+    """
+    cents = pd.Series(np.rint(sales_df['invoice_amount'].to_numpy(dtype=float) * 100).astype(np.int64),
+                      index=sales_df.index)
+    totals = {}
+    for name, column in TOTAL_KEYS.items():
+        frame = (cents.groupby(sales_df[column], sort=False, observed=True)
+                 .agg(['sum', 'count'])
+                 .rename(columns={'sum': 'cents'}))
+        if isinstance(frame.index, pd.CategoricalIndex):
+            # Plain labels, so totals from chunks with different categories combine
+            frame.index = frame.index.astype(frame.index.categories.dtype)
+        totals[name] = frame
+    return totals
+
+
+def combine_totals(left, right):
+    """Add two partial totals dicts together; either side may be ``None``."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return {
+        name: pd.concat([left[name], right[name]]).groupby(level=0, sort=False).sum()
+        for name in TOTAL_KEYS
+    }
+
+
+def totals_from_summaries(monthly_df, customer_df, product_df):
+    """Recover the partial totals that ``finalize`` turned into these summary tables.
+
+    Totals are written rounded to the cent, so the integer cents come back
+    exactly and new partial totals can be added to them with
+    ``combine_totals``. The product group summary has no invoice counts;
+    ``finalize`` does not use them, so they are left at zero.
+    """
+    def frame(df, name, count):
+        return pd.DataFrame({
+            'cents': np.rint(df['total_sales'].to_numpy(dtype=float) * 100).astype(np.int64),
+            'count': np.asarray(count, dtype=np.int64),
+        }, index=pd.Index(df[TOTAL_KEYS[name]].to_numpy(), name=TOTAL_KEYS[name]))
+
+    return {
+        'month': frame(monthly_df, 'month', monthly_df['invoice_count']),
+        'customer': frame(customer_df, 'customer', customer_df['total_purchases']),
+        'product_group': frame(product_df, 'product_group', np.zeros(len(product_df))),
+    }
+
+
+def kpis(totals):
+    """Return the headline numbers (total sales, invoice count, average invoice) of ``totals``."""
+    total_cents = int(totals['month']['cents'].sum())
+    total_invoices = int(totals['month']['count'].sum())
+    total_sales = total_cents / 100
+    return {
+        'total_sales': total_sales,
+        'total_invoices': total_invoices,
+        'avg_invoice_amount': total_sales / total_invoices if total_invoices else 0.0,
+    }
+
+
+@profiling.span('finalize')
+def finalize(totals, customers, product_groups=None, year=2023, prev_year_factors=None):
+    """Turn partial totals into ``(monthly_df, customer_df, product_df)``.
+
+    ``customers`` holds ``customer_id``, ``customer_name`` and
+    ``customer_group``; only customers with at least one invoice are kept,
+    in the order given. ``prev_year_factors`` scales each month's sales into
+    ``total_sales_previous``; without it that column is left empty.
+    ``product_groups`` fixes the order of the product group rows and
+    defaults to the groups present in ``totals``, sorted by name.
+    """
+    month_totals = totals['month'].reindex(MONTHS, fill_value=0)
+    month_sum = month_totals['cents'].to_numpy(dtype=float) / 100
+    month_count = month_totals['count'].to_numpy(dtype=np.int64)
+    if prev_year_factors is None:
+        prev_year_sales = np.full(len(MONTHS), np.nan)
+    else:
+        prev_year_sales = month_sum * np.asarray(prev_year_factors, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        month_avg = np.where(month_count > 0, month_sum / month_count, 0)
+
+    monthly_df = pd.DataFrame({
+        'month': MONTHS,
+        'month_name': [datetime(year, month, 1).strftime('%b') for month in MONTHS],
+        'year': year,
+        'total_sales': np.round(month_sum, 2),
+        'total_sales_previous': np.round(prev_year_sales, 2),
+        'invoice_count': month_count,
+        'avg_invoice_amount': np.round(month_avg, 2)
+    })
+
+    customer_totals = customers[['customer_id', 'customer_name', 'customer_group']].merge(
+        totals['customer'], left_on='customer_id', right_index=True, how='inner'
+    )
+    customer_totals = customer_totals[customer_totals['count'] > 0]
+    customer_sum = customer_totals['cents'].to_numpy(dtype=float) / 100
+    customer_count = customer_totals['count'].to_numpy(dtype=np.int64)
+    customer_df = pd.DataFrame({
+        'customer_id': customer_totals['customer_id'].to_numpy(),
+        'customer_name': customer_totals['customer_name'].to_numpy(),
+        'customer_group': customer_totals['customer_group'].to_numpy(),
+        'total_sales': np.round(customer_sum, 2),
+        'total_purchases': customer_count,
+        'avg_purchase_amount': np.round(customer_sum / customer_count, 2)
+    })
+
+    if product_groups is None:
+        product_groups = sorted(totals['product_group'].index)
+    group_totals = totals['product_group'].reindex(product_groups, fill_value=0)
+    group_sum = np.round(group_totals['cents'].to_numpy(dtype=float) / 100, 2)
+    total_sales_amount = totals['month']['cents'].sum() / 100
+    product_df = pd.DataFrame({
+        'product_group': list(product_groups),
+        'total_sales': group_sum,
+        'percentage': np.round(group_sum / total_sales_amount * 100, 2)
+    })
+
+    return monthly_df, customer_df, product_df
+
+
+def customers_from_transactions(sales_df):
+    """Return the distinct customers of a transaction table, ordered by id."""
+    return (sales_df[['customer_id', 'customer_name', 'customer_group']]
+            .drop_duplicates('customer_id')
+            .sort_values('customer_id', kind='stable')
+            .reset_index(drop=True))
+
+
+def summarize(sales_df, customers=None, product_groups=None, year=2023, prev_year_factors=None):
+    """Compute the monthly, customer and product group summaries of ``sales_df``.
+
+    Works on any transaction DataFrame with the columns written to
+    ``sales_transactions.csv``. ``customers`` defaults to the customers that
+    appear in ``sales_df``.
+    """
+    if customers is None:
+        customers = customers_from_transactions(sales_df)
+    return finalize(partial_totals(sales_df), customers, product_groups=product_groups,
+                    year=year, prev_year_factors=prev_year_factors)
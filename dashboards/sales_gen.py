@@ -0,0 +1,159 @@
+"""Batched NumPy generator for the sales customer dashboard transactions.
+
+The original generator in ``sales-customer-dashboard/data_gen.py`` builds one
+Python dict per invoice, which is fine for ~750 rows but not for load tests
+with tens of millions of invoices. Here every column of a chunk is drawn as a
+whole array, and chunks are produced one at a time so memory stays bounded.
+
+Every ``BLOCK_SIZE`` invoices get their own generator spawned from
+``SeedSequence(seed)``, and the blocks are cut into chunks of any size, so
+the output is reproducible for a given ``(seed, n_customers)`` whatever the
+chunk size.
+"""
+import numpy as np
+import pandas as pd
+
+from dashboards import sales_agg, storage
+
+CUSTOMER_GROUPS = ['NEW', 'REGULAR', 'VIP', 'SENSITIVE']
+GROUP_WEIGHTS = [0.22, 0.38, 0.35, 0.05]
+
+# Invoice amount multiplier range per customer group (same order as CUSTOMER_GROUPS)
+GROUP_MULTIPLIERS = np.array([
+    [0.8, 1.3],   # NEW
+    [1.0, 1.8],   # REGULAR
+    [1.5, 2.5],   # VIP
+    [0.5, 1.0],   # SENSITIVE
+])
+
+PRODUCTS = pd.DataFrame([
+    {'product_id': 'P001', 'product_name': 'Organic Juice', 'product_group': 'Food and Beverages'},
+    {'product_id': 'P002', 'product_name': 'Protein Powder', 'product_group': 'Nutrition Supplements'},
+    {'product_id': 'P003', 'product_name': 'Vitamin D3', 'product_group': 'Nutrition Supplements'},
+    {'product_id': 'P004', 'product_name': 'Sports Drinks', 'product_group': 'Food and Beverages'},
+    {'product_id': 'P005', 'product_name': 'Fitness Equipment', 'product_group': 'Fitness and Exercise Equipment'},
+    {'product_id': 'P006', 'product_name': 'Wellness Kit', 'product_group': 'Personal Care and Wellness Products'},
+    {'product_id': 'P007', 'product_name': 'Energy Bars', 'product_group': 'Food and Beverages'},
+    {'product_id': 'P008', 'product_name': 'Yoga Mat', 'product_group': 'Fitness and Exercise Equipment'},
+    {'product_id': 'P009', 'product_name': 'Skincare Set', 'product_group': 'Personal Care and Wellness Products'},
+    {'product_id': 'P010', 'product_name': 'Multivitamins', 'product_group': 'Nutrition Supplements'}
+])
+
+PRODUCT_GROUPS = ['Food and Beverages', 'Nutrition Supplements',
+                  'Fitness and Exercise Equipment', 'Personal Care and Wellness Products']
+
+TRANSACTION_COLUMNS = [
+    'invoice_id', 'invoice_date', 'month', 'customer_id', 'customer_name', 'customer_group',
+    'product_id', 'product_name', 'product_group', 'quantity', 'unit_price', 'invoice_amount'
+]
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Invoices drawn from each spawned generator; changing it changes the data
+BLOCK_SIZE = 100_000
+
+
+def make_customers(n_customers, rng):
+    """Return a customer table with ``n_customers`` rows and random groups."""
+    width = max(3, len(str(n_customers)))
+    numbers = np.arange(1, n_customers + 1)
+    group_codes = rng.choice(len(CUSTOMER_GROUPS), size=n_customers, p=GROUP_WEIGHTS)
+    return pd.DataFrame({
+        'customer_id': [f'C{i:0{width}d}' for i in numbers],
+        'customer_name': [f'Company {i}' for i in numbers],
+        'customer_group': pd.Categorical.from_codes(group_codes, categories=CUSTOMER_GROUPS),
+    })
+
+
+def generate_chunk(customers, start, size, rng, year=2023):
+    """Draw ``size`` invoices numbered from ``start`` as a single DataFrame.
+
+    Customers, products, dates, amounts and quantities are each drawn with a
+    single vectorized call; the group-dependent amount multiplier is looked
+    up from ``GROUP_MULTIPLIERS`` by the customer's group code.
+    """
+    customer_idx = rng.integers(0, len(customers), size=size)
+    product_idx = rng.integers(0, len(PRODUCTS), size=size)
+    month = rng.integers(1, 13, size=size)
+    day = rng.integers(1, 29, size=size)  # Safe day for all months
+
+    month_starts = np.array([f'{year}-{m:02d}-01' for m in range(1, 13)], dtype='datetime64[D]')
+    invoice_date = month_starts[month - 1] + (day - 1).astype('timedelta64[D]')
+
+    group_codes = customers['customer_group'].cat.codes.to_numpy()[customer_idx]
+    low, high = GROUP_MULTIPLIERS[group_codes, 0], GROUP_MULTIPLIERS[group_codes, 1]
+    base_amount = rng.uniform(5000, 30000, size=size)
+    invoice_amount = base_amount * rng.uniform(low, high)
+
+    quantity = rng.integers(1, 11, size=size)
+    unit_price = invoice_amount / quantity
+
+    invoice_numbers = np.arange(start, start + size)
+    chosen_customers = customers.iloc[customer_idx]
+    chosen_products = PRODUCTS.iloc[product_idx]
+
+    return pd.DataFrame({
+        'invoice_id': 'INV' + pd.Series(invoice_numbers).astype(str).str.zfill(4),
+        'invoice_date': invoice_date.astype('datetime64[ns]'),
+        'month': month,
+        'customer_id': chosen_customers['customer_id'].to_numpy(),
+        'customer_name': chosen_customers['customer_name'].to_numpy(),
+        'customer_group': chosen_customers['customer_group'].to_numpy(),
+        'product_id': chosen_products['product_id'].to_numpy(),
+        'product_name': chosen_products['product_name'].to_numpy(),
+        'product_group': chosen_products['product_group'].to_numpy(),
+        'quantity': quantity,
+        'unit_price': np.round(unit_price, 2),
+        'invoice_amount': np.round(invoice_amount, 2),
+    }, columns=TRANSACTION_COLUMNS)
+
+
+def iter_transactions(n_rows, n_customers=50, seed=42, chunk_size=DEFAULT_CHUNK_SIZE,
+                      year=2023, first_invoice=1001):
+    """Yield ``(customers, chunk)`` pairs covering ``n_rows`` invoices.
+
+    ``customers`` is the same table on every iteration; it is returned so
+    callers can build per-customer summaries without a second pass. The
+    invoices are drawn in blocks of ``BLOCK_SIZE``, so ``chunk_size`` only
+    sets how many of them are held and yielded at a time.
+    """
+    if n_rows < 1 or chunk_size < 1:
+        raise ValueError(f'n_rows and chunk_size must be at least 1, not {n_rows} and {chunk_size}')
+    n_blocks = -(-n_rows // BLOCK_SIZE)
+    customer_seq, *block_seqs = np.random.SeedSequence(seed).spawn(n_blocks + 1)
+    customers = make_customers(n_customers, np.random.default_rng(customer_seq))
+
+    pending, pending_rows = [], 0
+    for i, block_seq in enumerate(block_seqs):
+        start = i * BLOCK_SIZE
+        size = min(BLOCK_SIZE, n_rows - start)
+        block = generate_chunk(customers, first_invoice + start, size, np.random.default_rng(block_seq), year=year)
+        while len(block):
+            piece = block.iloc[:chunk_size - pending_rows]
+            block = block.iloc[len(piece):]
+            pending.append(piece)
+            pending_rows += len(piece)
+            if pending_rows == chunk_size:
+                yield customers, pd.concat(pending, ignore_index=True)
+                pending, pending_rows = [], 0
+    if pending:
+        yield customers, pd.concat(pending, ignore_index=True)
+
+
+def write_transactions(directory, n_rows, n_customers=50, seed=42, chunk_size=DEFAULT_CHUNK_SIZE,
+                       year=2023, fmt='csv'):
+    """Write ``n_rows`` generated invoices to ``directory``, one chunk at a time.
+
+    The invoices are stored as the ``sales_transactions`` dataset in format
+    ``fmt`` (see ``storage.FORMATS``). Returns the customer table and the
+    partial totals of all chunks (see ``sales_agg.partial_totals``), ready
+    for ``sales_agg.finalize``.
+    """
+    totals = None
+    customers = None
+    with storage.open_writer(directory, 'sales_transactions', fmt) as writer:
+        for customers, chunk in iter_transactions(
+                n_rows, n_customers=n_customers, seed=seed, chunk_size=chunk_size, year=year):
+            writer.write(chunk)
+            totals = sales_agg.combine_totals(totals, sales_agg.partial_totals(chunk))
+    return customers, totals
@@ -0,0 +1,167 @@
+"""Incremental ingestion of new invoices for the sales customer dashboard.
+
+``append_transactions`` adds a batch of invoices (for example one day's) to
+the stored ``sales_transactions`` dataset and brings the three summary
+datasets up to date without reading the transaction history::
+
+    python -m dashboards.sales_ingest sales-customer-dashboard/datasets new_invoices.csv
+
+The summaries hold every running total the update needs: sales rounded to
+the cent give back the exact integer cents, next to the invoice counts
+(see ``sales_agg.totals_from_summaries``). The batch's partial totals are
+added to them and the summaries are rewritten, so the cost grows with the
+batch and the number of customers, not with the number of stored invoices.
+``rebuild_summaries`` recomputes them from all transactions in one
+streaming pass, e.g. after transactions were edited by hand. In formats
+other than CSV each batch is stored as a part file (see
+``storage.part_paths``); ``--merge-parts`` folds them into one file.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from dashboards import sales_agg, storage
+from dashboards.sales_gen import PRODUCT_GROUPS, TRANSACTION_COLUMNS
+from dashboards.topk import TopCustomers, ranking_path
+
+SUMMARIES = ['monthly_sales_summary', 'customer_summary', 'product_group_summary']
+
+
+def read_batch(path):
+    """Load a batch of invoices from a CSV, Parquet or Feather file."""
+    extension = os.path.splitext(path)[1]
+    if extension == '.parquet':
+        df = pd.read_parquet(path)
+    elif extension == '.feather':
+        df = pd.read_feather(path)
+    else:
+        df = pd.read_csv(path)
+    return storage.apply_schema(df, 'sales_transactions')
+
+
+def check_batch(batch, year):
+    """Raise ``ValueError`` if ``batch`` is not a transaction table of ``year``."""
+    missing = [column for column in TRANSACTION_COLUMNS if column not in batch]
+    if missing:
+        raise ValueError(f'Batch is missing the transaction columns {missing}')
+    years = sorted(int(value) for value in batch['invoice_date'].dt.year.unique())
+    if years and years != [year]:
+        raise ValueError(f'The summaries cover {year}, but the batch has invoices from {years}')
+    if (batch['month'].to_numpy() != batch['invoice_date'].dt.month.to_numpy()).any():
+        raise ValueError("Batch 'month' does not match the month of 'invoice_date'")
+
+
+def _write_summaries(dataset_dir, totals, customers, product_groups, previous):
+    monthly_df, customer_df, product_df = sales_agg.finalize(
+        totals, customers, product_groups=product_groups, year=int(previous['year'].iloc[0])
+    )
+    # Last year's sales do not change with this year's invoices
+    monthly_df['total_sales_previous'] = (previous.set_index('month')['total_sales_previous']
+                                          .reindex(monthly_df['month']).to_numpy())
+    for name, df in zip(SUMMARIES, [monthly_df, customer_df, product_df]):
+        _, fmt = storage.find_dataset(dataset_dir, name)
+        storage.write_dataset(df, dataset_dir, name, fmt)
+    return monthly_df, customer_df, product_df
+
+
+def append_transactions(dataset_dir, batch, ranking=None):
+    """Append ``batch`` to the transactions in ``dataset_dir`` and update the summaries.
+
+    Customers and product groups seen for the first time are added after
+    the existing ones. Returns the new ``(monthly_df, customer_df, product_df)``.
+    The batch must only hold new invoices; appending one twice counts it twice.
+    The ``TopCustomers`` ``ranking`` of the summaries (by default the one
+    saved in ``dataset_dir``) is updated with the batch and saved.
+    """
+    monthly_df, customer_df, product_df = (storage.read_dataset(dataset_dir, name) for name in SUMMARIES)
+    batch = storage.apply_schema(batch, 'sales_transactions')
+    check_batch(batch, int(monthly_df['year'].iloc[0]))
+
+    batch_totals = sales_agg.partial_totals(batch)
+    totals = sales_agg.combine_totals(sales_agg.totals_from_summaries(monthly_df, customer_df, product_df),
+                                      batch_totals)
+    known = customer_df[['customer_id', 'customer_name', 'customer_group']].astype(object)
+    new_customers = sales_agg.customers_from_transactions(batch).astype(object)
+    if ranking is None:
+        ranking = TopCustomers.load(customer_df, ranking_path(dataset_dir))
+    # In customer id order, so new customers rank among equals as in the summary
+    ranking.add(new_customers['customer_id'],
+                batch_totals['customer']['cents'].reindex(new_customers['customer_id']),
+                new_customers['customer_name'], new_customers['customer_group'])
+    customers = pd.concat([known, new_customers[~new_customers['customer_id'].isin(known['customer_id'])]],
+                          ignore_index=True)
+    product_groups = list(product_df['product_group'])
+    product_groups += sorted(set(batch['product_group'].astype(object)) - set(product_groups))
+
+    storage.append_dataset(batch, dataset_dir, 'sales_transactions')
+    summaries = _write_summaries(dataset_dir, totals, customers, product_groups, monthly_df)
+    ranking.save(ranking_path(dataset_dir))
+    return summaries
+
+
+def rebuild_summaries(dataset_dir, batch_size=storage.DEFAULT_BATCH_SIZE):
+    """Recompute the summaries from every stored transaction, keeping last year's sales."""
+    totals = None
+    customers = []
+    for batch in storage.iter_batches(dataset_dir, 'sales_transactions', batch_size=batch_size):
+        totals = sales_agg.combine_totals(totals, sales_agg.partial_totals(batch))
+        customers.append(sales_agg.customers_from_transactions(batch).astype(object))
+    if totals is None:
+        raise ValueError('No transactions to summarize')
+    customers = sales_agg.customers_from_transactions(pd.concat(customers, ignore_index=True))
+    extra = sorted(set(totals['product_group'].index) - set(PRODUCT_GROUPS))
+    previous = storage.read_dataset(dataset_dir, 'monthly_sales_summary')
+    summaries = _write_summaries(dataset_dir, totals, customers, PRODUCT_GROUPS + extra, previous)
+    TopCustomers.from_frame(summaries[1]).save(ranking_path(dataset_dir))
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Append new invoices to the sales dashboard datasets.')
+    parser.add_argument('dataset_dir', help='Dataset directory with sales_transactions and the summaries')
+    parser.add_argument('batches', nargs='*', help='CSV, Parquet or Feather files of new invoices, in order')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Recompute the summaries from all stored transactions instead')
+    parser.add_argument('--merge-parts', action='store_true',
+                        help='Rewrite the appended Parquet, Feather or npy batches of the transactions as one file')
+    args = parser.parse_args(argv)
+
+    if args.merge_parts:
+        start = time.perf_counter()
+        merged = storage.merge_parts(args.dataset_dir, 'sales_transactions')
+        print(f'Merged {merged:,} appended batches into sales_transactions in {time.perf_counter() - start:.2f}s')
+
+    if args.rebuild:
+        start = time.perf_counter()
+        monthly_df, _, _ = rebuild_summaries(args.dataset_dir)
+        print(f"Rebuilt the summaries of {monthly_df['invoice_count'].sum():,} invoices "
+              f"in {time.perf_counter() - start:.2f}s")
+        return 0
+    if not args.batches:
+        if args.merge_parts:
+            return 0
+        parser.error('give at least one batch file, --rebuild or --merge-parts')
+
+    ranking = TopCustomers.load(storage.read_dataset(args.dataset_dir, 'customer_summary'),
+                                ranking_path(args.dataset_dir))
+    for path in args.batches:
+        start = time.perf_counter()
+        batch = read_batch(path)
+        try:
+            monthly_df, customer_df, _ = append_transactions(args.dataset_dir, batch, ranking)
+        except ValueError as exc:
+            print(f'{path}: {exc}', file=sys.stderr)
+            return 1
+        print(f"{path}: appended {len(batch):,} invoices in {time.perf_counter() - start:.2f}s "
+              f"({monthly_df['invoice_count'].sum():,} invoices, {len(customer_df):,} customers in total)")
+    top = ranking.top(3)
+    print('Top customers: ' + ', '.join(f'{name} (${sales:,.0f})'
+                                        for name, sales in zip(top['customer_name'], top['total_sales'])))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""SQL engines for the sales dashboard aggregates.
+
+``partial_totals`` computes the same integer-cent totals as
+``sales_agg.partial_totals`` (by month, customer and product group), plus
+the customer list, with SQL run by an embedded engine. The transactions
+never become a pandas DataFrame; only the grouped rows come back::
+
+    python sales-customer-dashboard/viz.py --engine duckdb
+
+- ``duckdb`` scans the stored file in place: CSV and Parquet natively,
+  Feather through a pyarrow dataset and ``npy`` column stores through
+  their memory-mapped columns. It reads only the aggregated columns,
+  on all cores, in one pass for the three groupings (``GROUPING SETS``).
+  Needs ``pip install duckdb``.
+- ``sqlite`` ships with Python but cannot read the files itself. The
+  transactions are copied batch by batch into an in-memory table, and the
+  three groupings are queried from there.
+
+Amounts are stored to the cent, so ``ROUND(invoice_amount * 100)`` gives the
+same cents as ``np.rint`` (the two only round ties differently). Each
+customer's name and group come from ``MIN()``; the pandas path keeps the
+first row's. They are the same when a customer id has one name and group,
+as in the generated data.
+"""
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from dashboards import profiling, sales_agg, storage
+
+ENGINES = ['duckdb', 'sqlite']
+
+# Imported by _require_duckdb, the first time the duckdb engine is used
+duckdb = None
+
+TOTAL_COLUMNS = ['month', 'customer_id', 'customer_name', 'customer_group', 'product_group', 'invoice_amount']
+
+CUSTOMER_COLUMNS = ['customer_id', 'customer_name', 'customer_group']
+
+SQL_TYPES = {'int64': 'BIGINT', 'float64': 'DOUBLE', 'category': 'VARCHAR', 'string': 'VARCHAR',
+             'datetime': 'TIMESTAMP'}
+
+CENTS = 'CAST(SUM(CAST(ROUND(invoice_amount * 100) AS BIGINT)) AS BIGINT)'
+
+# grouping_set is the GROUPING() bit mask of the grouping each row belongs to
+GROUPING_SETS = {'month': 3, 'customer': 5, 'product_group': 6}
+
+DUCKDB_TOTALS = f"""
+SELECT GROUPING(month, customer_id, product_group) AS grouping_set,
+       month, customer_id, product_group,
+       MIN(customer_name) AS customer_name, MIN(customer_group) AS customer_group,
+       {CENTS} AS cents, COUNT(*) AS count
+FROM transactions
+GROUP BY GROUPING SETS ((month), (customer_id), (product_group))
+"""
+
+# SQLite has no GROUPING SETS; its table is in memory, so three scans are cheap
+SQLITE_TOTALS = f"""
+SELECT 3 AS grouping_set, month, NULL AS customer_id, NULL AS product_group,
+       NULL AS customer_name, NULL AS customer_group, {CENTS} AS cents, COUNT(*) AS count
+FROM transactions GROUP BY month
+UNION ALL
+SELECT 5, NULL, customer_id, NULL, MIN(customer_name), MIN(customer_group), {CENTS}, COUNT(*)
+FROM transactions GROUP BY customer_id
+UNION ALL
+SELECT 6, NULL, NULL, product_group, NULL, NULL, {CENTS}, COUNT(*)
+FROM transactions GROUP BY product_group
+"""
+
+
+def _require_duckdb():
+    global duckdb
+    if duckdb is not None:
+        return
+    try:
+        import duckdb
+    except ImportError:  # pragma: no cover - depends on the environment
+        raise ImportError('The duckdb engine needs duckdb: pip install duckdb') from None
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _duckdb_source(con, path, fmt, name):
+    """A FROM clause that scans the stored dataset file, and its appended parts, with DuckDB."""
+    paths = [path] + storage.part_paths(path)
+    if fmt == 'parquet':
+        return f"read_parquet([{', '.join(_literal(source) for source in paths)}])"
+    if fmt == 'npy':
+        # The memory-mapped columns are scanned in place through pandas
+        con.register('npy_source', storage.read_dataset(os.path.dirname(path), name, columns=TOTAL_COLUMNS,
+                                                         fmt='npy'))
+        return 'npy_source'
+    if fmt == 'feather':
+        storage._require_pyarrow(fmt)
+        import pyarrow.dataset
+        con.register('feather_source', pyarrow.dataset.dataset(paths, format='feather'))
+        return 'feather_source'
+    # Declared types, so the CSV sniffer cannot read e.g. a month column as text
+    types = ', '.join(f'{_literal(column)}: {_literal(SQL_TYPES[storage.SCHEMAS[name][column]])}'
+                      for column in TOTAL_COLUMNS)
+    return f'read_csv({_literal(path)}, header = true, types = {{{types}}})'
+
+
+def _query_duckdb(path, fmt, name, threads=None):
+    _require_duckdb()
+    with duckdb.connect() as con:
+        if threads:
+            con.execute(f'SET threads = {int(threads)}')
+        source = _duckdb_source(con, path, fmt, name)
+        columns = ', '.join(TOTAL_COLUMNS)
+        con.execute(f'CREATE TEMP VIEW transactions AS SELECT {columns} FROM {source}')
+        return con.execute(DUCKDB_TOTALS).df()
+
+
+def _query_sqlite(dataset_dir, name, batch_size=storage.DEFAULT_BATCH_SIZE):
+    con = sqlite3.connect(':memory:')
+    try:
+        columns = ', '.join(f'{column} {SQL_TYPES[storage.SCHEMAS[name][column]]}' for column in TOTAL_COLUMNS)
+        con.execute(f'CREATE TABLE transactions ({columns})')
+        insert = f"INSERT INTO transactions VALUES ({', '.join('?' * len(TOTAL_COLUMNS))})"
+        for batch in storage.iter_batches(dataset_dir, name, columns=TOTAL_COLUMNS, batch_size=batch_size):
+            with profiling.span('sqlite insert'):
+                con.executemany(insert, zip(*(batch[column].astype(object).tolist() for column in TOTAL_COLUMNS)))
+        return pd.read_sql_query(SQLITE_TOTALS, con)
+    finally:
+        con.close()
+
+
+def partial_totals(dataset_dir, engine='duckdb', name='sales_transactions', batch_size=storage.DEFAULT_BATCH_SIZE,
+                   threads=None):
+    """Return ``(totals, customers)`` of the stored transactions, computed with SQL.
+
+    ``totals`` matches ``sales_agg.partial_totals`` of the whole table;
+    ``customers`` matches ``sales_agg.customers_from_transactions``.
+    ``batch_size`` sets the rows per insert of the ``sqlite`` engine, and
+    ``threads`` limits DuckDB's worker threads (default: all cores).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown SQL engine {engine!r}, expected one of {ENGINES}')
+    with profiling.span(f'sql {engine}'):
+        if engine == 'duckdb':
+            path, fmt = storage.find_dataset(dataset_dir, name)
+            rows = _query_duckdb(path, fmt, name, threads=threads)
+        else:
+            rows = _query_sqlite(dataset_dir, name, batch_size=batch_size)
+
+    totals = {}
+    for key, column in sales_agg.TOTAL_KEYS.items():
+        group = rows[rows['grouping_set'] == GROUPING_SETS[key]]
+        index = group[column].to_numpy()
+        totals[key] = pd.DataFrame({
+            'cents': group['cents'].to_numpy(dtype=np.int64),
+            'count': group['count'].to_numpy(dtype=np.int64),
+        }, index=pd.Index(index.astype(np.int64) if column == 'month' else index.astype(object), name=column))
+    customers = rows.loc[rows['grouping_set'] == GROUPING_SETS['customer'], CUSTOMER_COLUMNS]
+    customers = customers.astype(object).sort_values('customer_id', kind='stable').reset_index(drop=True)
+    return totals, customers
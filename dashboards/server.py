@@ -0,0 +1,343 @@
+"""Live dashboard server.
+
+Serves both dashboards over HTTP from aggregates held in memory, instead of
+static files rebuilt offline::
+
+    python -m dashboards.server --port 8050
+
+``index.html`` is served at ``/`` and its links keep working: the dashboard
+paths are rendered on request. Query parameters (``max_points``,
+``method`` and, for the e-commerce dashboard, ``gl_threshold``) select the
+build options. Rendered pages are kept in an LRU cache with a time-to-live,
+keyed by the dataset version and the parameters, so repeat requests are a
+dictionary lookup. The parameters only choose how traces are downsampled:
+there are no data filters (by region, customer group, ...) yet, so every
+page shows all the data of its dashboard. Concurrent requests for the same page wait for a single
+render.
+
+A background thread polls the dataset directories. When files change, the
+datasets are reloaded and swapped in; requests are served from the previous
+version until the new one is ready.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dashboards import downsample, ecommerce, lazy, panel_cache, sales, storage
+
+# Loaded when the app starts, not when the module is imported
+offline = lazy.lazy_import('plotly.offline')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_SIZE = 64
+DEFAULT_TTL = 300.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+Page = namedtuple('Page', ['body', 'gzipped', 'content_type'])
+
+
+def make_page(body, content_type='text/html; charset=utf-8'):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return Page(body, gzip.compress(body, compresslevel=6), content_type)
+
+
+class PageCache:
+    """Thread-safe LRU cache of rendered pages whose entries expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_or_build(self, key, build):
+        """Return the cached value of ``key``, calling ``build()`` once if it is missing."""
+        value = self.get(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+        with self._lock:
+            key_lock = self._building.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have built it while we waited
+            value = self.get(key)
+            if value is not None:
+                self._count(hit=True)
+                return value
+            self._count(hit=False)
+            try:
+                value = build()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def dataset_version(dataset_dir, names):
+    """Short hash of the size and modification time of the dataset files."""
+    sha = hashlib.sha256()
+    for name in names:
+        for path in storage.dataset_files(storage.find_dataset(dataset_dir, name)[0]):
+            stat = os.stat(path)
+            sha.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return sha.hexdigest()[:16]
+
+
+class DatasetSource:
+    """The in-memory aggregates of one dashboard, reloaded when its dataset files change."""
+
+    def __init__(self, dataset_dir, inputs, load):
+        self.dataset_dir = dataset_dir
+        self.inputs = inputs
+        self.load = load
+        # Swapped as one tuple, so a reader never pairs a version with another version's data
+        self._current = (None, None)
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def snapshot(self):
+        """The current ``(version, data)``, loading the datasets on first use."""
+        if self._current[1] is None:
+            self.refresh()
+        current = self._current
+        if current[1] is None:
+            raise RuntimeError(f'Could not load datasets from {self.dataset_dir}: {self.error}')
+        return current
+
+    def refresh(self):
+        """Reload the datasets if their files changed; return whether a new version was loaded."""
+        with self._lock:
+            try:
+                version = dataset_version(self.dataset_dir, self.inputs)
+                if version == self._current[0]:
+                    return False
+                data = self.load(self.dataset_dir)
+            except Exception as exc:  # Files missing or half-written; keep serving the old version
+                self.error = f'{type(exc).__name__}: {exc}'
+                return False
+            self._current, self.error = (version, data), None
+            return True
+
+
+def parse_options(query, allowed):
+    """Build options from query parameters; raises ``ValueError`` on bad input."""
+    options = {}
+    for name, values in query.items():
+        if name not in allowed:
+            raise ValueError(f'Unknown parameter {name!r}, expected one of {sorted(allowed)}')
+        value = values[-1]
+        if name == 'method':
+            if value not in downsample.METHODS:
+                raise ValueError(f'method must be one of {downsample.METHODS}')
+            options[name] = value
+        else:
+            options[name] = int(value)
+            if options[name] < 3:
+                raise ValueError(f'{name} must be at least 3')
+    return options
+
+
+def render_ecommerce(datasets, **options):
+    fig, _ = ecommerce.figure_from_datasets(datasets, **options)
+    return fig
+
+
+def render_sales(aggregates, **options):
+    return sales.build_figure(aggregates, **options)
+
+
+Dashboard = namedtuple('Dashboard', ['name', 'source', 'options', 'render'])
+
+
+class DashboardApp:
+    """Routes requests to the dashboards and caches the rendered pages."""
+
+    def __init__(self, ecommerce_dir, sales_dir, cache_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_TTL):
+        self.cache = PageCache(cache_size, ttl)
+        # Versioned, so browsers may cache it for good
+        self.plotlyjs_url = f'/assets/plotly-{offline.get_plotlyjs_version()}/plotly.min.js'
+        ecommerce_source = DatasetSource(
+            ecommerce_dir, panel_cache.source_datasets(ecommerce.PANELS, ecommerce.DERIVED), ecommerce.load_datasets
+        )
+        sales_source = DatasetSource(sales_dir, ['sales_transactions', 'monthly_sales_summary'],
+                                     sales.load_aggregates)
+        ecommerce_dashboard = Dashboard('ecommerce', ecommerce_source,
+                                        {'max_points', 'gl_threshold', 'method'}, render_ecommerce)
+        sales_dashboard = Dashboard('sales', sales_source, {'max_points', 'method'}, render_sales)
+        self.dashboards = [ecommerce_dashboard, sales_dashboard]
+        # The paths index.html links to, plus short aliases
+        self.routes = {
+            '/ecommerce-dashboard/ecommerce_dashboard.html': ecommerce_dashboard,
+            '/ecommerce': ecommerce_dashboard,
+            '/sales-customer-dashboard/sales_customer_profiling_dashboard.html': sales_dashboard,
+            '/sales': sales_dashboard,
+        }
+        self._static = {}
+
+    def dashboard_page(self, dashboard, options):
+        version, data = dashboard.source.snapshot()
+        key = (dashboard.name, version, tuple(sorted(options.items())))
+
+        def build():
+            fig = dashboard.render(data, **options)
+            return make_page(fig.to_html(include_plotlyjs=self.plotlyjs_url, full_html=True))
+        return self.cache.get_or_build(key, build)
+
+    def static_page(self, path):
+        if path not in self._static:
+            if path == '/':
+                with open(os.path.join(REPO_DIR, 'index.html'), 'rb') as f:
+                    self._static[path] = make_page(f.read())
+            elif path == self.plotlyjs_url:
+                self._static[path] = make_page(offline.get_plotlyjs(), 'application/javascript')
+            else:
+                return None
+        return self._static[path]
+
+    def status(self):
+        sources = {dashboard.name: {'dataset_dir': dashboard.source.dataset_dir,
+                                    'version': dashboard.source.version,
+                                    'error': dashboard.source.error}
+                   for dashboard in self.dashboards}
+        return {'datasets': sources, 'cache': self.cache.stats()}
+
+    def refresh(self):
+        """Reload changed datasets and pre-render the default pages of the new versions."""
+        for dashboard in self.dashboards:
+            if dashboard.source.refresh():
+                self.dashboard_page(dashboard, {})
+
+    def watch(self, interval=DEFAULT_POLL_INTERVAL):
+        """Call ``refresh`` every ``interval`` seconds on a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.refresh()
+        thread = threading.Thread(target=loop, name='dataset-watcher', daemon=True)
+        thread.start()
+        return thread
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    app = None  # Set on the subclass created by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/status':
+            return self.send_page(make_page(json.dumps(self.app.status()), 'application/json'), cache=False)
+
+        dashboard = self.app.routes.get(url.path)
+        if dashboard is None:
+            page = self.app.static_page(url.path)
+            if page is None:
+                return self.send_error(HTTPStatus.NOT_FOUND)
+            return self.send_page(page, cache=url.path == self.app.plotlyjs_url)
+
+        try:
+            options = parse_options(parse_qs(url.query), dashboard.options)
+        except ValueError as exc:
+            return self.send_error(HTTPStatus.BAD_REQUEST, str(exc))
+        try:
+            page = self.app.dashboard_page(dashboard, options)
+        except Exception as exc:
+            return self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, f'{type(exc).__name__}: {exc}')
+        self.send_page(page, cache=False)
+
+    def send_page(self, page, cache):
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = page.gzipped if use_gzip else page.body
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', page.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        # The plotly.js URL is versioned, so browsers may keep it forever
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable' if cache else 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(app, host='127.0.0.1', port=8050):
+    handler = type('Handler', (DashboardHandler,), {'app': app})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the dashboards live from in-memory aggregates.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8050, help='Port to listen on (default: 8050)')
+    parser.add_argument('--ecommerce-dir', default=os.path.join(REPO_DIR, 'ecommerce-dashboard', 'datasets'),
+                        help='E-commerce dataset directory')
+    parser.add_argument('--sales-dir', default=os.path.join(REPO_DIR, 'sales-customer-dashboard', 'datasets'),
+                        help='Sales dataset directory')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Rendered pages kept in memory (default: 64)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help='Seconds a rendered page stays cached (default: 300)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Seconds between checks for changed dataset files (default: 2)')
+    args = parser.parse_args(argv)
+
+    app = DashboardApp(args.ecommerce_dir, args.sales_dir, cache_size=args.cache_size, ttl=args.ttl)
+    # Load and render both dashboards before accepting requests
+    app.refresh()
+    app.watch(args.poll_interval)
+    server = make_server(app, args.host, args.port)
+    print(f'Serving dashboards on http://{args.host}:{server.server_port}/ (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Startup cost of the dashboard entry points.
+
+Runs each entry point in a fresh interpreter under ``python -X importtime``
+and reports the total import time and the packages it went to::
+
+    python -m dashboards.startup
+    python -m dashboards.startup --top 10 --save-baseline startup-baseline.json
+    python -m dashboards.startup --baseline startup-baseline.json
+
+Modules are measured with ``import <module>``, scripts with ``--help`` so
+that only their imports and argument parsing run. Each target is measured
+``--repeat`` times and the fastest run is kept, which filters out a cold
+disk cache. Against a baseline, a target whose imports got more than
+``--tolerance`` slower is reported as a regression and the command exits
+non-zero.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TARGETS = [
+    'dashboards',
+    'dashboards.ecommerce',
+    'dashboards.sales',
+    'dashboards.render',
+    'ecommerce-dashboard/viz.py',
+    'sales-customer-dashboard/viz.py',
+]
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+# Differences below this are noise, never regressions
+MIN_SECONDS = 0.02
+
+# One line of ``-X importtime`` output: self and cumulative microseconds, indented module name
+ImportRecord = namedtuple('ImportRecord', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+
+def parse_importtime(stderr):
+    """The ``ImportRecord`` of every line of ``-X importtime`` output, in the order printed."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():  # The header line
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append(ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def command(target):
+    """The interpreter arguments that measure ``target``, a module name or a script path."""
+    if target.endswith('.py'):
+        return [os.path.join(REPO_DIR, target), '--help']
+    return ['-c', f'import {target}']
+
+
+def measure(target, python=sys.executable):
+    """Import records of one run of ``target`` in a fresh interpreter."""
+    result = subprocess.run([python, '-X', 'importtime'] + command(target), cwd=REPO_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'{target} failed:\n{result.stderr[-2000:]}')
+    return parse_importtime(result.stderr)
+
+
+def total_seconds(records):
+    """Time spent importing, the sum of the top-level imports' cumulative times."""
+    return sum(record.cumulative_us for record in records if record.depth == 0) / 1e6
+
+
+def package_seconds(records):
+    """Self time per top-level package (``pandas``, ``plotly``, ...), largest first."""
+    packages = {}
+    for record in records:
+        package = record.module.split('.')[0]
+        packages[package] = packages.get(package, 0) + record.self_us / 1e6
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def profile(target, repeat=DEFAULT_REPEAT, top=5):
+    """Summary of the fastest of ``repeat`` runs of ``target``."""
+    records = min((measure(target) for _ in range(repeat)), key=total_seconds)
+    packages = package_seconds(records)
+    return {
+        'target': target,
+        'seconds': total_seconds(records),
+        'modules': len(records),
+        'packages': dict(list(packages.items())[:top]),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Annotate ``results`` with their baseline time; return the regressions."""
+    previous = {result['target']: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(result['target'])
+        if base is None:
+            continue
+        result['baseline_seconds'] = base['seconds']
+        if (result['seconds'] > base['seconds'] * (1 + tolerance)
+                and result['seconds'] - base['seconds'] > MIN_SECONDS):
+            regressions.append(result)
+    return regressions
+
+
+def print_result(result):
+    change = ''
+    if result.get('baseline_seconds'):
+        change = f"{(result['seconds'] - result['baseline_seconds']) / result['baseline_seconds'] * 100:+.0f}%"
+    packages = ', '.join(f'{name} {seconds * 1e3:.0f}' for name, seconds in result['packages'].items())
+    print(f"{result['target']:34} {result['seconds'] * 1e3:8.0f} ms {result['modules']:8,} {change:>6}  {packages}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report the import time of the dashboard entry points.')
+    parser.add_argument('targets', nargs='*', default=DEFAULT_TARGETS,
+                        help='Modules to import or scripts to run with --help (default: the packages and viz scripts)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Runs per target; the fastest is kept (default: 3)')
+    parser.add_argument('--top', type=int, default=5, help='Packages listed per target (default: 5)')
+    parser.add_argument('--baseline', default=None, help='Compare against the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative slowdown reported as a regression (default: 0.25)')
+    parser.add_argument('--save-baseline', default=None, help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'target':34} {'imports':>11} {'modules':>8} {'change':>6}  slowest packages (ms, self time)")
+    results = []
+    for target in args.targets:
+        result = profile(target, args.repeat, args.top)
+        if baseline is not None:
+            compare([result], baseline, args.tolerance)
+        print_result(result)
+        results.append(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f'\nBaseline written to {args.save_baseline}')
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f'\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})')
+        return 0
+    print(f'\n{len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):')
+    for result in regressions:
+        print(f"- {result['target']}: {result['seconds'] * 1e3:.0f} ms (was {result['baseline_seconds'] * 1e3:.0f} ms)")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,695 @@
+"""Dataset storage for the dashboards' ``datasets/`` folders.
+
+Every dataset has a declared schema (``SCHEMAS``) so that loading always
+returns the same dtypes whatever the file format: repetitive strings become
+categoricals, dates come back as native timestamps and only the requested
+columns are read.
+
+Four formats are supported:
+
+- ``csv``: the original format, always available.
+- ``parquet``: columnar, dictionary-encoded strings, needs ``pyarrow``.
+- ``feather``: Arrow IPC files, needs ``pyarrow``.
+- ``npy``: a column store, a ``<name>.columns/`` directory with one NumPy
+  array file per column, opened as memory maps instead of being parsed.
+  Every process that reads it shares the operating system's page cache.
+
+Readers pick whichever file exists for a dataset (the newest one if several
+formats are present), so scripts keep working after switching formats.
+Appending to a CSV file adds rows at its end. The other formats cannot be
+extended in place, so each appended batch becomes a part file in
+``<path>.parts/`` that the readers add after the main file; ``merge_parts``
+folds them back into one file.
+``iter_batches`` reads a dataset as a stream of bounded-size DataFrames for
+files that do not fit in memory.
+
+With ``compact=True`` the readers also narrow numeric columns where no
+value changes (``int8`` to ``int32``, ``float32`` for amounts with at most
+``DECIMALS`` decimals) and keep plain strings in Arrow memory;
+``memory_report`` shows what each step saves.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from dashboards import profiling
+
+# pyarrow is imported by _require_pyarrow, the first time a parquet or feather file is used
+pa = feather = ipc = pq = None
+
+# Column types per dataset. 'category' columns are dictionary encoded,
+# 'datetime' columns are stored as timestamps, 'string' columns stay as
+# plain Python strings.
+SCHEMAS = {
+    # ecommerce-dashboard
+    'monthly_sales_data': {
+        'date': 'datetime', 'year': 'int64', 'month': 'int64', 'region': 'category',
+        'revenue': 'float64', 'orders': 'int64', 'avg_order_value': 'float64',
+    },
+    'regional_performance': {
+        'region': 'string', 'revenue_2024': 'float64', 'revenue_2025': 'float64',
+        'growth_rate': 'float64', 'market_share_2025': 'float64',
+    },
+    'category_sales': {
+        'category': 'category', 'year': 'int64', 'revenue': 'float64', 'units_sold': 'int64',
+    },
+    'customer_metrics': {
+        'date': 'datetime', 'year': 'int64', 'month': 'int64', 'new_customers': 'int64',
+        'retention_rate': 'float64', 'total_active_customers': 'int64',
+    },
+    # sales-customer-dashboard
+    'sales_transactions': {
+        'invoice_id': 'string', 'invoice_date': 'datetime', 'month': 'int64',
+        'customer_id': 'category', 'customer_name': 'category', 'customer_group': 'category',
+        'product_id': 'category', 'product_name': 'category', 'product_group': 'category',
+        'quantity': 'int64', 'unit_price': 'float64', 'invoice_amount': 'float64',
+    },
+    'monthly_sales_summary': {
+        'month': 'int64', 'month_name': 'string', 'year': 'int64', 'total_sales': 'float64',
+        'total_sales_previous': 'float64', 'invoice_count': 'int64', 'avg_invoice_amount': 'float64',
+    },
+    'customer_summary': {
+        'customer_id': 'string', 'customer_name': 'string', 'customer_group': 'category',
+        'total_sales': 'float64', 'total_purchases': 'int64', 'avg_purchase_amount': 'float64',
+    },
+    'product_group_summary': {
+        'product_group': 'string', 'total_sales': 'float64', 'percentage': 'float64',
+    },
+}
+
+EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'npy': '.columns',
+}
+
+FORMATS = list(EXTENSIONS)
+
+# Appended batches of a dataset at <path> are stored in <path>.parts/
+PARTS_SUFFIX = '.parts'
+
+DEFAULT_BATCH_SIZE = 500_000
+
+# Narrower integer dtypes tried by compact_frame(), smallest first
+COMPACT_INTS = ['int8', 'int16', 'int32']
+
+# Amounts and rates in the datasets have at most this many decimals, so a
+# float32 copy that rounds back to the same value loses nothing
+DECIMALS = 2
+
+
+def _require_pyarrow(fmt):
+    global pa, feather, ipc, pq
+    if pq is not None:
+        return
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+    except ImportError:  # pragma: no cover - depends on the environment
+        raise ImportError(f"The '{fmt}' dataset format needs pyarrow: pip install pyarrow") from None
+
+
+def _columns(name, columns=None):
+    schema = SCHEMAS[name]
+    if columns is None:
+        return list(schema)
+    unknown = [column for column in columns if column not in schema]
+    if unknown:
+        raise KeyError(f"Unknown columns for dataset '{name}': {unknown}")
+    return list(columns)
+
+
+def apply_schema(df, name):
+    """Return ``df`` with the columns in the schema of ``name`` cast to their types.
+
+    Categorical columns always get lexically sorted categories, so grouping
+    gives the same order whichever format the data came from.
+    """
+    schema = SCHEMAS[name]
+    converted = {}
+    for column in df.columns:
+        kind = schema.get(column)
+        series = df[column]
+        if kind is None:
+            continue
+        if kind == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                # CSV writes midnight timestamps without a time part, so formats can be mixed
+                converted[column] = pd.to_datetime(series, format='ISO8601')
+        elif kind == 'category':
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                converted[column] = series.astype('category')
+            elif not series.cat.categories.is_monotonic_increasing:
+                converted[column] = series.cat.reorder_categories(sorted(series.cat.categories))
+        elif kind == 'string':
+            if series.dtype != object:
+                converted[column] = series.astype(object)
+        elif series.dtype != np.dtype(kind):
+            converted[column] = series.astype(kind)
+    return df.assign(**converted) if converted else df
+
+
+def _compact_series(series):
+    if series.dtype.kind == 'i':
+        low, high = series.min(), series.max()
+        for dtype in COMPACT_INTS:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return series.astype(dtype)
+    elif series.dtype == np.float64:
+        narrow = series.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64).round(DECIMALS), series, equal_nan=True):
+            return narrow
+    elif series.dtype == object and pd.api.types.is_string_dtype(series):
+        try:
+            return series.astype('string[pyarrow]')
+        except ImportError:  # pragma: no cover - depends on the environment
+            pass
+    return series
+
+
+def compact_frame(df):
+    """Return ``df`` with every column in the narrowest dtype that keeps its values.
+
+    Integers get the smallest of ``COMPACT_INTS`` that holds their range and
+    floats become ``float32`` when every value still rounds to itself at
+    ``DECIMALS`` decimals (code that needs exact amounts must round, as
+    ``sales_agg`` does with cents). Plain string columns are stored as
+    Arrow strings; categoricals and timestamps are already compact.
+    """
+    converted = {}
+    for column in df.columns:
+        series = _compact_series(df[column])
+        if series.dtype != df[column].dtype:
+            converted[column] = series
+    return df.assign(**converted) if converted else df
+
+
+def memory_usage(df):
+    """Bytes held by ``df``, including its Python string objects."""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def memory_report(df):
+    """Bytes of ``df`` with plain pandas dtypes, as given (declared dtypes) and compacted.
+
+    The plain copy holds strings as Python objects and numbers as 64-bit,
+    like ``pd.read_csv`` without a dtype map.
+    """
+    plain = df.astype({column: object for column in df.columns
+                       if isinstance(df[column].dtype, (pd.CategoricalDtype, pd.StringDtype))})
+    plain = plain.astype({column: np.int64 for column in plain.columns if plain[column].dtype.kind == 'i'})
+    plain = plain.astype({column: np.float64 for column in plain.columns if plain[column].dtype.kind == 'f'})
+    return {'plain': memory_usage(plain), 'typed': memory_usage(df), 'compact': memory_usage(compact_frame(df))}
+
+
+def arrow_schema(name, columns=None):
+    """Return the pyarrow schema of dataset ``name``."""
+    _require_pyarrow('parquet')
+    types = {
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'datetime': pa.timestamp('ns'),
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+    }
+    schema = SCHEMAS[name]
+    return pa.schema([(column, types[schema[column]]) for column in _columns(name, columns)])
+
+
+def _to_arrow(df, name, typed=False):
+    if not typed:
+        df = apply_schema(df, name)
+    schema = arrow_schema(name, list(df.columns))
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+class CsvBackend:
+    """Plain CSV files, typed on read from the declared schema."""
+
+    def write(self, df, path, name):
+        df.to_csv(path, index=False)
+
+    def _read_args(self, name, columns):
+        schema = SCHEMAS[name]
+        columns = _columns(name, columns)
+        dtypes = {column: schema[column] for column in columns
+                  if schema[column] not in ('datetime', 'string')}
+        dates = [column for column in columns if schema[column] == 'datetime']
+        return columns, {'usecols': columns, 'dtype': dtypes, 'parse_dates': dates}
+
+    def read(self, path, name, columns=None):
+        columns, read_args = self._read_args(name, columns)
+        return pd.read_csv(path, **read_args)[columns]
+
+    def iter_batches(self, path, name, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+        columns, read_args = self._read_args(name, columns)
+        with pd.read_csv(path, chunksize=batch_size, **read_args) as reader:
+            for df in reader:
+                yield df[columns]
+
+    def open_writer(self, path, name):
+        return _CsvChunkWriter(path)
+
+    def append(self, df, path, name):
+        # Rows are added at the end of the file, in the file's column order
+        header = list(pd.read_csv(path, nrows=0).columns)
+        df[header].to_csv(path, mode='a', header=False, index=False)
+
+
+class ParquetBackend:
+    """Parquet files with dictionary-encoded categoricals and native timestamps."""
+
+    def write(self, df, path, name):
+        _require_pyarrow('parquet')
+        pq.write_table(_to_arrow(df, name), path)
+
+    def read(self, path, name, columns=None):
+        _require_pyarrow('parquet')
+        columns = _columns(name, columns)
+        return pq.read_table(path, columns=columns).to_pandas()
+
+    def iter_batches(self, path, name, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+        _require_pyarrow('parquet')
+        columns = _columns(name, columns)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    def open_writer(self, path, name):
+        _require_pyarrow('parquet')
+        return _ArrowChunkWriter(pq.ParquetWriter(path, arrow_schema(name)), name)
+
+    def append(self, df, path, name):
+        _append_part(self, df, path, name)
+
+
+class FeatherBackend:
+    """Arrow IPC (Feather v2) files."""
+
+    def write(self, df, path, name):
+        _require_pyarrow('feather')
+        feather.write_feather(_to_arrow(df, name), path)
+
+    def read(self, path, name, columns=None):
+        _require_pyarrow('feather')
+        columns = _columns(name, columns)
+        return feather.read_table(path, columns=columns).to_pandas()
+
+    def iter_batches(self, path, name, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+        _require_pyarrow('feather')
+        columns = _columns(name, columns)
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(columns)
+                for offset in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(offset, batch_size).to_pandas()
+
+    def open_writer(self, path, name):
+        _require_pyarrow('feather')
+        options = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return _ArrowChunkWriter(ipc.new_file(path, arrow_schema(name), options=options), name)
+
+    def append(self, df, path, name):
+        _append_part(self, df, path, name)
+
+
+class NpyBackend:
+    """A directory of ``.npy`` files, one per column, opened as read-only memory maps.
+
+    Numbers and timestamps are stored as they are in memory. Category and
+    string columns are stored as integer codes (``<column>.codes.npy``) and
+    the values they stand for (``<column>.dictionary.npy``), with category
+    values sorted. Reading a numeric, timestamp or category column copies
+    nothing; string columns are decoded into Python strings.
+    """
+
+    def write(self, df, path, name):
+        with self.open_writer(path, name) as writer:
+            writer.write(df)
+
+    def _open(self, path, name, columns):
+        """The number of rows and the memory-mapped arrays of ``columns``."""
+        with open(os.path.join(path, 'columns.json')) as f:
+            manifest = json.load(f)
+        arrays = {}
+        for column in _columns(name, columns):
+            if column in manifest['encoded']:
+                arrays[column] = (np.load(os.path.join(path, column + '.codes.npy'), mmap_mode='r'),
+                                  np.load(os.path.join(path, column + '.dictionary.npy'), mmap_mode='r'))
+            else:
+                arrays[column] = np.load(os.path.join(path, column + '.npy'), mmap_mode='r')
+        return manifest['rows'], arrays
+
+    def _frame(self, name, arrays, start=None, stop=None):
+        # Plain ndarray views of the maps, so pandas sees ordinary arrays
+        columns = {}
+        for column, array in arrays.items():
+            if not isinstance(array, tuple):
+                columns[column] = array[start:stop].view(np.ndarray)
+                continue
+            codes, dictionary = array
+            codes = codes[start:stop].view(np.ndarray)
+            if SCHEMAS[name][column] == 'category':
+                columns[column] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(dictionary),
+                                                            validate=False)
+            else:
+                values = dictionary[codes].astype(object)
+                values[codes < 0] = None
+                columns[column] = values
+        return pd.DataFrame(columns, copy=False)
+
+    def read(self, path, name, columns=None):
+        _, arrays = self._open(path, name, columns)
+        return self._frame(name, arrays)
+
+    def iter_batches(self, path, name, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+        rows, arrays = self._open(path, name, columns)
+        for start in range(0, rows, batch_size):
+            yield self._frame(name, arrays, start, start + batch_size)
+
+    def open_writer(self, path, name):
+        return _ColumnChunkWriter(path, name)
+
+    def append(self, df, path, name):
+        _append_part(self, df, path, name)
+
+
+def _replace(source, path):
+    """``os.replace`` that also swaps a directory for an existing one."""
+    if not os.path.isdir(path):
+        os.replace(source, path)
+        return
+    old_path = f'{path}.{os.getpid()}.old'
+    os.replace(path, old_path)
+    os.replace(source, path)
+    # Readers that still map the old files keep them until they close them
+    shutil.rmtree(old_path)
+
+
+def part_paths(path):
+    """The part files appended to the dataset stored at ``path``, oldest first."""
+    parts_dir = path + PARTS_SUFFIX
+    if not os.path.isdir(parts_dir):
+        return []
+    extension = os.path.splitext(path)[1]
+    # Unfinished parts end in .tmp
+    return [os.path.join(parts_dir, part) for part in sorted(os.listdir(parts_dir)) if part.endswith(extension)]
+
+
+def drop_parts(path):
+    """Delete the part files appended to the dataset at ``path``, e.g. before replacing it."""
+    shutil.rmtree(path + PARTS_SUFFIX, ignore_errors=True)
+
+
+def _append_part(backend, df, path, name):
+    # Parquet and Arrow IPC files and column stores cannot be extended in
+    # place: ``df`` becomes the next part file, so the cost depends only on it
+    parts = part_paths(path)
+    number = int(os.path.basename(parts[-1]).split('.')[0]) + 1 if parts else 1
+    part_path = os.path.join(path + PARTS_SUFFIX, f'{number:06d}{os.path.splitext(path)[1]}')
+    os.makedirs(path + PARTS_SUFFIX, exist_ok=True)
+    temp_path = part_path + '.tmp'
+    backend.write(df, temp_path, name)
+    _replace(temp_path, part_path)
+    # Keep this copy the newest for find_dataset
+    os.utime(path)
+
+
+class _CsvChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ArrowChunkWriter:
+    # Categories only ever grow between chunks, so every chunk's dictionary
+    # extends the previous one; Arrow IPC files accept that as a delta.
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+        self.categories = {}
+
+    def write(self, df):
+        df = apply_schema(df, self.name)
+        grown = {}
+        for column, kind in SCHEMAS[self.name].items():
+            if kind != 'category' or column not in df:
+                continue
+            known = self.categories.setdefault(column, [])
+            seen = set(known)
+            known.extend(value for value in df[column].cat.categories if value not in seen)
+            grown[column] = df[column].cat.set_categories(known)
+        self.writer.write_table(_to_arrow(df.assign(**grown), self.name, typed=True))
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _code_dtype(n_values):
+    # The dtype pandas gives the codes of n categories, so reading copies none
+    for dtype in ['int8', 'int16', 'int32']:
+        if n_values < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype('int64')
+
+
+class _ColumnChunkWriter:
+    # Chunks are appended to raw files in a temporary directory; close() turns
+    # them into .npy files and swaps the directory in. Dictionary codes are
+    # numbered in order of appearance while writing, and renumbered at the end
+    # so that category values come out sorted, as apply_schema() expects.
+    BLOCK_ROWS = 1 << 20
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.temp_path = f'{path}.{os.getpid()}.tmp'
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+        os.makedirs(self.temp_path)
+        self.rows = 0
+        self.dtypes = {}
+        self.dictionaries = {}
+        self.files = {}
+
+    def _encode(self, column, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series)
+        known = self.dictionaries.setdefault(column, {})
+        numbers = np.fromiter((known.setdefault(value, len(known)) for value in uniques),
+                              dtype=np.int64, count=len(uniques))
+        encoded = np.full(len(codes), -1, dtype=np.int64)
+        present = codes >= 0
+        encoded[present] = numbers[codes[present]]
+        return encoded
+
+    def write(self, df):
+        df = apply_schema(df, self.name)
+        columns = list(self.dtypes) or [column for column in SCHEMAS[self.name] if column in df]
+        for column in columns:
+            if SCHEMAS[self.name][column] in ('category', 'string'):
+                values = self._encode(column, df[column])
+            else:
+                values = df[column].to_numpy()
+            if column not in self.files:
+                self.dtypes[column] = values.dtype
+                self.files[column] = open(os.path.join(self.temp_path, column + '.raw'), 'wb')
+            np.ascontiguousarray(values, dtype=self.dtypes[column]).tofile(self.files[column])
+        self.rows += len(df)
+
+    def _finish_column(self, column, filename, dtype, convert=None):
+        raw_path = os.path.join(self.temp_path, column + '.raw')
+        raw_dtype = self.dtypes[column]
+        stored = np.lib.format.open_memmap(os.path.join(self.temp_path, filename), mode='w+',
+                                           dtype=dtype, shape=(self.rows,))
+        for start in range(0, self.rows, self.BLOCK_ROWS):
+            block = np.fromfile(raw_path, dtype=raw_dtype, count=self.BLOCK_ROWS, offset=start * raw_dtype.itemsize)
+            stored[start:start + len(block)] = block if convert is None else convert(block)
+        stored.flush()
+        del stored
+        os.remove(raw_path)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        for column, dtype in self.dtypes.items():
+            if column not in self.dictionaries:
+                self._finish_column(column, column + '.npy', dtype)
+                continue
+            values = np.array(list(self.dictionaries[column]), dtype=str)
+            if SCHEMAS[self.name][column] == 'category':
+                order = np.argsort(values, kind='stable')
+            else:
+                order = np.arange(len(values))
+            renumbered = np.empty(len(values) + 1, dtype=np.int64)
+            renumbered[order] = np.arange(len(values))
+            renumbered[-1] = -1  # Code -1 (missing) stays -1
+            np.save(os.path.join(self.temp_path, column + '.dictionary.npy'), values[order])
+            self._finish_column(column, column + '.codes.npy', _code_dtype(len(values)),
+                                convert=lambda block: renumbered[block])
+        with open(os.path.join(self.temp_path, 'columns.json'), 'w') as f:
+            json.dump({'rows': self.rows, 'columns': list(self.dtypes), 'encoded': list(self.dictionaries)}, f)
+        _replace(self.temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+            return
+        # A failed write leaves the stored dataset as it was
+        for f in self.files.values():
+            f.close()
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+
+
+BACKENDS = {
+    'csv': CsvBackend(),
+    'parquet': ParquetBackend(),
+    'feather': FeatherBackend(),
+    'npy': NpyBackend(),
+}
+
+
+def dataset_path(directory, name, fmt='csv'):
+    """Return the path of dataset ``name`` stored as ``fmt`` in ``directory``."""
+    return os.path.join(directory, name + EXTENSIONS[fmt])
+
+
+def dataset_files(path):
+    """The files that make up a stored dataset: ``path`` or the files of a column store, and its parts."""
+    files = [os.path.join(path, file) for file in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for part in part_paths(path):
+        files.extend(dataset_files(part))
+    return files
+
+
+def find_dataset(directory, name):
+    """Return ``(path, fmt)`` of the stored copy of ``name``, preferring the newest."""
+    candidates = [(dataset_path(directory, name, fmt), fmt) for fmt in FORMATS]
+    candidates = [(path, fmt) for path, fmt in candidates if os.path.exists(path)]
+    if not candidates:
+        raise FileNotFoundError(f"No stored dataset '{name}' in {directory}")
+    return max(candidates, key=lambda candidate: os.path.getmtime(candidate[0]))
+
+
+def write_dataset(df, directory, name, fmt='csv'):
+    """Write ``df`` as dataset ``name`` in ``directory`` and return the file path."""
+    path = dataset_path(directory, name, fmt)
+    with profiling.span(f'write {name}'):
+        BACKENDS[fmt].write(df, path, name)
+        drop_parts(path)
+    return path
+
+
+def append_dataset(df, directory, name):
+    """Append the rows of ``df`` to the stored dataset ``name`` and return the file path.
+
+    CSV files are appended in place; in the other formats ``df`` is written
+    as a new part file (see ``part_paths``). Either way the cost depends
+    only on ``df``, not on the rows already stored.
+    """
+    path, fmt = find_dataset(directory, name)
+    BACKENDS[fmt].append(apply_schema(df, name), path, name)
+    return path
+
+
+def merge_parts(directory, name):
+    """Rewrite dataset ``name`` and its appended parts as a single file; returns the number of parts.
+
+    The rows are copied in bounded-memory batches, so this reads the whole
+    dataset once. Reading many small parts is slower than one file.
+    """
+    path, fmt = find_dataset(directory, name)
+    parts = part_paths(path)
+    if not parts:
+        return 0
+    backend = BACKENDS[fmt]
+    temp_path = f'{path}.{os.getpid()}.merge'
+    with profiling.span(f'merge {name}'):
+        with backend.open_writer(temp_path, name) as writer:
+            for source in [path] + parts:
+                for batch in backend.iter_batches(source, name):
+                    writer.write(batch)
+        _replace(temp_path, path)
+        drop_parts(path)
+    return len(parts)
+
+
+def read_dataset(directory, name, columns=None, fmt=None, compact=False):
+    """Load dataset ``name`` from ``directory`` with its declared dtypes.
+
+    ``columns`` limits the read to those columns (projection). ``fmt``
+    forces a format; by default the newest stored copy is used. With
+    ``compact`` the columns are narrowed further (see ``compact_frame``).
+    """
+    if fmt is None:
+        path, fmt = find_dataset(directory, name)
+    else:
+        path = dataset_path(directory, name, fmt)
+    with profiling.span(f'read {name}'):
+        frames = [BACKENDS[fmt].read(source, name, columns=columns) for source in [path] + part_paths(path)]
+        # Parts may have other categories: the concatenation falls back to objects and is recast
+        df = apply_schema(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True), name)
+        return compact_frame(df) if compact else df
+
+
+def iter_batches(directory, name, columns=None, batch_size=DEFAULT_BATCH_SIZE, fmt=None, compact=False):
+    """Yield dataset ``name`` as DataFrames of at most ``batch_size`` rows.
+
+    Only one batch is held in memory at a time; each batch has the declared
+    dtypes (categoricals are per batch, so their categories may differ).
+    With ``compact`` each batch is narrowed on its own, so dtypes may also
+    differ between batches.
+    """
+    if fmt is None:
+        path, fmt = find_dataset(directory, name)
+    else:
+        path = dataset_path(directory, name, fmt)
+    batches = (batch for source in [path] + part_paths(path)
+               for batch in BACKENDS[fmt].iter_batches(source, name, columns=columns, batch_size=batch_size))
+    while True:
+        # Timed per batch, without the caller's work between two batches
+        with profiling.span(f'read {name}'):
+            df = next(batches, None)
+            if df is not None:
+                df = apply_schema(df, name)
+                df = compact_frame(df) if compact else df
+        if df is None:
+            return
+        yield df
+
+
+def open_writer(directory, name, fmt='csv'):
+    """Return a context manager that writes dataset ``name`` chunk by chunk, replacing any parts."""
+    path = dataset_path(directory, name, fmt)
+    drop_parts(path)
+    return BACKENDS[fmt].open_writer(path, name)
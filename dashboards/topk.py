@@ -0,0 +1,171 @@
+"""Customer rankings by total sales, kept up to date as invoices arrive.
+
+``TopCustomers`` holds every customer's total in integer cents, and their
+order by total, overall and within each customer group. ``top(k)`` and
+``top(k, group='VIP')`` slice that order, so they cost O(k) for any ``k``,
+whatever the number of customers::
+
+    ranking = TopCustomers.from_frame(customer_df)      # one sort
+    ranking.top(6)                                       # the dashboard table
+    ranking.add(batch_totals['cents'].index, batch_totals['cents'], names, groups)
+
+``add`` takes the per-customer totals of a batch of invoices. Only the
+customers in the batch are moved: they are taken out of the order, sorted
+among themselves and merged back with ``np.searchsorted``, which costs
+O(n + m log m) for n customers and m changed ones instead of a full sort.
+
+Customers with equal totals keep the order they were first seen in, so a
+ranking built from a frame sorted by customer id gives the same rows as
+``customer_df.nlargest(k, 'total_sales')``.
+
+``sales_ingest`` saves the ranking next to ``customer_summary``
+(``RANKING_FILE``) after every batch, and the dashboard loads it with
+``TopCustomers.load`` instead of sorting all customers again::
+
+    ranking = TopCustomers.load(customer_df, ranking_path(dataset_dir))
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['customer_id', 'customer_name', 'customer_group', 'total_sales']
+
+# The saved ranking, next to the customer_summary dataset it ranks
+RANKING_FILE = 'customer_ranking.npz'
+
+
+def ranking_path(dataset_dir):
+    """Path of the saved ranking of the customers in ``dataset_dir``."""
+    return os.path.join(dataset_dir, RANKING_FILE)
+
+
+def _cents(customer_df):
+    return np.rint(customer_df['total_sales'].to_numpy(dtype=float) * 100).astype(np.int64)
+
+
+def _merge(order, cents, changed):
+    """``order`` without the ``changed`` slots, with them put back at their rank."""
+    moved = np.zeros(len(cents), dtype=bool)
+    moved[changed] = True
+    keep = order[~moved[order]]
+    changed = changed[np.lexsort((changed, -cents[changed]))]
+
+    keys = -cents[keep]
+    new_keys = -cents[changed]
+    at = np.searchsorted(keys, new_keys, side='left')
+    ties = np.flatnonzero(np.searchsorted(keys, new_keys, side='right') > at)
+    if len(ties):
+        # Equal totals rank by slot. Numbering the runs of equal keys turns
+        # (key, slot) into one sorted integer to search in
+        run = np.concatenate([[0], np.cumsum(keys[1:] != keys[:-1])])
+        stride = len(cents)
+        at[ties] = np.searchsorted(run * stride + keep, run[at[ties]] * stride + changed[ties])
+    return np.insert(keep, at, changed)
+
+
+class TopCustomers:
+    """Every customer's total sales, ranked overall and per customer group."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=object)
+        self.names = np.empty(0, dtype=object)
+        self.groups = np.empty(0, dtype=object)
+        self.cents = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.intp)
+        self.group_orders = {}
+        self._slots = {}
+
+    @classmethod
+    def from_frame(cls, customer_df, order=None):
+        """Rank the customers of a ``customer_summary``-like frame, in one sort.
+
+        ``order`` (the row positions from highest to lowest total) skips the sort.
+        """
+        ranking = cls()
+        ranking.ids = customer_df['customer_id'].to_numpy(dtype=object)
+        ranking.names = customer_df['customer_name'].to_numpy(dtype=object)
+        ranking.groups = customer_df['customer_group'].to_numpy(dtype=object)
+        ranking.cents = _cents(customer_df)
+        if order is None:
+            ranking.order = np.argsort(-ranking.cents, kind='stable')
+        else:
+            ranking.order = np.asarray(order, dtype=np.intp)
+        # Filtering the overall order keeps it sorted, so the groups need no sort of their own
+        codes, uniques = pd.factorize(ranking.groups)
+        ordered_codes = codes[ranking.order]
+        ranking.group_orders = {group: ranking.order[ordered_codes == code] for code, group in enumerate(uniques)}
+        ranking._slots = None
+        return ranking
+
+    @classmethod
+    def load(cls, customer_df, path):
+        """Rank the customers of ``customer_df`` in the order saved at ``path`` by ``save``.
+
+        The saved ids are looked up in ``customer_df`` and their totals
+        compared, in O(n). If the file is missing or ranks other totals
+        (the summaries were written without updating it), the customers
+        are sorted as by ``from_frame``. Customers with equal totals keep
+        their saved order.
+        """
+        try:
+            with np.load(path) as saved:
+                ids, cents = saved['ids'], saved['cents']
+        except (OSError, ValueError, KeyError):
+            return cls.from_frame(customer_df)
+        positions = pd.Index(customer_df['customer_id'].astype(str)).get_indexer(ids)
+        if (len(ids) != len(customer_df) or (positions < 0).any()
+                or not np.array_equal(_cents(customer_df)[positions], cents)):
+            return cls.from_frame(customer_df)
+        return cls.from_frame(customer_df, order=positions)
+
+    def save(self, path):
+        """Write the customer ids and totals in rank order to ``path``, for ``load``."""
+        temp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temp_path, ids=self.ids[self.order].astype(str), cents=self.cents[self.order])
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, customer_ids, cents, names=None, groups=None):
+        """Add ``cents`` to the totals of ``customer_ids`` (each id at most once) and re-rank them.
+
+        ``names`` and ``groups`` are only needed for customers not seen
+        before, which are added after the existing ones.
+        """
+        customer_ids = np.asarray(customer_ids, dtype=object)
+        cents = np.asarray(cents, dtype=np.int64)
+        if self._slots is None:
+            self._slots = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        slots = np.fromiter((self._slots.get(customer_id, -1) for customer_id in customer_ids),
+                            dtype=np.intp, count=len(customer_ids))
+        new = slots < 0
+        if new.any():
+            if names is None or groups is None:
+                raise ValueError(f'Names and groups are needed for new customers, e.g. {customer_ids[new][0]!r}')
+            first = len(self.ids)
+            slots[new] = np.arange(first, first + new.sum())
+            self._slots.update(zip(customer_ids[new], slots[new].tolist()))
+            self.ids = np.concatenate([self.ids, customer_ids[new]])
+            self.names = np.concatenate([self.names, np.asarray(names, dtype=object)[new]])
+            self.groups = np.concatenate([self.groups, np.asarray(groups, dtype=object)[new]])
+            self.cents = np.concatenate([self.cents, np.zeros(new.sum(), dtype=np.int64)])
+        self.cents[slots] += cents
+
+        self.order = _merge(self.order, self.cents, slots)
+        changed_groups = self.groups[slots]
+        for group in pd.unique(changed_groups):
+            group_order = self.group_orders.get(group, np.empty(0, dtype=np.intp))
+            self.group_orders[group] = _merge(group_order, self.cents, slots[changed_groups == group])
+
+    def top(self, k, group=None):
+        """The ``k`` customers with the highest sales, overall or in ``group``, as a frame of ``COLUMNS``."""
+        order = self.order if group is None else self.group_orders.get(group, np.empty(0, dtype=np.intp))
+        slots = order[:k]
+        return pd.DataFrame({
+            'customer_id': self.ids[slots],
+            'customer_name': self.names[slots],
+            'customer_group': self.groups[slots],
+            'total_sales': np.round(self.cents[slots] / 100, 2),
+        }, columns=COLUMNS)
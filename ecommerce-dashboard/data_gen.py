@@ -2,6 +2,69 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import random
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboards import ecommerce_gen, profiling, result_cache, storage
+
+parser = argparse.ArgumentParser(description='Generate the e-commerce dashboard datasets.')
+parser.add_argument('--format', choices=storage.FORMATS, default='csv',
+                    help='File format for the datasets (default: csv)')
+parser.add_argument('--regions', type=int, default=None,
+                    help='Generate this many regions (the 5 built-in ones, then simulated markets) '
+                         'with the parallel per-region generator')
+parser.add_argument('--categories', type=int, default=None,
+                    help='Number of product categories for the parallel generator (default: 6)')
+parser.add_argument('--workers', type=int, default=None,
+                    help='Worker processes for the parallel generator (default: 1); '
+                         'the output is the same for any number')
+parser.add_argument('--seed', type=int, default=None,
+                    help='Random seed for the parallel generator (default: 42)')
+profiling.add_arguments(parser)
+result_cache.add_arguments(parser)
+args = parser.parse_args()
+if args.regions is not None and args.regions < 1:
+    parser.error('--regions must be at least 1')
+if args.categories is not None and args.categories < 1:
+    parser.error('--categories must be at least 1')
+if args.workers is not None and args.workers < 1:
+    parser.error('--workers must be at least 1')
+run = profiling.start(args, 'ecommerce-dashboard/data_gen.py')
+
+# The same options and code always generate the same files: reuse them if cached
+DATASETS = ['monthly_sales_data', 'regional_performance', 'category_sales', 'customer_metrics']
+cached = result_cache.start(args, __file__, 'ecommerce-dashboard/datasets')
+if cached.hit:
+    profiling.finish(run, args)
+    sys.exit(0)
+
+if any(value is not None for value in [args.regions, args.categories, args.workers, args.seed]):
+    # Parallel mode: every region and category has its own SeedSequence-spawned
+    # generator, so jobs can run on a process pool without changing the output
+    profiling.stage('generate')
+    datasets = ecommerce_gen.generate(
+        n_regions=len(ecommerce_gen.REGIONS) if args.regions is None else args.regions,
+        n_categories=len(ecommerce_gen.CATEGORIES) if args.categories is None else args.categories,
+        seed=42 if args.seed is None else args.seed,
+        workers=1 if args.workers is None else args.workers,
+    )
+    profiling.stage('write')
+    os.makedirs('ecommerce-dashboard/datasets', exist_ok=True)
+    for name, df in datasets.items():
+        storage.write_dataset(df, 'ecommerce-dashboard/datasets', name, args.format)
+
+    print("E-commerce data files created successfully (parallel mode)!")
+    for name, df in datasets.items():
+        print(f"Total records in {name}{storage.EXTENSIONS[args.format]}: {len(df):,}")
+    print(f"Regions: {len(datasets['regional_performance']):,}, "
+          f"categories: {datasets['category_sales']['category'].nunique():,}, workers: {1 if args.workers is None else args.workers}")
+    cached.finish([storage.dataset_path('ecommerce-dashboard/datasets', name, args.format) for name in datasets])
+    profiling.finish(run, args)
+    sys.exit(0)
+
+profiling.stage('monthly_sales')
 
 # Set random seed for consistent results
 np.random.seed(42)
@@ -55,24 +118,15 @@ for year in [2024, 2025]:
                 'avg_order_value': round(monthly_revenue / orders, 2)
             })
 
-# Create regional performance data
-regional_data = []
-for region_name, region_info in regions.items():
-    # Calculate 2025 vs 2024 performance
-    total_2024 = sum([row['revenue'] for row in monthly_sales if row['region'] == region_name and row['year'] == 2024])
-    total_2025 = sum([row['revenue'] for row in monthly_sales if row['region'] == region_name and row['year'] == 2025])
-    
-    growth_rate = ((total_2025 - total_2024) / total_2024) * 100
-    
-    regional_data.append({
-        'region': region_name,
-        'revenue_2024': total_2024,
-        'revenue_2025': total_2025,
-        'growth_rate': round(growth_rate, 1),
-        'market_share_2025': round((total_2025 / sum([row['revenue'] for row in monthly_sales if row['year'] == 2025])) * 100, 1)
-    })
+monthly_sales_df = pd.DataFrame(monthly_sales)
+
+# Create regional performance data: yearly revenue and year-over-year
+# growth of every region, from the monthly series in one pass
+profiling.stage('regional_performance')
+regional_performance_df = ecommerce_gen.regional_performance(monthly_sales_df, regions)
 
 # Create product category data
+profiling.stage('category_sales')
 category_sales = []
 for category in categories:
     for year in [2024, 2025]:
@@ -109,6 +163,7 @@ for category in categories:
         })
 
 # Create customer acquisition data
+profiling.stage('customer_metrics')
 customer_data = []
 months_all = list(months_2024) + list(months_2025)
 
@@ -140,33 +195,34 @@ for month in months_all:
     })
 
 # Save all data to CSV files
-monthly_sales_df = pd.DataFrame(monthly_sales)
-regional_performance_df = pd.DataFrame(regional_data)
+profiling.stage('write')
 category_performance_df = pd.DataFrame(category_sales)
 customer_metrics_df = pd.DataFrame(customer_data)
 
 # Create datasets folder
-import os
 os.makedirs('ecommerce-dashboard/datasets', exist_ok=True)
 
-monthly_sales_df.to_csv('ecommerce-dashboard/datasets/monthly_sales_data.csv', index=False)
-regional_performance_df.to_csv('ecommerce-dashboard/datasets/regional_performance.csv', index=False)
-category_performance_df.to_csv('ecommerce-dashboard/datasets/category_sales.csv', index=False)
-customer_metrics_df.to_csv('ecommerce-dashboard/datasets/customer_metrics.csv', index=False)
+storage.write_dataset(monthly_sales_df, 'ecommerce-dashboard/datasets', 'monthly_sales_data', args.format)
+storage.write_dataset(regional_performance_df, 'ecommerce-dashboard/datasets', 'regional_performance', args.format)
+storage.write_dataset(category_performance_df, 'ecommerce-dashboard/datasets', 'category_sales', args.format)
+storage.write_dataset(customer_metrics_df, 'ecommerce-dashboard/datasets', 'customer_metrics', args.format)
 
+ext = storage.EXTENSIONS[args.format]
 print("E-commerce data files created successfully!")
 print("Files generated in datasets/ folder:")
-print("1. monthly_sales_data.csv - Monthly sales by region (2024-2025)")
-print("2. regional_performance.csv - Regional comparison data (2024-2025)")
-print("3. category_sales.csv - Product category performance (2024-2025)")
-print("4. customer_metrics.csv - Customer acquisition and retention (2024-2025)")
+print(f"1. monthly_sales_data{ext} - Monthly sales by region (2024-2025)")
+print(f"2. regional_performance{ext} - Regional comparison data (2024-2025)")
+print(f"3. category_sales{ext} - Product category performance (2024-2025)")
+print(f"4. customer_metrics{ext} - Customer acquisition and retention (2024-2025)")
 
 print(f"\nSample data preview:")
-print(f"Total records in monthly_sales_data.csv: {len(monthly_sales_df)}")
-print(f"Total records in regional_performance.csv: {len(regional_performance_df)}")
-print(f"Total records in category_sales.csv: {len(category_performance_df)}")
-print(f"Total records in customer_metrics.csv: {len(customer_metrics_df)}")
+print(f"Total records in monthly_sales_data{ext}: {len(monthly_sales_df)}")
+print(f"Total records in regional_performance{ext}: {len(regional_performance_df)}")
+print(f"Total records in category_sales{ext}: {len(category_performance_df)}")
+print(f"Total records in customer_metrics{ext}: {len(customer_metrics_df)}")
 
 print(f"\nYears covered: 2024 and 2025")
 print(f"Regions: {list(regions.keys())}")
-print(f"Product categories: {categories}")
\ No newline at end of file
+print(f"Product categories: {categories}")
+cached.finish([storage.dataset_path('ecommerce-dashboard/datasets', name, args.format) for name in DATASETS])
+profiling.finish(run, args)
\ No newline at end of file
@@ -2,6 +2,72 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import random
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboards import profiling, result_cache, sales_agg, sales_gen, storage
+
+parser = argparse.ArgumentParser(description='Generate the sales customer dashboard datasets.')
+parser.add_argument('--rows', type=int, default=None,
+                    help='Generate this many invoices with the batched NumPy generator')
+parser.add_argument('--customers', type=int, default=50,
+                    help='Number of customers for the batched generator (default: 50)')
+parser.add_argument('--seed', type=int, default=42,
+                    help='Random seed for the batched generator (default: 42)')
+parser.add_argument('--chunk-size', type=int, default=sales_gen.DEFAULT_CHUNK_SIZE,
+                    help='Invoices generated and written per chunk (default: 1,000,000)')
+parser.add_argument('--format', choices=storage.FORMATS, default='csv',
+                    help='File format for the datasets (default: csv)')
+profiling.add_arguments(parser)
+result_cache.add_arguments(parser)
+args = parser.parse_args()
+if args.rows is not None and args.rows < 1:
+    parser.error('--rows must be at least 1')
+if args.chunk_size < 1:
+    parser.error('--chunk-size must be at least 1')
+run = profiling.start(args, 'sales-customer-dashboard/data_gen.py')
+
+# The same options and code always generate the same files: reuse them if cached
+DATASETS = ['sales_transactions', 'monthly_sales_summary', 'customer_summary', 'product_group_summary']
+cached = result_cache.start(args, __file__, 'sales-customer-dashboard/datasets')
+if cached.hit:
+    profiling.finish(run, args)
+    sys.exit(0)
+
+if args.rows is not None:
+    # Batched mode for production-sized volumes: invoices are drawn as NumPy
+    # arrays and written chunk by chunk, summaries come from running totals
+    os.makedirs('sales-customer-dashboard/datasets', exist_ok=True)
+    profiling.stage('generate')
+    customers_df, totals = sales_gen.write_transactions(
+        'sales-customer-dashboard/datasets', args.rows, n_customers=args.customers,
+        seed=args.seed, chunk_size=args.chunk_size, fmt=args.format
+    )
+    profiling.stage('summarize')
+    rng = np.random.default_rng(args.seed)
+    monthly_df, customer_df, product_df = sales_agg.finalize(
+        totals, customers_df, product_groups=sales_gen.PRODUCT_GROUPS,
+        prev_year_factors=rng.uniform(0.85, 0.95, size=12)
+    )
+    total_sales_amount = monthly_df['total_sales'].sum()
+
+    profiling.stage('write')
+    storage.write_dataset(monthly_df, 'sales-customer-dashboard/datasets', 'monthly_sales_summary', args.format)
+    storage.write_dataset(customer_df, 'sales-customer-dashboard/datasets', 'customer_summary', args.format)
+    storage.write_dataset(product_df, 'sales-customer-dashboard/datasets', 'product_group_summary', args.format)
+
+    print("Sales dashboard data created successfully (batched mode)!")
+    print(f"Total Sales Amount: ${total_sales_amount:,.0f}")
+    print(f"Total Invoices: {args.rows:,}")
+    print(f"Total Customers: {len(customer_df):,}")
+    print(f"Seed: {args.seed}, chunk size: {args.chunk_size:,}, format: {args.format}")
+    cached.finish([storage.dataset_path('sales-customer-dashboard/datasets', name, args.format) for name in DATASETS])
+    profiling.finish(run, args)
+    sys.exit(0)
+
+profiling.stage('generate')
 
 # Set random seed for consistent results
 np.random.seed(42)
@@ -97,84 +163,38 @@ for month in range(1, 13):
         
         invoice_number += 1
 
-# Create monthly aggregated data
-monthly_sales = []
-for month in range(1, 13):
-    month_data = [sale for sale in sales_data if sale['month'] == month]
-    total_sales = sum([sale['invoice_amount'] for sale in month_data])
-    invoice_count = len(month_data)
-    
-    # Generate previous year data for comparison (slightly lower)
-    prev_year_sales = total_sales * random.uniform(0.85, 0.95)
-    
-    monthly_sales.append({
-        'month': month,
-        'month_name': datetime(2023, month, 1).strftime('%b'),
-        'year': 2023,
-        'total_sales': round(total_sales, 2),
-        'total_sales_previous': round(prev_year_sales, 2),
-        'invoice_count': invoice_count,
-        'avg_invoice_amount': round(total_sales / invoice_count, 2) if invoice_count > 0 else 0
-    })
-
-# Create customer summary data
-customer_summary = []
-for customer in customers:
-    customer_sales = [sale for sale in sales_data if sale['customer_id'] == customer['customer_id']]
-    if customer_sales:
-        total_amount = sum([sale['invoice_amount'] for sale in customer_sales])
-        total_purchases = len(customer_sales)
-        avg_purchase = total_amount / total_purchases if total_purchases > 0 else 0
-        
-        customer_summary.append({
-            'customer_id': customer['customer_id'],
-            'customer_name': customer['customer_name'],
-            'customer_group': customer['customer_group'],
-            'total_sales': round(total_amount, 2),
-            'total_purchases': total_purchases,
-            'avg_purchase_amount': round(avg_purchase, 2)
-        })
-
-# Create product group summary
-product_groups = ['Food and Beverages', 'Nutrition Supplements', 'Fitness and Exercise Equipment', 'Personal Care and Wellness Products']
-product_summary = []
-
-for group in product_groups:
-    group_sales = [sale for sale in sales_data if sale['product_group'] == group]
-    total_amount = sum([sale['invoice_amount'] for sale in group_sales])
-    
-    product_summary.append({
-        'product_group': group,
-        'total_sales': round(total_amount, 2),
-        'percentage': 0  # Will calculate after creating dataframe
-    })
-
-# Convert to DataFrames
+# Build monthly, customer and product group summaries in one vectorized pass
+profiling.stage('summarize')
 sales_df = pd.DataFrame(sales_data)
-monthly_df = pd.DataFrame(monthly_sales)
-customer_df = pd.DataFrame(customer_summary)
-product_df = pd.DataFrame(product_summary)
 
-# Calculate product group percentages
+# Previous year data for comparison (slightly lower), one factor per month
+prev_year_factors = [random.uniform(0.85, 0.95) for _ in range(12)]
+
+monthly_df, customer_df, product_df = sales_agg.summarize(
+    sales_df,
+    customers=pd.DataFrame(customers),
+    product_groups=sales_gen.PRODUCT_GROUPS,
+    prev_year_factors=prev_year_factors
+)
 total_sales_amount = sales_df['invoice_amount'].sum()
-product_df['percentage'] = round((product_df['total_sales'] / total_sales_amount) * 100, 2)
 
 # Create datasets folder
-import os
 os.makedirs('sales-customer-dashboard/datasets', exist_ok=True)
 
-# Save to CSV files
-sales_df.to_csv('sales-customer-dashboard/datasets/sales_transactions.csv', index=False)
-monthly_df.to_csv('sales-customer-dashboard/datasets/monthly_sales_summary.csv', index=False)
-customer_df.to_csv('sales-customer-dashboard/datasets/customer_summary.csv', index=False)
-product_df.to_csv('sales-customer-dashboard/datasets/product_group_summary.csv', index=False)
+# Save the datasets (CSV by default, see --format)
+profiling.stage('write')
+storage.write_dataset(sales_df, 'sales-customer-dashboard/datasets', 'sales_transactions', args.format)
+storage.write_dataset(monthly_df, 'sales-customer-dashboard/datasets', 'monthly_sales_summary', args.format)
+storage.write_dataset(customer_df, 'sales-customer-dashboard/datasets', 'customer_summary', args.format)
+storage.write_dataset(product_df, 'sales-customer-dashboard/datasets', 'product_group_summary', args.format)
 
+ext = storage.EXTENSIONS[args.format]
 print("Sales dashboard data created successfully!")
 print("Files generated in datasets/ folder:")
-print("1. sales_transactions.csv - Individual sales transactions")
-print("2. monthly_sales_summary.csv - Monthly aggregated data")
-print("3. customer_summary.csv - Customer profiling data")
-print("4. product_group_summary.csv - Product group analysis")
+print(f"1. sales_transactions{ext} - Individual sales transactions")
+print(f"2. monthly_sales_summary{ext} - Monthly aggregated data")
+print(f"3. customer_summary{ext} - Customer profiling data")
+print(f"4. product_group_summary{ext} - Product group analysis")
 
 print(f"\nData Summary:")
 print(f"Total Sales Amount: ${total_sales_amount:,.0f}")
@@ -188,4 +208,6 @@ print(f"\nSample records:")
 print(f"Sales transactions: {len(sales_df)} rows")
 print(f"Monthly summary: {len(monthly_df)} rows")
 print(f"Customer summary: {len(customer_df)} rows")
-print(f"Product groups: {len(product_df)} rows")
\ No newline at end of file
+print(f"Product groups: {len(product_df)} rows")
+cached.finish([storage.dataset_path('sales-customer-dashboard/datasets', name, args.format) for name in DATASETS])
+profiling.finish(run, args)
\ No newline at end of file
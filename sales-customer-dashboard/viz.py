@@ -1,214 +1,82 @@
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import numpy as np
-
-# Load the generated data from datasets folder
-sales_df = pd.read_csv('sales-customer-dashboard/datasets/sales_transactions.csv')
-monthly_df = pd.read_csv('sales-customer-dashboard/datasets/monthly_sales_summary.csv')
-customer_df = pd.read_csv('sales-customer-dashboard/datasets/customer_summary.csv')
-product_df = pd.read_csv('sales-customer-dashboard/datasets/product_group_summary.csv')
-
-# Convert date columns
-sales_df['invoice_date'] = pd.to_datetime(sales_df['invoice_date'])
-
-# Calculate key metrics for the header cards
-total_sales = sales_df['invoice_amount'].sum()
-total_invoices = len(sales_df)
-avg_invoice_amount = sales_df['invoice_amount'].mean()
-total_customers = len(customer_df)
-
-# Create the dashboard with multiple subplots
-fig = make_subplots(
-    rows=4, cols=4,
-    subplot_titles=[
-        '', '', '', '',  # Remove title for metrics row
-        'Total Sales ($) Over Time', '', '', '',
-        'Sales vs Purchases by Customer', '', 'Product Group Sales', '',
-        'Customer Group Distribution', '', '', ''
-    ],
-    specs=[
-        [{"colspan": 4}, None, None, None],
-        [{"colspan": 4, "secondary_y": True}, None, None, None],
-        [{"colspan": 2}, None, {"type": "pie"}, None],
-        [{"type": "pie"}, None, {"colspan": 2}, None]
-    ],
-    vertical_spacing=0.12,  # Increased spacing
-    horizontal_spacing=0.1,
-    row_heights=[0.12, 0.35, 0.35, 0.18]  # Adjusted heights
-)
-
-# 1. Key Metrics Cards (Top Row) - Using annotations instead of traces
-metrics_annotations = [
-    dict(x=0.125, y=0.88, xref='paper', yref='paper',  # Lowered from 0.95
-         text=f'<b>${total_sales/1000000:.2f}M</b><br>Sum of Invoices',
-         showarrow=False, font=dict(size=14, color='white'),  # Reduced font size
-         bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
-         xanchor='center', yanchor='middle'),
-    dict(x=0.375, y=0.88, xref='paper', yref='paper',
-         text=f'<b>{total_invoices}</b><br>Count of Invoices',
-         showarrow=False, font=dict(size=14, color='white'),
-         bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
-         xanchor='center', yanchor='middle'),
-    dict(x=0.625, y=0.88, xref='paper', yref='paper',
-         text=f'<b>${avg_invoice_amount/1000:.1f}K</b><br>Average Invoice Amount',
-         showarrow=False, font=dict(size=14, color='white'),
-         bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
-         xanchor='center', yanchor='middle'),
-    dict(x=0.875, y=0.88, xref='paper', yref='paper',
-         text=f'<b>{total_customers}</b><br>Customer Count',
-         showarrow=False, font=dict(size=14, color='white'),
-         bgcolor='rgba(52, 73, 94, 0.8)', bordercolor='white', borderwidth=2,
-         xanchor='center', yanchor='middle')
-]
-
-# 2. Monthly Sales Trends (Second Row)
-# Current year sales
-fig.add_trace(
-    go.Bar(
-        x=monthly_df['month_name'],
-        y=monthly_df['total_sales'],
-        name='2023 Sales',
-        marker=dict(color='#ff7f0e'),
-        text=[f'${x/1000:.0f}K' for x in monthly_df['total_sales']],
-        textposition='outside',
-        hovertemplate='%{x}<br>2023 Sales: $%{y:,.0f}<extra></extra>'
-    ),
-    row=2, col=1
-)
-
-# Previous year sales (comparison)
-fig.add_trace(
-    go.Bar(
-        x=monthly_df['month_name'],
-        y=monthly_df['total_sales_previous'],
-        name='2022 Sales (Previous)',
-        marker=dict(color='rgba(52, 73, 94, 0.7)'),
-        hovertemplate='%{x}<br>2022 Sales: $%{y:,.0f}<extra></extra>'
-    ),
-    row=2, col=1
-)
-
-# 3. Customer Analysis Scatter Plot (Bottom Left)
-# Prepare data for scatter plot
-scatter_data = customer_df.copy()
-colors = {'NEW': '#2ecc71', 'REGULAR': '#3498db', 'VIP': '#e74c3c', 'SENSITIVE': '#f39c12'}
-
-for group in scatter_data['customer_group'].unique():
-    group_data = scatter_data[scatter_data['customer_group'] == group]
-    
-    fig.add_trace(
-        go.Scatter(
-            x=group_data['total_purchases'],
-            y=group_data['total_sales'],
-            mode='markers',
-            name=group,
-            marker=dict(
-                size=12,
-                color=colors.get(group, '#95a5a6'),
-                opacity=0.7,
-                line=dict(width=1, color='white')
-            ),
-            text=group_data['customer_name'],
-            hovertemplate='%{text}<br>Purchases: %{x}<br>Sales: $%{y:,.0f}<br>Group: ' + group + '<extra></extra>'
-        ),
-        row=3, col=1
-    )
-
-# 4. Product Group Pie Chart (Middle Right)
-fig.add_trace(
-    go.Pie(
-        labels=product_df['product_group'],
-        values=product_df['total_sales'],
-        hole=0.4,
-        marker=dict(colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']),
-        textinfo='label+percent',
-        textposition='outside',
-        hovertemplate='%{label}<br>Sales: $%{value:,.0f}<br>%{percent}<extra></extra>'
-    ),
-    row=3, col=3
-)
-
-# 5. Customer Group Distribution (Bottom Left)
-customer_group_counts = customer_df['customer_group'].value_counts()
-customer_group_sales = customer_df.groupby('customer_group')['total_sales'].sum()
-
-fig.add_trace(
-    go.Pie(
-        labels=customer_group_counts.index,
-        values=customer_group_sales.values,
-        hole=0.4,
-        marker=dict(colors=['#3498db', '#e74c3c', '#2ecc71', '#f39c12']),
-        textinfo='label+percent',
-        textposition='outside',
-        hovertemplate='%{label}<br>Sales: $%{value:,.0f}<br>%{percent}<extra></extra>'
-    ),
-    row=4, col=1
-)
-
-# 6. Customer Details Table (Bottom Right)
-# Create a simple table using annotations
-table_data = customer_df.nlargest(6, 'total_sales')[['customer_group', 'customer_name', 'total_sales']]  # Reduced to 6 rows
-table_y = 0.15  # Lowered position
-table_annotations = []
-
-# Table header
-table_annotations.append(
-    dict(x=0.75, y=table_y + 0.05, xref='paper', yref='paper',  # Adjusted header position
-         text='<b>Top Customers by Sales</b>',
-         showarrow=False, font=dict(size=12, color='#2c3e50'),  # Smaller font
-         xanchor='center')
-)
-
-# Table rows
-for i, (_, row) in enumerate(table_data.iterrows()):
-    y_pos = table_y - (i * 0.018)  # Tighter spacing
-    table_annotations.append(
-        dict(x=0.75, y=y_pos, xref='paper', yref='paper',
-             text=f'{row["customer_group"]} | {row["customer_name"][:18]} | ${row["total_sales"]:,.0f}',  # Shorter names
-             showarrow=False, font=dict(size=9, color='#34495e'),  # Smaller font
-             xanchor='center')
-    )
-
-# Update layout and axes
-fig.update_xaxes(title_text="Month", row=2, col=1)
-fig.update_yaxes(title_text="Sales Amount ($)", row=2, col=1)
-
-fig.update_xaxes(title_text="Number of Purchases", row=3, col=1)
-fig.update_yaxes(title_text="Total Sales ($)", row=3, col=1)
-
-# Format y-axis for sales
-fig.update_yaxes(tickformat="$,.0s", row=2, col=1)
-fig.update_yaxes(tickformat="$,.0s", row=3, col=1)
-
-# Update overall layout
-fig.update_layout(
-    title={
-        'text': "Sales Customer Profiling Dashboard - 2023<br><sup style='font-size:14px'>Created by Rehan Ali</sup>",
-        'x': 0.5,
-        'xanchor': 'center',
-        'font': {'size': 24, 'color': '#2c3e50'},  # Reduced main title size
-        'y': 0.98  # Position title higher
-    },
-    height=1100,  # Increased height for better spacing
-    showlegend=True,
-    template='plotly_white',
-    font=dict(family="Arial, sans-serif", size=11),
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=-0.1,
-        xanchor="center",
-        x=0.5
-    ),
-    annotations=metrics_annotations + table_annotations
-)
-
-# Background shape removed to prevent overlap issues
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboards import assets, density, downsample, figure_json, profiling, result_cache
+
+parser = argparse.ArgumentParser(description='Create the sales customer profiling dashboard.')
+parser.add_argument('--stream', action='store_true',
+                    help='Aggregate sales_transactions in bounded-memory batches (for files larger than RAM)')
+# Defaults that live in dashboards.sales and dashboards.storage are filled in once they are imported
+parser.add_argument('--chunk-size', type=int, default=None,
+                    help='Rows per batch in --stream mode (default: 500,000)')
+parser.add_argument('--engine', default='pandas',
+                    help="Where to aggregate the transactions: 'pandas' (default), or 'duckdb' or 'sqlite' "
+                         "to run SQL over the stored file")
+parser.add_argument('--compact', action='store_true',
+                    help='Hold the transactions in the narrowest dtypes that keep every value (int8, float32, ...)')
+parser.add_argument('--memory-report', action='store_true',
+                    help='Print the memory the transaction table takes with plain, declared and compact dtypes')
+parser.add_argument('--plotlyjs', choices=assets.PLOTLYJS_MODES, default='embed',
+                    help="How to include plotly.js: 'shared' writes it once to assets/ next to index.html")
+parser.add_argument('--max-points', type=int, default=downsample.DEFAULT_MAX_POINTS,
+                    help='Downsample the sales-over-time bars to at most this many bars (default: 2,000)')
+parser.add_argument('--downsample', choices=downsample.METHODS, default='lttb',
+                    help="Downsampling method: 'lttb' keeps the shape, 'minmax' keeps every bucket's extremes")
+parser.add_argument('--density-threshold', type=int, default=density.DEFAULT_DENSITY_THRESHOLD,
+                    help='Bin the customer scatter on a grid above this many customers (default: 100,000)')
+parser.add_argument('--density-bins', type=int, default=density.DEFAULT_BINS,
+                    help='Grid cells per axis of the binned customer scatter (default: 60)')
+parser.add_argument('--components', action='store_true',
+                    help='Draw the KPI cards and the top customers as Indicator and Table traces')
+parser.add_argument('--top-customers', type=int, default=None,
+                    help='Rows of the "Top Customers by Sales" table (default: 6)')
+parser.add_argument('--table-page-size', type=int, default=None,
+                    help='With --components, show the table this many rows per page (default: 25)')
+parser.add_argument('--arrays', choices=figure_json.ARRAY_ENCODINGS, default='json',
+                    help="'binary' embeds every numeric array as a base64 typed array")
+parser.add_argument('--compress', action='store_true',
+                    help='Embed the figure gzip-compressed, inflated by the browser on load')
+profiling.add_arguments(parser)
+result_cache.add_arguments(parser)
+args = parser.parse_args()
+if args.engine != 'pandas' and (args.stream or args.compact):
+    parser.error(f'--stream and --compact only apply to the pandas engine, not {args.engine}')
+run = profiling.start(args, 'sales-customer-dashboard/viz.py')
+
+# Unchanged datasets, options and code give the same page: reuse it if cached
+cached = result_cache.start(args, __file__, 'sales-customer-dashboard', inputs=['sales-customer-dashboard/datasets'])
+if cached.hit:
+    if args.plotlyjs == 'shared':
+        assets.ensure_plotlyjs()
+    profiling.finish(run, args)
+    sys.exit(0)
+
+# Imported after parsing: they load pandas, which --help and bad arguments do not need
+with profiling.span('import'):
+    from dashboards import sales, storage
+if args.engine not in sales.ENGINES:
+    parser.error(f"argument --engine: invalid choice: {args.engine!r} (choose from {', '.join(sales.ENGINES)})")
+if args.chunk_size is None:
+    args.chunk_size = storage.DEFAULT_BATCH_SIZE
+if args.top_customers is None:
+    args.top_customers = sales.DEFAULT_TOP_CUSTOMERS
+if args.table_page_size is None:
+    args.table_page_size = sales.DEFAULT_PAGE_SIZE
+
+# Compute the KPI cards and chart aggregates from the datasets folder
+aggregates = sales.load_aggregates('sales-customer-dashboard/datasets',
+                                   stream=args.stream, batch_size=args.chunk_size, compact=args.compact,
+                                   engine=args.engine)
+fig = sales.build_figure(aggregates, max_points=args.max_points, method=args.downsample,
+                         density_threshold=args.density_threshold, density_bins=args.density_bins,
+                         components=args.components, top_customers=args.top_customers,
+                         page_size=args.table_page_size)
 
 # Export to HTML
-fig.write_html("sales-customer-dashboard/sales_customer_profiling_dashboard.html")
+saved_bytes = assets.write_html(fig, "sales-customer-dashboard/sales_customer_profiling_dashboard.html", plotlyjs=args.plotlyjs,
+                               arrays=args.arrays, compress=args.compress)
 
 print("Sales Customer Profiling Dashboard created successfully!")
 print("\nDashboard Features:")
@@ -219,12 +87,28 @@ print("- Product group performance breakdown")
 print("- Customer segmentation visualization")
 print("- Top customer details summary")
 print("\nHTML file saved as: sales_customer_profiling_dashboard.html")
+if saved_bytes:
+    print(f"plotly.js loaded from a {args.plotlyjs} copy, {saved_bytes / 1e6:.1f} MB smaller than embedding it")
+if args.arrays != 'json' or args.compress:
+    sizes = figure_json.payload_sizes(fig)
+    embedded = sizes['binary_gzip' if args.compress else 'binary']
+    print(f"Figure payload: {sizes['text'] / 1e3:,.1f} KB as JSON text, {sizes['plotly'] / 1e3:,.1f} KB as plotly "
+          f"writes it, {embedded / 1e3:,.1f} KB embedded ({args.arrays} arrays{', gzip' if args.compress else ''})")
+if args.memory_report:
+    transactions = storage.read_dataset('sales-customer-dashboard/datasets', 'sales_transactions')
+    memory = storage.memory_report(transactions)
+    print(f"sales_transactions in memory ({len(transactions):,} rows): {memory['plain'] / 1e6:,.2f} MB with plain "
+          f"dtypes, {memory['typed'] / 1e6:,.2f} MB declared, {memory['compact'] / 1e6:,.2f} MB compact")
 
 # Print summary statistics
+kpis = aggregates['kpis']
+product_df = aggregates['product_groups']
 print(f"\nBusiness Summary:")
-print(f"Total Sales: ${total_sales:,.0f}")
-print(f"Total Invoices: {total_invoices:,}")
-print(f"Average Invoice: ${avg_invoice_amount:,.0f}")
-print(f"Total Customers: {total_customers}")
+print(f"Total Sales: ${kpis['total_sales']:,.0f}")
+print(f"Total Invoices: {kpis['total_invoices']:,}")
+print(f"Average Invoice: ${kpis['avg_invoice_amount']:,.0f}")
+print(f"Total Customers: {kpis['total_customers']}")
 print(f"Top Product Group: {product_df.loc[product_df['total_sales'].idxmax(), 'product_group']}")
-print(f"Largest Customer Group: {customer_group_sales.idxmax()}")
\ No newline at end of file
+print(f"Largest Customer Group: {aggregates['customer_group_sales'].idxmax()}")
+cached.finish(['sales-customer-dashboard/sales_customer_profiling_dashboard.html'])
+profiling.finish(run, args)